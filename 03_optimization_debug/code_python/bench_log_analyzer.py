@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_log_analyzer.py
+
+log_analyzer_ai.py 的效能量測（教學示範用）：
+- 產生一份合成 log 檔
+- 比較「逐行完整解析」與 mmap 快速計數路徑的耗時
+- 比較 analyze_log() 在不同 workers 數下的耗時，並確認統計結果一致
+- 混合格式的機群：比較「每行逐一嘗試各種格式」與「每檔判斷一次格式」的耗時
+
+用法:
+    python bench_log_analyzer.py [--lines=2000000] [--workers=1,2,4,8]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from itertools import cycle, islice
+from pathlib import Path
+
+import log_analyzer_ai
+
+SAMPLE_LINES = [
+    "2025-11-24 10:15:01 [INFO] 使用者登入成功 user=alice",
+    "2025-11-24 10:15:02 [INFO] 讀取設定檔完成",
+    "2025-11-24 10:15:03 [WARN] 回應時間偏高 latency_ms=812",
+    "2025-11-24 10:15:04 [ERROR] 失敗，無法連線 host=api.realtek.local",
+    "2025-11-16 09:00:01 INFO MobileApp user_id=alice action=open_app",
+]
+
+
+# 各格式的樣本行（混合格式機群用）
+FORMAT_SAMPLES = {
+    "bracket": SAMPLE_LINES[:4],
+    "mobile": [
+        "2025-11-16 09:00:01 INFO MobileApp user_id=alice action=open_app device=Pixel7",
+        "2025-11-16 09:00:02 DEBUG MobileApp user_id=alice screen=login duration_ms=532",
+        "2025-11-16 09:00:17 WARN NetService event=http_500 path=/v1/settings",
+        "2025-11-16 09:01:40 ERROR AIInference model=llm-chat-v2 event=gpu_oom",
+    ],
+    "jsonl": [
+        json.dumps({"timestamp": "2025-11-16 09:00:08", "level": level, "source": "AIInference",
+                    "fields": {"model": "asr-small-v1", "latency_ms": "123"}})
+        for level in ("INFO", "DEBUG", "WARN", "ERROR")
+    ],
+}
+
+
+def write_synthetic_log(path: Path, n: int, lines=SAMPLE_LINES) -> None:
+    """把 n 行合成 log 寫進檔案。"""
+    with path.open("w", encoding="utf-8") as f:
+        for line in islice(cycle(lines), n):
+            f.write(line + "\n")
+
+
+def _parse_trial(line: str) -> dict:
+    """對照組：每一行都依序嘗試所有格式，直到有一個吻合。"""
+    for fmt in log_analyzer_ai.LOG_FORMATS.values():
+        if fmt.matches(line):
+            return fmt.parse(line)
+    return log_analyzer_ai.parse_line(line)
+
+
+def bench_formats(tmp: Path, lines: int) -> None:
+    """混合格式機群：逐行嘗試 vs 每檔判斷一次格式後走專用 parser。"""
+    paths = []
+    for name, samples in FORMAT_SAMPLES.items():
+        path = tmp / f"device_{name}.log"
+        write_synthetic_log(path, lines // len(FORMAT_SAMPLES), samples)
+        paths.append(path)
+
+    start = time.perf_counter()
+    want = Counter()
+    for path in paths:
+        with path.open(encoding="utf-8") as f:
+            want.update(_parse_trial(line)["level"] for line in f)
+    trial_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    report = log_analyzer_ai.analyze_logs(paths, concurrency=1, sample_errors=1)
+    sniff_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = log_analyzer_ai.analyze_logs(paths, concurrency=1)
+    fast_elapsed = time.perf_counter() - start
+
+    assert report["counts"] == fast["counts"] == dict(want), "結果不一致！"
+    assert "UNKNOWN" not in report["counts"], "有格式沒有被辨識！"
+    print(f"[INFO] formats {report['formats']}")
+    print(f"[INFO] per-line trial : {trial_elapsed:.3f} sec")
+    print(f"[INFO] sniff per file : {sniff_elapsed:.3f} sec (x{trial_elapsed / sniff_elapsed:.2f})")
+    print(f"[INFO] sniff + marker : {fast_elapsed:.3f} sec (x{trial_elapsed / fast_elapsed:.2f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="log_analyzer_ai 效能量測")
+    parser.add_argument("--lines", type=int, default=2_000_000, help="合成 log 行數")
+    parser.add_argument("--workers", default="1,2,4,8", help="要量測的 worker 數（逗號分隔）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = Path(tmp) / "synthetic.log"
+        write_synthetic_log(log_path, args.lines)
+        size = log_path.stat().st_size
+        print(f"[INFO] synthetic log: {args.lines:,} lines, {size / 1024 / 1024:.1f} MB, "
+              f"{os.cpu_count()} CPUs")
+
+        mb = size / 1024 / 1024
+        start = time.perf_counter()
+        full = log_analyzer_ai.analyze_log(log_path, sample_errors=10)
+        full_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        fast = log_analyzer_ai.analyze_log(log_path)
+        fast_elapsed = time.perf_counter() - start
+        assert full["counts"] == fast["counts"], "結果不一致！"
+        print(f"[INFO] full parse : {full_elapsed:.3f} sec ({mb / full_elapsed:,.1f} MB/sec)")
+        print(f"[INFO] mmap scan  : {fast_elapsed:.3f} sec ({mb / fast_elapsed:,.1f} MB/sec)")
+
+        workers_list = [int(w) for w in args.workers.split(",")]
+        # 切小一點的 chunk，讓中型檔案也能分給所有 worker
+        log_analyzer_ai.CHUNK_SIZE = max(1024 * 1024, size // (4 * max(workers_list)))
+
+        baseline = expected = None
+        for workers in workers_list:
+            start = time.perf_counter()
+            report = log_analyzer_ai.analyze_log(log_path, workers=workers)
+            elapsed = time.perf_counter() - start
+
+            baseline = baseline or elapsed
+            expected = expected or report["counts"]
+            assert report["counts"] == expected, "結果不一致！"
+            print(f"[INFO] workers={workers:<3}: {elapsed:.3f} sec "
+                  f"({args.lines / elapsed:,.0f} lines/sec, x{baseline / elapsed:.2f})")
+
+        bench_formats(Path(tmp), args.lines)
+
+
+if __name__ == "__main__":
+    main()
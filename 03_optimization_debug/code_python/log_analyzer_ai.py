@@ -7,25 +7,73 @@ log_analyzer.py
 一個簡易的 log 分析器：
 1. 讀取 log 檔，解析每行的等級 (INFO/WARN/ERROR)
 2. 統計各等級數量
-3. 若 ERROR 占比過高，給出建議措施
+3. 若 ERROR 占比過高，給出建議措施（可附上少量 ERROR 範例行）
 4. 所有流程都包在 try/except 裡，避免因檔案不存在等問題崩潰
 5. 將結果輸出成結構化 JSON 報表，並在終端顯示簡易表格
+6. 傳入目錄或 glob 時，同時讀取多個裝置的 log，合併成一份報表
+7. gzip / bz2 / xz / zstd 壓縮檔依 magic bytes 自動辨識，串流解壓，不必先解到磁碟
+8. 依檔案前幾行自動判斷 log 格式（[LEVEL] 括號格式、手機 App 格式、JSONL），
+   每個檔案只判斷一次，之後整個檔案都走該格式專用的預先編譯 regex
+9. 指定 --cache-dir 時，手機 App 格式的 log 改由 05 的解析快取（log_cache.ParseCache）
+   提供 level 欄位：未變動的檔案不必再掃描或解壓，只往後追加的檔案只解析新增部分
 
 Author:   <Your Name>
 Date:     2025-11-24
 """
 
+import argparse
+import bz2
+import functools
+import glob
+import gzip
+import io
 import json
 import logging
+import lzma
+import mmap
+import random
 import re
-from collections import Counter
+import sys
+import threading
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
 
+try:                                      # 選用：只有 .zst 檔需要
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 讀取損毀 / 截斷 / 不支援的檔案時可能丟出的例外；多檔模式遇到只略過該檔
+# （gzip / bz2 的錯誤是 OSError 的子類別）
+READ_ERRORS = (OSError, EOFError, UnicodeDecodeError, RuntimeError, lzma.LZMAError, zlib.error)
+if zstandard is not None:
+    READ_ERRORS += (zstandard.ZstdError,)
+
 # ===================== 設定 ===================== #
 LOG_FILE = Path("./datasets/example_mobile_ai.log")  # 需要分析的 log 檔
 REPORT_FILE = Path("./report.json")       # 產生的報表
 ERROR_THRESHOLD = 0.10                    # ERROR 佔比 10% 時給出建議
+CHUNK_SIZE = 32 * 1024 * 1024             # 平行模式下每個 worker 一次處理的 bytes
+SCAN_WINDOW = 64 * 1024 * 1024            # 計算換行數時每次掃描的 bytes
+FLEET_CONCURRENCY = 8                     # 多檔模式下同時處理的檔案數
+FLEET_PATTERN = "*.log*"                  # 傳入目錄時遞迴搜尋的檔名（含 .log.gz 等）
+READ_BUFFER = 1024 * 1024                 # 讀取壓縮檔時的緩衝區大小
+SNIFF_LINES = 50                          # 判斷 log 格式時讀取的行數
+FORMAT_CACHE_SIZE = 4096                  # 最多記住幾個檔案版本的格式判斷結果
+# 05 的解析快取所在目錄；只有指定 --cache-dir 時才會載入
+ANALYTICS_DIR = Path(__file__).resolve().parents[2] / "05_log_ai_analytics" / "code_Python"
+
+# 壓縮格式的 magic bytes（不看副檔名）
+COMPRESSED_MAGIC = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "xz",
+    b"\x28\xb5\x2f\xfd": "zstd",
+}
 
 # ===================== Logger ===================== #
 logging.basicConfig(
@@ -51,34 +99,424 @@ LOG_PATTERN = re.compile(
     re.VERBOSE
 )
 
-def parse_line(line: str):
-    """把一行 log 轉成 dict。若無法解析，level 會回傳 'UNKNOWN'。"""
-    m = LOG_PATTERN.match(line)
-    if m:
+# 只計數用的 bytes 版本：與 LOG_PATTERN 判斷條件相同，但直接掃描 raw bytes，
+# 不必逐行 decode。用 [^\S\n] 取代 \s，避免跨行比對。
+LEVEL_MARKER_PATTERN = re.compile(
+    rb"^[^\S\n]*\d{4}-\d{2}-\d{2}[^\S\n]+\d{2}:\d{2}:\d{2}[^\S\n]+"
+    rb"\[(INFO|WARN|ERROR)\][^\S\n]+.",
+    re.MULTILINE
+)
+
+# 例子： 2025-11-16 09:00:01 INFO MobileApp user_id=alice action=open_app
+# （mobile_log_basic_ai 的 timestamp LEVEL Source key=value 格式）
+MOBILE_PATTERN = re.compile(
+    r"""
+    ^\s*
+    (?P<datetime>\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})\s+
+    (?P<level>DEBUG|INFO|WARNING|WARN|ERROR)\s+   # 等級（不加括號）
+    (?P<message>\S.*)$                           # Source 與 key=value 內容
+    """,
+    re.VERBOSE
+)
+MOBILE_MARKER_PATTERN = re.compile(
+    rb"^[^\S\n]*\d{4}-\d{2}-\d{2}[^\S\n]+\d{2}:\d{2}:\d{2}[^\S\n]+"
+    rb"(DEBUG|INFO|WARNING|WARN|ERROR)[^\S\n]+\S",
+    re.MULTILINE
+)
+
+# 例子： {"timestamp": "2025-11-16 09:00:01", "level": "INFO", "source": "MobileApp", ...}
+# （mobile_log_basic_ai 轉出的 JSONL）
+JSONL_PATTERN = re.compile(
+    r'^\s*\{.*?"level":\s*"(?P<level>DEBUG|INFO|WARNING|WARN|ERROR)"'
+)
+JSONL_MARKER_PATTERN = re.compile(
+    rb'^[^\S\n]*\{[^\n]*?"level":[^\S\n]*"(DEBUG|INFO|WARNING|WARN|ERROR)"',
+    re.MULTILINE
+)
+
+# marker → 報表上的等級名稱（WARNING 與 WARN 視為同一級）
+LEVEL_NAMES = {b"DEBUG": "DEBUG", b"INFO": "INFO", b"WARN": "WARN",
+               b"WARNING": "WARN", b"ERROR": "ERROR"}
+
+# ===================== Log 格式 ===================== #
+class LogFormat:
+    """
+    一種 log 格式：逐行解析用的 pattern，加上只計數用的 bytes marker。
+
+    兩個 regex 都在載入時編譯好；每個檔案判斷一次格式後，
+    整個檔案都只用這一組 regex，不必逐行嘗試各種格式。
+    """
+
+    def __init__(self, name: str, pattern: re.Pattern, marker: re.Pattern):
+        self.name = name
+        self.pattern = pattern
+        self.marker = marker
+
+    def matches(self, line: str) -> bool:
+        return self.pattern.match(line) is not None
+
+    def parse(self, line: str) -> dict:
+        """把一行 log 轉成 dict。若無法解析，level 會回傳 'UNKNOWN'。"""
+        m = self.pattern.match(line)
+        if m:
+            level = m.group("level")
+            return {
+                "datetime": m.group("datetime"),
+                "level": "WARN" if level == "WARNING" else level,
+                "message": m.group("message").strip()
+            }
         return {
-            "datetime": m.group("datetime"),
-            "level": m.group("level"),
-            "message": m.group("message").strip()
+            "datetime": None,
+            "level": "UNKNOWN",
+            "message": line.strip()
         }
-    else:
-        # 這裡可自行擴充其他格式的解析
+
+class JsonLogFormat(LogFormat):
+    """JSONL：判斷 / 計數用 regex，完整解析才呼叫 json.loads。"""
+
+    def parse(self, line: str) -> dict:
+        if self.matches(line):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            level = record.get("level") if isinstance(record, dict) else None
+            if level in ("DEBUG", "INFO", "WARNING", "WARN", "ERROR"):
+                return {
+                    "datetime": record.get("timestamp"),
+                    "level": "WARN" if level == "WARNING" else level,
+                    "message": record.get("raw_message") or line.strip()
+                }
         return {
             "datetime": None,
             "level": "UNKNOWN",
             "message": line.strip()
         }
 
-def analyze_log(file_path: Path) -> dict:
-    """讀檔並統計 log 等級。"""
+# 格式登錄表：判斷時依序比較，同分時排在前面的優先
+LOG_FORMATS = {}
+
+def register_format(fmt: LogFormat):
+    """登錄一種 log 格式（之後 detect_format 就會把它列入候選）。"""
+    LOG_FORMATS[fmt.name] = fmt
+    return fmt
+
+DEFAULT_FORMAT = register_format(LogFormat("bracket", LOG_PATTERN, LEVEL_MARKER_PATTERN)).name
+register_format(LogFormat("mobile", MOBILE_PATTERN, MOBILE_MARKER_PATTERN))
+register_format(JsonLogFormat("jsonl", JSONL_PATTERN, JSONL_MARKER_PATTERN))
+
+def parse_line(line: str, fmt: str = DEFAULT_FORMAT):
+    """把一行 log 依指定格式轉成 dict。若無法解析，level 會回傳 'UNKNOWN'。"""
+    return LOG_FORMATS[fmt].parse(line)
+
+def iter_byte_ranges(file_path: Path, chunk_size: int = CHUNK_SIZE):
+    """把檔案切成以換行結尾的 (start, end) byte 區段，供平行處理使用。"""
+    size = file_path.stat().st_size
+    with file_path.open("rb") as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()                   # 往後讀到行尾，確保不會切斷一行
+            end = min(f.tell(), size)
+            yield start, end
+            start = end
+
+def count_levels_mmap(file_path: Path, start: int = 0, end: int = None,
+                      fmt: str = DEFAULT_FORMAT) -> Counter:
+    """
+    快速路徑：用 mmap 直接在 raw bytes 上找等級標記（例如 [INFO]/[WARN]/[ERROR]）。
+
+    不 decode、不建立每行的 dict，只回傳各等級數量（含 UNKNOWN）。
+    可指定 byte 區段 [start, end)，平行模式的 worker 也是呼叫這個函式。
+    fmt 是 detect_format() 判斷出的格式名稱，決定要用哪一個 marker regex。
+    """
+    marker_pattern = LOG_FORMATS[fmt].marker
     counts = Counter()
-    parsed_lines = []
+    with file_path.open("rb") as f:
+        if file_path.stat().st_size == 0:
+            return counts                  # 空檔案無法 mmap
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm) if end is None else end
+            if end <= start:
+                return counts
+
+            # 以 SCAN_WINDOW 為單位、對齊換行逐段掃描，記憶體用量固定
+            markers = Counter()
+            total = 0
+            pos = start
+            while pos < end:
+                stop = min(pos + SCAN_WINDOW, end)
+                if stop < end:
+                    nl = mm.find(b"\n", stop - 1, end)
+                    stop = end if nl == -1 else nl + 1
+                markers.update(marker_pattern.findall(mm, pos, stop))
+                total += mm[pos:stop].count(b"\n")
+                pos = stop
+
+            # 總行數 = 換行數（最後一行沒有換行時再 +1）
+            if mm[end - 1] != ord("\n"):
+                total += 1
+
+    for marker, n in markers.items():
+        counts[LEVEL_NAMES[marker]] += n
+    unknown = total - sum(counts.values())
+    if unknown:
+        counts["UNKNOWN"] = unknown
+    return counts
+
+def detect_compression(file_path: Path):
+    """依檔頭 magic bytes 判斷壓縮格式；一般文字檔回傳 None。"""
+    with file_path.open("rb") as f:
+        head = f.read(6)
+    for magic, name in COMPRESSED_MAGIC.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+def open_decompressed(file_path: Path, compression: str):
+    """開啟串流解壓的 binary stream（加大緩衝區，減少小塊讀取的開銷）。"""
+    if compression == "gzip":
+        raw = gzip.open(file_path, "rb")
+    elif compression == "bz2":
+        raw = bz2.open(file_path, "rb")
+    elif compression == "xz":
+        raw = lzma.open(file_path, "rb")
+    elif zstandard is not None:
+        raw = zstandard.ZstdDecompressor().stream_reader(
+            file_path.open("rb"), read_across_frames=True, closefd=True)
+    else:
+        raise RuntimeError(f"{file_path} 是 zstd 壓縮檔，需要先安裝 zstandard 套件")
+    return io.BufferedReader(raw, buffer_size=READ_BUFFER)
+
+def sniff_format(lines) -> str:
+    """
+    依樣本行判斷格式：每種登錄的格式各自比對，吻合行數最多者勝出
+    （同分時取登錄順序在前者）；都不吻合時回傳預設的 bracket 格式。
+    """
+    samples = [line for line in lines if line.strip()]
+    best, best_hits = DEFAULT_FORMAT, 0
+    for name, fmt in LOG_FORMATS.items():
+        hits = sum(1 for line in samples if fmt.matches(line))
+        if hits > best_hits:
+            best, best_hits = name, hits
+    return best
+
+def detect_format(file_path: Path, compression: str = None) -> str:
+    """
+    讀取檔案前 SNIFF_LINES 行判斷 log 格式（壓縮檔先解壓前幾行）。
+
+    結果依 (路徑, 大小, mtime) 快取，同一個檔案不會重複判斷；
+    檔案有變動時才重新判斷。
+    """
+    st = file_path.stat()
+    return _detect_format_cached(str(file_path.resolve()), st.st_size, st.st_mtime_ns,
+                                 compression)
+
+@functools.lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def _detect_format_cached(path: str, size: int, mtime_ns: int, compression: str) -> str:
+    """
+    detect_format 的快取層：key 含大小與 mtime，檔案變動後就是新的 key。
+
+    長時間掃描機群時同一個檔案會留下很多版本，用 LRU 限制筆數，
+    最久沒用到的版本先被淘汰。
+    """
+    file_path = Path(path)
+    if compression:
+        stream = open_decompressed(file_path, compression)
+    else:
+        stream = file_path.open("rb")
+    with stream:
+        head = [raw.decode("utf-8", errors="replace")
+                for raw in islice(stream, SNIFF_LINES)]
+    return sniff_format(head)
+
+def count_levels_stream(stream, fmt: str = DEFAULT_FORMAT) -> Counter:
+    """
+    壓縮檔版的 count_levels_mmap：從解壓後的 stream 逐段讀取，
+    每段補到行尾再掃描標記，記憶體用量固定為 SCAN_WINDOW 左右。
+    """
+    marker_pattern = LOG_FORMATS[fmt].marker
+    markers = Counter()
+    total = 0
+    last = b"\n"
+    while True:
+        block = stream.read(SCAN_WINDOW)
+        if not block:
+            break
+        block += stream.readline()        # 補到行尾，避免切斷一行
+        markers.update(marker_pattern.findall(block))
+        total += block.count(b"\n")
+        last = block[-1:]
+    if last != b"\n":
+        total += 1                         # 最後一行沒有換行
+
+    counts = Counter()
+    for marker, n in markers.items():
+        counts[LEVEL_NAMES[marker]] += n
+    unknown = total - sum(counts.values())
+    if unknown:
+        counts["UNKNOWN"] = unknown
+    return counts
+
+class LevelStats:
+    """
+    固定記憶體的統計容器：各等級數量 + ERROR 行的 reservoir sample。
+
+    不論 log 有多大，只保留 counts 與最多 sample_size 筆 ERROR 行；
+    不同區段的結果可以用 merge() 合併（平行模式使用）。
+    """
+
+    def __init__(self, sample_size: int = 0):
+        self.counts = Counter()
+        self.formats = Counter()       # 各格式的檔案數
+        self.sample_size = sample_size
+        self.error_seen = 0            # 目前看過幾筆 ERROR
+        self.error_samples = []        # reservoir，最多 sample_size 筆
+
+    def add(self, parsed: dict):
+        """加入一行解析結果。"""
+        self.counts[parsed["level"]] += 1
+        if parsed["level"] != "ERROR" or not self.sample_size:
+            return
+        # Reservoir sampling (Algorithm R)：每筆 ERROR 被留下的機率相同
+        self.error_seen += 1
+        if len(self.error_samples) < self.sample_size:
+            self.error_samples.append(parsed)
+        else:
+            idx = random.randrange(self.error_seen)
+            if idx < self.sample_size:
+                self.error_samples[idx] = parsed
+
+    def merge(self, other: "LevelStats"):
+        """合併另一段的統計；sample 依兩邊看過的 ERROR 數加權抽取。"""
+        self.counts.update(other.counts)
+        self.formats.update(other.formats)
+        pools = [list(self.error_samples), list(other.error_samples)]
+        remaining = [self.error_seen, other.error_seen]
+        merged = []
+        while len(merged) < self.sample_size and sum(remaining) > 0:
+            side = 0 if random.randrange(sum(remaining)) < remaining[0] else 1
+            pool = pools[side]
+            merged.append(pool.pop(random.randrange(len(pool))))
+            remaining[side] -= 1
+        self.error_samples = merged
+        self.error_seen += other.error_seen
+
+def aggregate_range(file_path: Path, start: int, end: int, sample_size: int,
+                    fmt: str = DEFAULT_FORMAT) -> LevelStats:
+    """Worker：以指定格式完整解析單一 byte 區段，回傳可合併的 LevelStats。"""
+    parse = LOG_FORMATS[fmt].parse
+    stats = LevelStats(sample_size)
+    with file_path.open("rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # 只依 "\n" 切行：splitlines() 也會在 U+2028 / \x85 / \x0c 等字元切開，
+    # 與逐行串流的結果不一致
+    lines = data.decode("utf-8").split("\n")
+    if lines[-1] == "":
+        lines.pop()                  # 區段結尾的換行
+    for line in lines:
+        stats.add(parse(line.rstrip("\r")))
+    return stats
+
+class LevelCache:
+    """
+    用 05 的解析快取（log_cache.ParseCache）統計手機 App 格式 log 的等級。
+
+    - 快取存的是 mobile_log_basic_ai 解析後的列式資料，這裡只讀 level 一欄；
+      未變動的檔案直接命中，只往後追加的檔案只解析新增的部分
+    - 快取只保留解析得出來的行：解析不了的行不會出現在 UNKNOWN 裡
+    - 需要 ERROR 訊息內容（--sample-errors）時仍逐行解析，不走快取
+    - ParseCache 不是 thread-safe，多檔模式下以 lock 保護；解析本來就受 GIL
+      限制，序列化不會損失多少，讀 level 欄則在 lock 之外進行
+
+    本程式平常不依賴 05 的程式碼：只有建立 LevelCache 時才把 ANALYTICS_DIR
+    暫時放到模組搜尋路徑最前面（本目錄也有一個同名的 mobile_log_basic_ai.py），
+    載入完就移除。
+    """
+
+    FORMAT = "mobile"                   # ParseCache 解析的格式
+
+    def __init__(self, cache_dir: Path):
+        if not ANALYTICS_DIR.is_dir():
+            raise RuntimeError(f"--cache-dir 需要 05 的 log_cache.py，找不到 {ANALYTICS_DIR}")
+        sys.path.insert(0, str(ANALYTICS_DIR))
+        try:
+            from log_cache import ParseCache
+            from log_columnar import iter_column_chunks
+        finally:
+            sys.path.remove(str(ANALYTICS_DIR))
+        self._iter_column_chunks = iter_column_chunks
+        self.cache = ParseCache(cache_dir)
+        self._lock = threading.Lock()
+
+    def counts(self, file_path: Path) -> Counter:
+        """回傳 file_path 各等級的行數（只含解析得出來的行）。"""
+        with self._lock:
+            parts = self.cache.parts(file_path)
+        levels = Counter()
+        for part in parts:
+            for chunk in self._iter_column_chunks(part, ("level",)):
+                levels.update(chunk["level"])
+        counts = Counter()
+        for level, n in levels.items():
+            counts[LEVEL_NAMES.get(str(level).encode("utf-8"), "UNKNOWN")] += n
+        return counts
+
+    def close(self):
+        """寫回快取索引（整批處理完只寫一次）。"""
+        with self._lock:
+            self.cache.close()
+        logging.info(f"解析快取：命中 {self.cache.hits}、增量 {self.cache.appends}、"
+                     f"重新解析 {self.cache.misses}")
+
+def analyze_log(file_path: Path, workers: int = 1, sample_errors: int = 0,
+                cache: LevelCache = None) -> dict:
+    """
+    讀檔並統計 log 等級，記憶體用量與檔案大小無關。
+
+    - 預設只需要數量，走 mmap 快速路徑，不 decode 每一行
+    - workers > 1 時把檔案切段，以多個 process 平行統計
+    - sample_errors=N 時才完整解析每行，隨機保留最多 N 筆 ERROR 行
+      放進 report["error_samples"]，供建議措施參考
+    - 壓縮檔無法依 byte 位置切段，改為單一串流邊解壓邊統計
+    - log 格式由 detect_format() 判斷一次，所有 worker 都用同一個格式
+    - 傳入 cache 且是手機 App 格式時，數量改從解析快取的 level 欄取得
+    """
+    stats = LevelStats(sample_errors)
 
     try:
-        with file_path.open("r", encoding="utf-8") as f:
-            for line in f:
-                parsed = parse_line(line)
-                parsed_lines.append(parsed)
-                counts[parsed["level"]] += 1
+        compression = detect_compression(file_path)
+        fmt = detect_format(file_path, compression)
+        logging.info(f"log 格式：{fmt}")
+        if cache is not None and fmt == cache.FORMAT and not sample_errors:
+            stats.counts = cache.counts(file_path)
+        elif compression:
+            stats = stream_stats(file_path, compression, sample_errors, fmt)
+        elif workers > 1:
+            # 平行模式：各 worker 回傳可相加的 Counter / LevelStats，最後合併
+            ranges = list(iter_byte_ranges(file_path, CHUNK_SIZE))
+            starts = [r[0] for r in ranges]
+            ends = [r[1] for r in ranges]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                if sample_errors:
+                    for partial in pool.map(aggregate_range, [file_path] * len(ranges),
+                                            starts, ends, [sample_errors] * len(ranges),
+                                            [fmt] * len(ranges)):
+                        stats.merge(partial)
+                else:
+                    for partial in pool.map(count_levels_mmap, [file_path] * len(ranges),
+                                            starts, ends, [fmt] * len(ranges)):
+                        stats.counts.update(partial)
+        elif sample_errors:
+            # 需要訊息內容：逐行解析，但只保留 reservoir 內的幾筆
+            parse = LOG_FORMATS[fmt].parse
+            with file_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    stats.add(parse(line))
+        else:
+            stats.counts = count_levels_mmap(file_path, fmt=fmt)
+        stats.formats[fmt] = 1
 
     except FileNotFoundError:
         logging.error(f"檔案不存在：{file_path}")
@@ -87,15 +525,21 @@ def analyze_log(file_path: Path) -> dict:
         logging.exception(f"讀檔時發生錯誤：{e}")
         raise
 
+    return build_report(str(file_path), stats, sample_errors)
+
+def build_report(label: str, stats: LevelStats, sample_errors: int = 0) -> dict:
+    """把 LevelStats 轉成報表 dict（單檔 / 多檔共用）。"""
+    counts = stats.counts
     total = sum(counts.values())
     error_ratio = counts["ERROR"] / total if total else 0
 
     report = {
-        "file": str(file_path),
+        "file": label,
         "generated_at": datetime.utcnow().isoformat() + "Z",
         "total_lines": total,
         "counts": dict(counts),
         "error_ratio": round(error_ratio, 4),
+        "formats": dict(stats.formats),
     }
 
     # 若 ERROR 佔比超過門檻，加入建議
@@ -107,9 +551,90 @@ def analyze_log(file_path: Path) -> dict:
             "若持續高併發，考慮實行排隊或限流機制。"
         ]
 
-    # 也可以把每行原始資料寫進 report 以備追蹤（但注意大小）
-    # report["lines"] = parsed_lines
+    # 附上少量 ERROR 範例行以備追蹤（數量固定，不會隨 log 變大）
+    if sample_errors:
+        report["error_samples"] = stats.error_samples
+
+    return report
+
+def expand_log_paths(target) -> list:
+    """把檔案 / 目錄 / glob 樣式展開成排序後的檔案清單。"""
+    path = Path(target)
+    if path.is_file():
+        return [path]
+    if path.is_dir():
+        return sorted(p for p in path.rglob(FLEET_PATTERN) if p.is_file())
+    return sorted(Path(p) for p in glob.glob(str(target), recursive=True) if Path(p).is_file())
+
+def stream_stats(file_path: Path, compression: str, sample_errors: int = 0,
+                 fmt: str = DEFAULT_FORMAT) -> LevelStats:
+    """邊解壓邊統計單一壓縮檔。"""
+    stats = LevelStats(sample_errors)
+    with open_decompressed(file_path, compression) as stream:
+        if not sample_errors:
+            stats.counts = count_levels_stream(stream, fmt)
+            return stats
+        parse = LOG_FORMATS[fmt].parse
+        for line in io.TextIOWrapper(stream, encoding="utf-8"):
+            stats.add(parse(line))
+    return stats
+
+def file_stats(file_path: Path, sample_errors: int = 0, cache: LevelCache = None) -> LevelStats:
+    """
+    Thread worker：統計單一檔案（多檔模式使用；解壓縮時不佔 GIL，可平行）。
+
+    每個檔案各自判斷格式，混合格式的機群也都走各自的快速路徑。
+    """
+    compression = detect_compression(file_path)
+    fmt = detect_format(file_path, compression)
+    if cache is not None and fmt == cache.FORMAT and not sample_errors:
+        stats = LevelStats()
+        stats.counts = cache.counts(file_path)
+    elif compression:
+        stats = stream_stats(file_path, compression, sample_errors, fmt)
+    elif not sample_errors:
+        stats = LevelStats()
+        stats.counts = count_levels_mmap(file_path, fmt=fmt)
+    else:
+        stats = aggregate_range(file_path, 0, file_path.stat().st_size, sample_errors, fmt)
+    stats.formats[fmt] = 1
+    return stats
 
+def analyze_logs(paths: list, concurrency: int = FLEET_CONCURRENCY, sample_errors: int = 0,
+                 cache: LevelCache = None) -> dict:
+    """
+    多檔模式：同時統計大量小檔（例如每台裝置一份 log），合併成一份報表。
+
+    - 以 thread pool 同時開檔、讀取，瓶頸是 I/O 而不是逐一開檔的延遲
+    - 最多 concurrency * 2 個檔案同時在處理中（backpressure），
+      結果一完成就 merge 進同一個 LevelStats，記憶體與檔案數無關
+    - 單一檔案讀取失敗只記錄警告並略過，不中斷整批
+    """
+    stats = LevelStats(sample_errors)
+    failed = []
+    window = max(1, concurrency) * 2
+    todo = iter(paths)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        pending = deque()
+        for path in todo:
+            pending.append((path, pool.submit(file_stats, path, sample_errors, cache)))
+            if len(pending) >= window:
+                break
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(todo, None)
+            if next_path is not None:
+                pending.append((next_path, pool.submit(file_stats, next_path, sample_errors, cache)))
+            try:
+                stats.merge(future.result())
+            except READ_ERRORS as e:
+                logging.warning(f"略過無法讀取的檔案 {path}：{e}")
+                failed.append(str(path))
+
+    report = build_report(f"{len(paths)} files", stats, sample_errors)
+    report["files"] = len(paths) - len(failed)
+    if failed:
+        report["failed_files"] = failed
     return report
 
 def print_table(report: dict):
@@ -118,22 +643,55 @@ def print_table(report: dict):
     print(f"檔案: {report['file']}")
     print(f"總行數: {report['total_lines']}")
     print(f"ERROR 占比: {report['error_ratio']*100:.2f}%")
+    if report.get("formats"):
+        print("格式: " + ", ".join(f"{name} x{n}" for name, n in sorted(report["formats"].items())))
     print("\n等級統計:")
-    for level in ["INFO", "WARN", "ERROR", "UNKNOWN"]:
+    for level in ["DEBUG", "INFO", "WARN", "ERROR", "UNKNOWN"]:
         print(f"  {level:6}: {report['counts'].get(level, 0)}")
     if "recommendations" in report:
         print("\n⚠️  建議措施:")
         for idx, rec in enumerate(report["recommendations"], 1):
             print(f"  {idx}. {rec}")
+    if report.get("error_samples"):
+        print("\nERROR 範例:")
+        for sample in report["error_samples"]:
+            print(f"  [{sample['datetime']}] {sample['message']}")
 
 def main():
-    logging.info(f"開始分析 log：{LOG_FILE}")
+    parser = argparse.ArgumentParser(description="簡易 log 等級分析器")
+    parser.add_argument("logfile", nargs="?", default=str(LOG_FILE),
+                        help="要分析的 log 檔；也可以是目錄或 glob 樣式（多檔模式）")
+    parser.add_argument("--workers", type=int, default=1, help="平行處理的 process 數（預設 1）")
+    parser.add_argument("--sample-errors", type=int, default=0, metavar="N",
+                        help="隨機保留 N 筆 ERROR 行放進報表（需逐行解析，較慢）")
+    parser.add_argument("--concurrency", type=int, default=FLEET_CONCURRENCY,
+                        help=f"多檔模式下同時處理的檔案數（預設 {FLEET_CONCURRENCY}）")
+    parser.add_argument("--cache-dir", default=None,
+                        help="共用 05 的解析快取（手機 App 格式的 log 不必每次重新掃描）")
+    args = parser.parse_args()
+    log_file = Path(args.logfile)
+    log_files = expand_log_paths(args.logfile)
 
+    logging.info(f"開始分析 log：{log_file}")
+
+    cache = None
     try:
-        report = analyze_log(LOG_FILE)
-    except Exception:
-        logging.error("分析失敗，程式結束。")
+        if args.cache_dir:
+            cache = LevelCache(Path(args.cache_dir))
+        if len(log_files) > 1:
+            logging.info(f"多檔模式：{len(log_files)} 個檔案，同時處理 {args.concurrency} 個")
+            report = analyze_logs(log_files, concurrency=args.concurrency,
+                                  sample_errors=args.sample_errors, cache=cache)
+        else:
+            report = analyze_log(log_files[0] if log_files else log_file,
+                                 workers=args.workers, sample_errors=args.sample_errors,
+                                 cache=cache)
+    except Exception as e:
+        logging.error(f"分析失敗，程式結束：{e}")
         return
+    finally:
+        if cache is not None:
+            cache.close()
 
     # 輸出 JSON 報表
     try:
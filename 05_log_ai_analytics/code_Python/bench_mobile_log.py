@@ -0,0 +1,777 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+bench_mobile_log.py
+
+mobile_log_basic_ai.py 的效能量測腳本（教學示範用）：
+- 用合成的 Mobile / NetService / AIInference log 產生任意行數的輸入
+- 比較「舊版寫法」與「目前版本」的耗時，並確認結果一致
+
+用法:
+    python bench_mobile_log.py tokenizer [--lines=10000000]
+    python bench_mobile_log.py memory [--lines=100000]
+    python bench_mobile_log.py parallel [--lines=2000000] [--workers=1,2,4,8]
+    python bench_mobile_log.py sketch [--samples=1000000]
+    python bench_mobile_log.py columnar [--lines=1000000]
+    python bench_mobile_log.py metrics [--rows=50000000] [--exact]   # 需要 numpy
+    python bench_mobile_log.py json [--lines=1000000]
+    python bench_mobile_log.py cache [--lines=1000000]
+    python bench_mobile_log.py filter [--lines=1000000]
+    python bench_mobile_log.py requests [--requests=2000000]
+    python bench_mobile_log.py sessions [--users=200000]
+    python bench_mobile_log.py index [--lines=1000000]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from itertools import cycle, islice
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import log_cache
+import log_columnar
+import log_index
+import mobile_log_basic_ai as parser_ai
+import mobile_log_metrics_ai as metrics_ai
+
+# 與 example_logs.jsonl 相同風格的樣本行，另外加入含空白的引號值
+SAMPLE_LINES = [
+    "2025-11-16 09:00:01 INFO MobileApp user_id=alice action=open_app device=Pixel7 os=Android14",
+    "2025-11-16 09:00:02 DEBUG MobileApp user_id=alice screen=login duration_ms=532",
+    "2025-11-16 09:00:05 INFO NetService iface=wlan0 event=dhcp_renew ip=192.168.1.23 lease_s=3600",
+    "2025-11-16 09:00:08 INFO AIInference model=asr-small-v1 req_id=1 latency_ms=123 text_len=48",
+    "2025-11-16 09:00:17 INFO NetService event=http_500 path=/v1/settings user_id=alice",
+    "2025-11-16 09:00:22 INFO AIInference model=llm-chat-v2 req_id=42 latency_ms=812 tokens_in=128 tokens_out=96",
+    "2025-11-16 09:00:35 DEBUG MobileApp user_id=bob items_loaded=20 duration_ms=98 scroll_event",
+    '2025-11-16 09:01:40 ERROR AIInference model=llm-chat-v2 event=gpu_oom msg="CUDA out of memory" vram_used_mb=7900',
+]
+
+EXAMPLE_SIZE = 115   # example_logs.jsonl 的行數
+
+
+def synthetic_lines(n: int) -> Iterator[str]:
+    """循環產生 n 行合成 log（generator，不會一次佔用大量記憶體）。"""
+    return islice(cycle(SAMPLE_LINES), n)
+
+
+def write_synthetic_log(path: Path, n: int) -> None:
+    """把 n 行合成 log 寫進檔案，給需要真實檔案的 benchmark 使用。"""
+    with path.open("w", encoding="utf-8") as f:
+        for line in synthetic_lines(n):
+            f.write(line + "\n")
+
+
+# ===================== 舊版實作（對照組） ===================== #
+def _parse_body_legacy(body: str):
+    """重構前的 _parse_body：每次呼叫都 re.compile，並逐 token fullmatch。"""
+    fields: Dict[str, str] = {}
+    raw_tokens: List[str] = []
+    kv_pattern = re.compile(r'(\w+)=(".*?"|\S+)')
+    for token in body.split():
+        match = kv_pattern.fullmatch(token)
+        if match:
+            key, value = match.group(1), match.group(2)
+            if value.startswith('"') and value.endswith('"'):
+                value = value[1:-1]
+            fields[key] = value
+        else:
+            raw_tokens.append(token)
+    return fields, " ".join(raw_tokens)
+
+
+@dataclass
+class _LegacyLogEntry:
+    """重構前的 LogEntry：一般 dataclass，每筆都有 __dict__。"""
+    timestamp: str
+    level: str
+    source: str
+    fields: Dict[str, str]
+    raw_message: str = ""
+
+
+def _parse_line_legacy(line: str):
+    parts = line.split()
+    if len(parts) < 4:
+        return None
+    fields, raw_message = _parse_body_legacy(" ".join(parts[4:]))
+    return _LegacyLogEntry(f"{parts[0]} {parts[1]}", parts[2], parts[3], fields, raw_message)
+
+
+def _time_tokenizer(func, bodies) -> float:
+    start = time.perf_counter()
+    for body in bodies:
+        func(body)
+    return time.perf_counter() - start
+
+
+def bench_tokenizer(lines: int) -> None:
+    """比較舊版與新版 key=value tokenizer。"""
+    for label, n in (("example size", EXAMPLE_SIZE), ("synthetic", lines)):
+        bodies = (line.split(None, 4)[4] for line in synthetic_lines(n))
+        legacy = _time_tokenizer(_parse_body_legacy, bodies)
+        bodies = (line.split(None, 4)[4] for line in synthetic_lines(n))
+        current = _time_tokenizer(parser_ai._parse_body, bodies)
+
+        print(f"\n[INFO] {label}: {n:,} lines")
+        print(f"[INFO] legacy  : {legacy:.4f} sec ({n / legacy:,.0f} lines/sec)")
+        print(f"[INFO] current : {current:.4f} sec ({n / current:,.0f} lines/sec)")
+        print(f"[INFO] speedup : x{legacy / current:.2f}")
+
+    # ----------------- 結果一致性 -----------------
+    # 含空白的引號值舊版會切壞，所以只比對不含空白引號的樣本
+    for line in SAMPLE_LINES:
+        body = line.split(None, 4)[4]
+        if '"' not in body:
+            assert _parse_body_legacy(body) == parser_ai._parse_body(body), "結果不一致！"
+    fields, _ = parser_ai._parse_body(SAMPLE_LINES[-1].split(None, 4)[4])
+    assert fields["msg"] == "CUDA out of memory", "引號值解析錯誤！"
+
+
+def _bytes_per_entry(parse, n: int) -> float:
+    """用 tracemalloc 量測保留 n 筆 entry 時，平均每筆佔用的 bytes。"""
+    # 先把輸入行建好，避免把輸入字串本身算進去
+    lines = list(synthetic_lines(n))
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    entries = [parse(line) for line in lines]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(entries) == n
+    return (after - before) / n
+
+
+def bench_memory(lines: int) -> None:
+    """比較舊版 dataclass 與 slotted + interned LogEntry 的記憶體用量。"""
+    legacy = _bytes_per_entry(_parse_line_legacy, lines)
+    current = _bytes_per_entry(parser_ai.parse_line, lines)
+
+    print(f"\n[INFO] entries retained: {lines:,}")
+    print(f"[INFO] legacy  : {legacy:,.0f} bytes/entry")
+    print(f"[INFO] current : {current:,.0f} bytes/entry")
+    print(f"[INFO] saved   : {1 - current / legacy:.1%}")
+
+    # ----------------- API 相容性 -----------------
+    for line in SAMPLE_LINES:
+        if '"' not in line:
+            assert asdict(_parse_line_legacy(line)) == asdict(parser_ai.parse_line(line)), "結果不一致！"
+
+
+def bench_parallel(lines: int, workers_list: List[int]) -> None:
+    """量測 convert_to_json_lines 在不同 worker 數下的擴展性。"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = Path(tmp) / "synthetic.log"
+        write_synthetic_log(log_path, lines)
+        size_mb = log_path.stat().st_size / 1024 / 1024
+        print(f"\n[INFO] synthetic log: {lines:,} lines, {size_mb:.1f} MB, "
+              f"{os.cpu_count()} CPUs")
+
+        # 切小一點的 chunk，讓中型檔案也能分給所有 worker
+        parser_ai.CHUNK_SIZE = max(1024 * 1024, log_path.stat().st_size // (4 * max(workers_list)))
+
+        baseline = None
+        for workers in workers_list:
+            stats = parser_ai.convert_to_json_lines(log_path, Path(tmp) / "out.jsonl", workers=workers)
+            assert stats.entries == lines, "筆數不一致！"
+            baseline = baseline or stats.elapsed_s
+            print(f"[INFO] workers={workers:<3}: {stats.elapsed_s:.3f} sec "
+                  f"({stats.lines_per_sec:,.0f} lines/sec, x{baseline / stats.elapsed_s:.2f})")
+
+
+def bench_sketch(samples: int) -> None:
+    """比較 DDSketch 與精確分位數的誤差、耗時與記憶體（bucket 數 vs 樣本數）。"""
+    rng = random.Random(42)
+    # 長尾延遲分佈：大多數 100~200 ms，少數到數秒
+    latencies = [int(rng.lognormvariate(5.0, 0.6)) for _ in range(samples)]
+
+    results = {}
+    for engine in (metrics_ai.ExactQuantiles, metrics_ai.DDSketch):
+        start = time.perf_counter()
+        q = engine()
+        for value in latencies:
+            q.add(value)
+        pcts = {pct: q.percentile(pct) for pct in metrics_ai.PERCENTILES}
+        results[engine.__name__] = (q, pcts, time.perf_counter() - start)
+
+    exact, exact_pcts, exact_time = results["ExactQuantiles"]
+    sketch, sketch_pcts, sketch_time = results["DDSketch"]
+    print(f"\n[INFO] samples: {samples:,}")
+    print(f"[INFO] exact  : {exact_time:.3f} sec, {len(exact.values):,} values kept")
+    print(f"[INFO] sketch : {sketch_time:.3f} sec, {len(sketch.buckets):,} buckets kept")
+
+    # 誤差上界的檢查在 test_mobile_log_metrics.py，這裡只列出實測誤差
+    for pct in metrics_ai.PERCENTILES:
+        want, got = exact_pcts[pct], sketch_pcts[pct]
+        err = abs(got - want) / want
+        print(f"[INFO] P{pct}: exact = {want}, sketch = {got:.2f}, error = {err:.3%}")
+
+
+def bench_columnar(lines: int) -> None:
+    """比較 JSONL 與列式格式的寫入耗時、檔案大小，以及 metrics 需要欄位的讀回耗時。"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = Path(tmp) / "synthetic.log"
+        write_synthetic_log(log_path, lines)
+        entries = parser_ai.parse_file(log_path)
+        print(f"\n[INFO] entries: {len(entries):,}")
+
+        outputs = {
+            "jsonl": (Path(tmp) / "out.jsonl", parser_ai.write_json_lines),
+            "columnar": (Path(tmp) / ("out" + log_columnar.default_suffix()), parser_ai.write_columnar),
+        }
+        latencies = {}
+        for label, (out, write) in outputs.items():
+            start = time.perf_counter()
+            assert write(out, entries) == len(entries), "筆數不一致！"
+            write_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if label == "jsonl":
+                with out.open(encoding="utf-8") as f:
+                    rows = [json.loads(line) for line in f]
+                latencies[label] = [r["fields"].get("latency_ms") for r in rows]
+            else:
+                latencies[label] = [
+                    v for chunk in log_columnar.iter_column_chunks(out, metrics_ai.METRIC_COLUMNS)
+                    for v in chunk["latency_ms"]
+                ]
+            load_time = time.perf_counter() - start
+            size_mb = out.stat().st_size / 1024 / 1024
+            print(f"[INFO] {label:<8}: write {write_time:.3f} sec, load {load_time:.3f} sec, "
+                  f"{size_mb:.2f} MB")
+
+        # ----------------- 結果一致性 -----------------
+        want = [None if v is None else int(v) for v in latencies["jsonl"]]
+        assert want == latencies["columnar"], "結果不一致！"
+
+
+# metrics 引擎比較用的樣板：(source, model, event, action, user_id, 有 latency_ms)
+METRIC_TEMPLATES = [
+    ("MobileApp", "", "", "login_success", "alice", False),
+    ("MobileApp", "", "", "login_failure", "bob", False),
+    ("MobileApp", "", "", "open_app", "carol", False),
+    ("NetService", "", "http_200", "", "", False),
+    ("NetService", "", "http_404", "", "", False),
+    ("NetService", "", "http_503", "", "", False),
+    ("NetService", "", "wifi_disconnected", "", "", False),
+    ("AIInference", "asr-small-v1", "", "", "", True),
+    ("AIInference", "llm-chat-v2", "", "", "", True),
+    ("AIInference", "llm-chat-v2", "health_check", "", "", False),
+]
+
+
+def _synthetic_metric_chunk(rng, n: int) -> dict:
+    """產生 n 列與 log_columnar.iter_array_chunks 相同形狀的欄位。"""
+    np = metrics_ai.np
+    pick = rng.integers(0, len(METRIC_TEMPLATES), n)
+    chunk = {}
+    for i, name in enumerate(("source", "model", "event", "action", "user_id")):
+        table = sorted({t[i] for t in METRIC_TEMPLATES})
+        codes = np.array([table.index(t[i]) for t in METRIC_TEMPLATES], dtype=np.int32)
+        chunk[name] = (codes[pick], table)
+    latencies = rng.lognormal(5.0, 0.6, n).astype(np.int64)
+    has_latency = np.array([t[5] for t in METRIC_TEMPLATES])[pick]
+    health = pick == len(METRIC_TEMPLATES) - 1          # 最後一個樣板是 health_check
+    chunk["latency_ms"] = np.where(has_latency, latencies, log_columnar.NULL)
+    chunk["avg_latency_ms"] = np.where(health, latencies, log_columnar.NULL)
+    return chunk
+
+
+def _chunk_to_entries(chunk: dict) -> List[dict]:
+    """把欄位陣列還原成 JSONL 形狀的 entry（給 Python 引擎用，不計時）。"""
+    names = ("model", "event", "action", "user_id", "latency_ms", "avg_latency_ms")
+    decoded = {}
+    for name in ("source",) + names:
+        col = chunk[name]
+        if isinstance(col, tuple):
+            codes, table = col
+            decoded[name] = [table[c] for c in codes.tolist()]
+        else:
+            decoded[name] = col.tolist()
+    entries = []
+    for source, *values in zip(*(decoded[n] for n in ("source",) + names)):
+        fields = {n: str(v) for n, v in zip(names, values) if v != "" and v != log_columnar.NULL}
+        entries.append({"source": source, "fields": fields})
+    return entries
+
+
+def bench_metrics(rows: int, exact: bool, chunk_rows: int = 1_000_000) -> None:
+    """比較 metrics 的 Python 逐筆引擎與 NumPy 批次引擎（只計彙整時間），並確認輸出相同。"""
+    if metrics_ai.np is None:
+        raise SystemExit("[ERROR] metrics benchmark 需要 numpy")
+    rng = metrics_ai.np.random.default_rng(42)
+    engines = {
+        "python": metrics_ai.MetricTotals(metrics_ai.ExactQuantiles if exact else metrics_ai.DDSketch),
+        "numpy": metrics_ai.MetricTotals(metrics_ai.ArrayQuantiles if exact else metrics_ai.DDSketch),
+    }
+    elapsed = {"python": 0.0, "numpy": 0.0}
+
+    done = 0
+    while done < rows:
+        n = min(chunk_rows, rows - done)
+        chunk = _synthetic_metric_chunk(rng, n)
+        entries = _chunk_to_entries(chunk)
+
+        start = time.perf_counter()
+        metrics_ai.aggregate_entries(engines["python"], entries)
+        elapsed["python"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        metrics_ai.aggregate_arrays(engines["numpy"], chunk)
+        elapsed["numpy"] += time.perf_counter() - start
+        done += n
+
+    print(f"\n[INFO] rows: {rows:,} ({'exact' if exact else 'sketch'} quantiles)")
+    for label, sec in elapsed.items():
+        print(f"[INFO] {label:<6}: {sec:.3f} sec ({rows / sec:,.0f} rows/sec)")
+    print(f"[INFO] speedup: x{elapsed['python'] / elapsed['numpy']:.2f}")
+
+    # ----------------- 結果一致性 -----------------
+    want = json.dumps(metrics_ai.summarize(engines["python"]), ensure_ascii=False, indent=2)
+    got = json.dumps(metrics_ai.summarize(engines["numpy"]), ensure_ascii=False, indent=2)
+    assert want == got, "結果不一致！"
+
+
+def bench_json(lines: int) -> None:
+    """比較各 JSON 解碼後端的每行耗時，並確認彙整結果相同。"""
+    records = [
+        json.dumps(asdict(parser_ai.parse_line(line)), ensure_ascii=False)
+        for line in SAMPLE_LINES
+    ]
+    raw_lines = list(islice(cycle(records), lines))
+    print(f"\n[INFO] JSONL lines: {lines:,}")
+
+    summaries = {}
+    for backend in metrics_ai.JSON_BACKENDS[1:]:
+        try:
+            name, decode, _ = metrics_ai.make_decoder(backend)
+        except RuntimeError:
+            print(f"[INFO] {backend:<8}: not installed, skipped")
+            continue
+        # 只計解碼：不保留結果，避免把 list 成長與 GC 算進去
+        start = time.perf_counter()
+        for raw in raw_lines:
+            decode(raw)
+        elapsed = time.perf_counter() - start
+        print(f"[INFO] {name:<8}: {elapsed:.3f} sec ({elapsed / lines * 1e9:,.0f} ns/line)")
+
+        totals = metrics_ai.MetricTotals(metrics_ai.ExactQuantiles)
+        metrics_ai.aggregate_entries(totals, (decode(raw) for raw in raw_lines))
+        summaries[name] = metrics_ai.summarize(totals)
+
+    # ----------------- 結果一致性 -----------------
+    for name, summary in summaries.items():
+        assert summary == summaries["json"], f"{name} 結果不一致！"
+
+
+def _cached_latencies(parts) -> List:
+    return [v for part in parts
+            for chunk in log_columnar.iter_column_chunks(part, ("latency_ms",))
+            for v in chunk["latency_ms"]]
+
+
+def bench_cache(lines: int) -> None:
+    """量測解析快取：冷啟動、未變動命中、尾端追加（只解析新增行），並與直接解析比對。"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = Path(tmp) / "device.log"
+        write_synthetic_log(log_path, lines)
+        cache = log_cache.ParseCache(Path(tmp) / "cache")
+        print(f"\n[INFO] lines: {lines:,}")
+
+        start = time.perf_counter()
+        parser_ai.parse_file(log_path)
+        print(f"[INFO] parse only   : {time.perf_counter() - start:.3f} sec")
+
+        start = time.perf_counter()
+        cache.parts(log_path)
+        print(f"[INFO] cold (miss)  : {time.perf_counter() - start:.3f} sec")
+
+        start = time.perf_counter()
+        parts = cache.parts(log_path)
+        print(f"[INFO] warm (hit)   : {time.perf_counter() - start:.3f} sec")
+
+        # 追加 1% 的新行：只有尾端需要解析
+        with log_path.open("a", encoding="utf-8") as f:
+            for line in synthetic_lines(max(1, lines // 100)):
+                f.write(line + "\n")
+        start = time.perf_counter()
+        parts = cache.parts(log_path)
+        print(f"[INFO] append 1%    : {time.perf_counter() - start:.3f} sec ({len(parts)} parts)")
+        assert (cache.hits, cache.appends, cache.misses) == (1, 1, 1), "快取狀態不符預期！"
+
+        # ----------------- 結果一致性 -----------------
+        want = [e.fields.get("latency_ms") for e in parser_ai.iter_entries(log_path)]
+        want = [None if v is None else int(v) for v in want]
+        assert want == _cached_latencies(parts), "結果不一致！"
+        cache.close()
+
+        # ----------------- 機群：大量小檔 -----------------
+        fleet = []
+        for i in range(500):
+            path = Path(tmp) / f"fleet_{i}.log"
+            write_synthetic_log(path, 20 + i)
+            fleet.append(path)
+        for label in ("cold", "warm"):
+            start = time.perf_counter()
+            with log_cache.ParseCache(Path(tmp) / "cache") as cache:
+                for path in fleet:
+                    cache.parts(path)
+            print(f"[INFO] fleet {label:<6}: {time.perf_counter() - start:.3f} sec "
+                  f"({len(fleet)} files)")
+        assert cache.hits == len(fleet), "關閉後重開，index 應該已寫回！"
+
+        # 容量上限：只保留最近使用的檔案，記錄的大小與磁碟上一致
+        with log_cache.ParseCache(Path(tmp) / "cache", max_bytes=cache.total_bytes() // 4) as cache:
+            cache.parts(fleet[0])
+            on_disk = sum(p.stat().st_size for p in cache.cache_dir.glob("*.npz"))
+            assert cache.total_bytes() == cache._total == on_disk <= cache.max_bytes, "容量計算錯誤！"
+
+
+# filter 比較用的查詢：(說明, LogFilter)
+FILTER_QUERIES = [
+    ("level=ERROR", parser_ai.LogFilter(levels=frozenset({"ERROR"}))),
+    ("user_id=bob", parser_ai.LogFilter(field_equals=(("user_id", "bob"),))),
+    ("AIInference model=asr-small-v1", parser_ai.LogFilter(
+        sources=frozenset({"AIInference"}), field_equals=(("model", "asr-small-v1"),))),
+    ("time range", parser_ai.LogFilter(since="2025-11-16 09:00:10", until="2025-11-16 09:00:30")),
+]
+
+
+def bench_filter(lines: int) -> None:
+    """比較「完整解析後再過濾」與 predicate pushdown（先看 raw bytes / header）的耗時。"""
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = Path(tmp) / "synthetic.log"
+        write_synthetic_log(log_path, lines)
+        print(f"\n[INFO] lines: {lines:,}")
+
+        for label, where in FILTER_QUERIES:
+            start = time.perf_counter()
+            want = [e for e in parser_ai.iter_entries(log_path) if where.matches(e)]
+            full_elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            got = [e.to_entry() for e in parser_ai.iter_filtered_entries(log_path, where)]
+            pushdown_elapsed = time.perf_counter() - start
+
+            # ----------------- 結果一致性 -----------------
+            assert got == want, f"{label} 結果不一致！"
+            print(f"[INFO] {label:<32}: {len(got) / lines:6.1%} of lines, "
+                  f"full {full_elapsed:.3f} sec, pushdown {pushdown_elapsed:.3f} sec "
+                  f"(x{full_elapsed / pushdown_elapsed:.1f})")
+
+
+def _synthetic_request_halves(rng, n: int, missing: float):
+    """
+    一天份的 request：NetService 一半在 t，AIInference 一半在 t + 0~3 秒（依時間排序）。
+    約 missing 比例的 request 只有其中一半。
+    """
+    models = [("asr-small-v1", "/v1/asr"), ("llm-chat-v2", "/v1/chat"), ("recommend-v1", "/v1/feed")]
+    halves = []
+    for req_id in range(n):
+        t = 1_763_251_200 + rng.randrange(86_400)
+        model, path = models[req_id % len(models)]
+        drop = rng.random() < missing
+        halves.append((t, "NetService", str(req_id), path, rng.randint(20, 200)))
+        if not drop:
+            halves.append((t + rng.randint(0, 3), "AIInference", str(req_id), model,
+                           rng.randint(50, 900)))
+    halves.sort(key=lambda half: half[0])
+    return halves
+
+
+def bench_requests(n: int, missing: float = 0.02) -> None:
+    """req_id 串流 join：與全量 dict join 比對結果，並確認 pending 數量有上限。"""
+    rng = random.Random(42)
+    halves = _synthetic_request_halves(rng, n, missing)
+    print(f"\n[INFO] requests: {n:,}, halves: {len(halves):,}")
+
+    # 對照組：整天的 request 全部放進 dict 再配對（記憶體隨流量成長）
+    start = time.perf_counter()
+    by_req: Dict[str, list] = {}
+    for half in halves:
+        by_req.setdefault(half[2], []).append(half)
+    want = {}
+    for pair in by_req.values():
+        if len(pair) == 2:
+            net, ai = sorted(pair, key=lambda half: half[1] != "NetService")
+            want.setdefault(ai[3], []).append(net[4] + ai[4])
+    naive_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    joiner = metrics_ai.RequestJoiner(metrics_ai.ExactQuantiles, ttl_s=30)
+    peak = 0
+    for half in halves:
+        joiner.add(*half)
+        peak = max(peak, len(joiner.pending))
+    stream_elapsed = time.perf_counter() - start
+
+    print(f"[INFO] naive dict join : {naive_elapsed:.3f} sec, {len(by_req):,} keys held")
+    print(f"[INFO] streaming join  : {stream_elapsed:.3f} sec, peak pending {peak:,}, "
+          f"matched {joiner.matched:,}, expired {joiner.expired:,}")
+
+    # ----------------- 結果一致性 -----------------
+    got = {model: sorted(q.values) for model, q in joiner.by_model.items()}
+    assert got == {model: sorted(v) for model, v in want.items()}, "結果不一致！"
+    assert peak < len(by_req) / 100, "pending 沒有被淘汰！"
+
+
+def _synthetic_user_events(rng, users: int):
+    """一天內每位用戶 1~3 次使用，每次 open_app → 幾個畫面 → close_app（偶爾沒有 close）。"""
+    screens = ["home", "settings", "camera_preview", "dashboard", "feed"]
+    events = []
+    for u in range(users):
+        user = f"user{u}"
+        t = 1_763_251_200 + rng.randrange(80_000)
+        for _ in range(rng.randint(1, 3)):
+            events.append((t, user, "INFO", "open_app", None, None))
+            for _ in range(rng.randint(1, 6)):
+                t += rng.randint(1, 60)
+                level = "ERROR" if rng.random() < 0.02 else "INFO"
+                events.append((t, user, level, "open_screen", rng.choice(screens),
+                               rng.randint(50, 900)))
+            if rng.random() < 0.8:
+                t += rng.randint(1, 30)
+                events.append((t, user, "INFO", "close_app", None, None))
+            t += metrics_ai.SESSION_GAP_S + rng.randint(1, 3_600)
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def bench_sessions(users: int) -> None:
+    """串流 sessionization：與「全部事件依用戶分組再切」比對，並確認狀態只與同時在線用戶數有關。"""
+    rng = random.Random(7)
+    events = _synthetic_user_events(rng, users)
+    print(f"\n[INFO] users: {users:,}, events: {len(events):,}")
+
+    # 對照組：所有用戶的事件都留在記憶體，最後逐一切 session
+    start = time.perf_counter()
+    by_user: Dict[str, list] = {}
+    for event in events:
+        by_user.setdefault(event[1], []).append(event)
+    want = []
+    for user_events in by_user.values():
+        sessionizer = metrics_ai.Sessionizer(metrics_ai.ExactQuantiles, on_session=want.append)
+        for event in user_events:
+            sessionizer.add(*event)
+        sessionizer.finish()
+    naive_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    got = []
+    sessionizer = metrics_ai.Sessionizer(metrics_ai.ExactQuantiles, on_session=got.append)
+    for event in events:
+        sessionizer.add(*event)
+    sessionizer.finish()
+    stream_elapsed = time.perf_counter() - start
+
+    print(f"[INFO] group by user : {naive_elapsed:.3f} sec, {len(by_user):,} users held")
+    print(f"[INFO] streaming     : {stream_elapsed:.3f} sec, {sessionizer.count:,} sessions, "
+          f"peak active users {sessionizer.peak_active:,}")
+
+    # ----------------- 結果一致性 -----------------
+    # 對照組看不到其他用戶的時間，閒置的最後一個 session 只能算 end_of_stream
+    def normalized(sessions):
+        rows = [dict(s, ended_by="idle" if s["ended_by"] == "end_of_stream" else s["ended_by"])
+                for s in sessions]
+        return sorted(rows, key=lambda s: (s["user_id"], s["start"]))
+    assert normalized(got) == normalized(want), "結果不一致！"
+    assert sessionizer.peak_active < users / 10, "閒置用戶沒有被結算！"
+
+    # ----------------- JSONL 解碼後端一致性 -----------------
+    # msgspec 只解碼 MetricFields 宣告過的 key，漏宣告的欄位會被默默丟掉
+    sample = events[:50_000]
+    want = []
+    sessionizer = metrics_ai.Sessionizer(metrics_ai.ExactQuantiles, on_session=want.append)
+    for event in sample:
+        sessionizer.add(*event)
+    sessionizer.finish()
+    want_summary = sessionizer.summary()
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = Path(tmp) / "sessions.jsonl"
+        with log_path.open("w", encoding="utf-8") as f:
+            for ts, user, level, action, screen, duration in sample:
+                fields = {"user_id": user, "action": action}
+                if screen is not None:
+                    fields["screen"] = screen
+                if duration is not None:
+                    fields["duration_ms"] = str(duration)
+                f.write(json.dumps({"timestamp": metrics_ai._iso(ts), "level": level,
+                                    "source": "MobileApp", "fields": fields}) + "\n")
+        for backend in metrics_ai.JSON_BACKENDS[1:]:
+            try:
+                decoder = metrics_ai.make_decoder(backend)
+            except RuntimeError:
+                print(f"[INFO] {backend:<8}: not installed, skipped")
+                continue
+            out = Path(tmp) / f"{backend}.jsonl"
+            summary = metrics_ai.sessionize([log_path], metrics_ai.ExactQuantiles,
+                                            concurrency=1, decoder=decoder, sessions_out=out)
+            with out.open(encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f]
+            assert summary == want_summary and rows == want, f"{backend} 結果不一致！"
+            print(f"[INFO] {backend:<8}: {len(rows):,} sessions, "
+                  f"active_ms {sum(r['active_ms'] for r in rows):,}")
+        assert sum(r["active_ms"] for r in want) > 0
+
+
+def _write_incident_log(path: Path, start: int, n: int, mode: str = "w") -> None:
+    """寫入 n 行 req_id / user_id 各不相同的 log（模擬事故排查時的高基數欄位）。"""
+    with path.open(mode, encoding="utf-8") as f:
+        for i, line in enumerate(synthetic_lines(n), start):
+            line = line.replace("user_id=alice", f"user_id=user{i % 4999}")
+            f.write(re.sub(r"req_id=\d+", f"req_id={i}", line) + "\n")
+
+
+def _scan_offsets(path: Path, criteria) -> List[int]:
+    """對照組：整檔掃描，逐行解析後比對所有 (field, value)。"""
+    offsets, offset = [], 0
+    with path.open("rb") as f:
+        for raw in f:
+            if raw.endswith(b"\n"):
+                entry = parser_ai.parse_line(raw.decode("utf-8").rstrip("\r\n"))
+                if entry is not None:
+                    values = {**entry.fields, "@level": entry.level, "@source": entry.source}
+                    if all(values.get(k) == v for k, v in criteria):
+                        offsets.append(offset)
+            offset += len(raw)
+    return offsets
+
+
+def bench_index(lines: int) -> None:
+    """比較「整檔掃描」與倒排索引查詢，並驗證追加 / compact / 輪替後結果仍一致。"""
+    queries = [
+        [("user_id", "user42")],
+        [("req_id", str(lines // 2 + 3))],
+        [("model", "asr-small-v1")],
+        [("@source", "AIInference"), ("model", "llm-chat-v2"), ("@level", "ERROR")],
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = Path(tmp) / "incident.log"
+        _write_incident_log(log_path, 0, lines)
+        print(f"\n[INFO] lines: {lines:,}, {log_path.stat().st_size / 1024 / 1024:.1f} MB")
+
+        def check(index, label):
+            for criteria in queries:
+                want = _scan_offsets(log_path, criteria)
+                assert index.query(criteria) == want, f"{label} {criteria} 結果不一致！"
+
+        with log_index.LogIndex(log_path) as index:
+            start = time.perf_counter()
+            index.update()
+            info = index.info()
+            print(f"[INFO] build        : {time.perf_counter() - start:.3f} sec, "
+                  f"{info['keys']:,} keys, {info['postings']:,} postings, "
+                  f"{info['index_bytes'] / 1024 / 1024:.1f} MB")
+
+            for criteria in queries:
+                label = " ".join(f"{k}={v}" for k, v in criteria)
+                start = time.perf_counter()
+                want = _scan_offsets(log_path, criteria)
+                scan_elapsed = time.perf_counter() - start
+                start = time.perf_counter()
+                got = [line for _, line in index.iter_lines(index.query(criteria))]
+                index_elapsed = time.perf_counter() - start
+                assert got == [line for _, line in index.iter_lines(want)], f"{label} 結果不一致！"
+                print(f"[INFO] {label:<48}: {len(got):>8,} lines, scan {scan_elapsed:.3f} sec, "
+                      f"index {index_elapsed:.4f} sec (x{scan_elapsed / index_elapsed:,.0f})")
+
+            # 追加 1%，最後一行還沒寫完：只索引完整的新行
+            _write_incident_log(log_path, lines, max(1, lines // 100), mode="a")
+            with log_path.open("a", encoding="utf-8") as f:
+                f.write("2025-11-16 09:02:00 INFO MobileApp user_id=user42 act")
+            start = time.perf_counter()
+            added = index.update()
+            print(f"[INFO] append 1%    : {time.perf_counter() - start:.3f} sec ({added:,} lines)")
+            check(index, "append")
+            with log_path.open("a", encoding="utf-8") as f:
+                f.write("ion=close_app\n")
+            assert index.update() == 1, "未完成的行應在補完後才被索引！"
+            check(index, "append")
+
+            index.compact()
+            assert index.info()["segments"] == 1
+            check(index, "compact")
+
+            # 輪替：同名檔案被改寫，索引必須重建
+            _write_incident_log(log_path, 7, lines // 10)
+            index.update()
+            check(index, "rotate")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mobile_log_basic_ai 效能量測")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p_tok = sub.add_parser("tokenizer", help="key=value tokenizer 新舊版比較")
+    p_tok.add_argument("--lines", type=int, default=10_000_000, help="合成 log 行數")
+
+    p_mem = sub.add_parser("memory", help="LogEntry 每筆記憶體用量（tracemalloc）")
+    p_mem.add_argument("--lines", type=int, default=100_000, help="保留的 entry 筆數")
+
+    p_par = sub.add_parser("parallel", help="多 process 平行解析的擴展性")
+    p_par.add_argument("--lines", type=int, default=2_000_000, help="合成 log 行數")
+    p_par.add_argument("--workers", default="1,2,4,8", help="要量測的 worker 數（逗號分隔）")
+
+    p_sk = sub.add_parser("sketch", help="DDSketch 與精確分位數的誤差比較")
+    p_sk.add_argument("--samples", type=int, default=1_000_000, help="延遲樣本數")
+
+    p_col = sub.add_parser("columnar", help="JSONL 與列式格式的寫入 / 讀回比較")
+    p_col.add_argument("--lines", type=int, default=1_000_000, help="合成 log 行數")
+
+    p_met = sub.add_parser("metrics", help="metrics 的 Python 與 NumPy 引擎比較（需要 numpy）")
+    p_met.add_argument("--rows", type=int, default=50_000_000, help="合成資料列數")
+    p_met.add_argument("--exact", action="store_true", help="用精確分位數（預設為 sketch）")
+
+    p_json = sub.add_parser("json", help="JSONL 解碼後端（json / orjson / msgspec）比較")
+    p_json.add_argument("--lines", type=int, default=1_000_000, help="JSONL 行數")
+
+    p_cache = sub.add_parser("cache", help="解析快取：冷啟動 / 命中 / 尾端追加")
+    p_cache.add_argument("--lines", type=int, default=1_000_000, help="合成 log 行數")
+
+    p_filter = sub.add_parser("filter", help="過濾查詢：完整解析 vs predicate pushdown")
+    p_filter.add_argument("--lines", type=int, default=1_000_000, help="合成 log 行數")
+
+    p_req = sub.add_parser("requests", help="req_id 串流 join 與全量 dict join 比較")
+    p_req.add_argument("--requests", type=int, default=2_000_000, help="一天的 request 數")
+
+    p_sess = sub.add_parser("sessions", help="串流 sessionization 與依用戶分組比較")
+    p_sess.add_argument("--users", type=int, default=200_000, help="一天的用戶數")
+
+    p_index = sub.add_parser("index", help="倒排索引查詢 vs 整檔掃描（含增量更新）")
+    p_index.add_argument("--lines", type=int, default=1_000_000, help="合成 log 行數")
+
+    args = parser.parse_args()
+    if args.bench == "tokenizer":
+        bench_tokenizer(args.lines)
+    elif args.bench == "memory":
+        bench_memory(args.lines)
+    elif args.bench == "parallel":
+        bench_parallel(args.lines, [int(w) for w in args.workers.split(",")])
+    elif args.bench == "sketch":
+        bench_sketch(args.samples)
+    elif args.bench == "columnar":
+        bench_columnar(args.lines)
+    elif args.bench == "metrics":
+        bench_metrics(args.rows, args.exact)
+    elif args.bench == "json":
+        bench_json(args.lines)
+    elif args.bench == "cache":
+        bench_cache(args.lines)
+    elif args.bench == "filter":
+        bench_filter(args.lines)
+    elif args.bench == "requests":
+        bench_requests(args.requests)
+    elif args.bench == "sessions":
+        bench_sessions(args.users)
+    elif args.bench == "index":
+        bench_index(args.lines)
+
+
+if __name__ == "__main__":
+    main()
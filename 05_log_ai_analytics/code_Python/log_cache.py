@@ -0,0 +1,378 @@
+"""
+Persistent on-disk cache of parsed raw logs, stored in columnar form.
+
+Parsing a raw log is by far the most expensive step of any analysis, and
+the same files are analysed again and again.  :class:`ParseCache` keeps the
+parsed result of every raw log as one or more ``.npz`` parts (see
+:mod:`log_columnar`):
+
+* an unchanged file (same size and mtime) is served without parsing;
+* a file that only grew is handled incrementally: only the new tail is
+  parsed into an extra part;
+* anything else is parsed again from scratch.
+
+Growth is recognised by a fingerprint of the first and the last
+:data:`CHECK_BLOCK` bytes of the already-parsed prefix, so a growth check
+reads a bounded amount of data however large the log is.  The trade-off:
+an in-place rewrite that keeps the size, the head and the end of the old
+prefix is not detected -- fine for append-only logs, which is what rotated
+application logs are.
+
+Parts are content-addressed by the BLAKE2b hash of the raw bytes they were
+parsed from (and of the column layout), so identical logs under different
+paths share their parts, and a new layout never reuses stale parts.
+The cache is bounded to ``max_bytes``; least recently used files are evicted
+first.  Part sizes are kept in ``index.json``, and the index is written
+once per batch by :meth:`ParseCache.save` / :meth:`ParseCache.close`, so
+resolving N files costs O(N) filesystem work.  One process should write a
+cache directory at a time.
+
+Users: ``mobile_log_metrics_ai`` reads its metric columns from the parts,
+and ``log_analyzer_ai`` in 03 (``--cache-dir``) reads just the ``level``
+column of mobile-format logs instead of rescanning or decompressing them.
+The alert job in 06 already reads only newly appended bytes via its
+checkpoints, so it has nothing to re-parse.
+
+Command line::
+
+    python log_cache.py info
+    python log_cache.py warm <logfile> [<logfile> ...]
+    python log_cache.py clear
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from log_columnar import COLUMNS, ColumnarWriter
+from log_io import detect_compression
+from mobile_log_basic_ai import LogEntry, iter_entries, parse_line
+
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get("MOBILE_LOG_CACHE_DIR", Path.home() / ".cache" / "mobile_log_cache")
+)
+
+# Upper bound on the total size of all cached parts.
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Block size used when hashing and re-reading raw logs.
+READ_BLOCK = 4 * 1024 * 1024
+
+# Size of the head / tail windows fingerprinted to recognise append-only growth.
+CHECK_BLOCK = 64 * 1024
+
+_INDEX_NAME = "index.json"
+
+# Parts written with a different column layout are stale and get rebuilt.
+SCHEMA = ",".join(COLUMNS)
+
+
+def _hash_range(path: Path, start: int, end: int, hasher=None):
+    """Feed bytes ``[start, end)`` of *path* into a BLAKE2b hasher and return it."""
+    if hasher is None:
+        hasher = hashlib.blake2b(digest_size=20)
+        hasher.update(SCHEMA.encode("ascii"))   # a schema change gives new part names
+    with path.open("rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(READ_BLOCK, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def _fingerprint(path: Path, end: int) -> str:
+    """Hash of the first and last :data:`CHECK_BLOCK` bytes of ``[0, end)``."""
+    hasher = _hash_range(path, 0, min(end, CHECK_BLOCK))
+    return _hash_range(path, max(0, end - CHECK_BLOCK), end, hasher).hexdigest()
+
+
+def _complete_end(path: Path, size: int) -> int:
+    """Offset just past the last newline: a partial last line is left for later."""
+    with path.open("rb") as f:
+        pos = size
+        while pos > 0:
+            start = max(0, pos - 64 * 1024)
+            f.seek(start)
+            block = f.read(pos - start)
+            idx = block.rfind(b"\n")
+            if idx != -1:
+                return start + idx + 1
+            pos = start
+    return 0
+
+
+def _iter_range_entries(path: Path, start: int, end: int) -> Iterator[LogEntry]:
+    """Parse the complete lines in bytes ``[start, end)`` of a plain log."""
+    with path.open("rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = f.read(min(READ_BLOCK, remaining))
+            if not data:
+                break
+            if len(data) < remaining:
+                data += f.readline()       # finish the line the block stopped in
+            remaining -= len(data)
+            for line in data.decode("utf-8").split("\n"):
+                line = line.rstrip("\r")
+                if line:
+                    entry = parse_line(line)
+                    if entry is not None:
+                        yield entry
+
+
+class ParseCache:
+    """
+    Size-bounded, content-addressed cache of parsed raw logs.
+
+    Parameters
+    ----------
+    cache_dir : str | pathlib.Path
+        Directory holding ``index.json`` and the ``.npz`` parts.
+    max_bytes : int
+        Total size of parts kept before least recently used files are
+        evicted.
+
+    Examples
+    --------
+    >>> with ParseCache() as cache:                        # doctest: +SKIP
+    ...     for part in cache.parts("device_42.log"):
+    ...         for chunk in iter_column_chunks(part, ("model", "latency_ms")):
+    ...             ...
+    """
+
+    def __init__(self, cache_dir: str | Path = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / _INDEX_NAME
+        self.index: Dict[str, dict] = self._load_index()
+        self.hits = self.appends = self.misses = 0
+        self._dirty = False
+        self._total = self.total_bytes()
+
+    # ------------------------------------------------------------------ #
+    # Index persistence
+    # ------------------------------------------------------------------ #
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            with self.index_path.open(encoding="utf-8") as f:
+                index = json.load(f)
+            # entries written before part sizes were recorded are rebuilt on use
+            return {key: entry for key, entry in index.items() if "part_bytes" in entry}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            print(f"[WARN] parse cache index unreadable, starting empty: {exc}")
+            return {}
+
+    def save(self) -> None:
+        """Write ``index.json`` if anything changed since the last save."""
+        if not self._dirty:
+            return
+        tmp = self.index_path.with_suffix(".json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=1)
+        tmp.replace(self.index_path)
+        self._dirty = False
+
+    def close(self) -> None:
+        self.save()
+
+    def __enter__(self) -> "ParseCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+    def parts(self, log_path: str | Path) -> List[Path]:
+        """
+        Return the cached ``.npz`` parts of *log_path*, parsing only what is new.
+
+        Parameters
+        ----------
+        log_path : str | pathlib.Path
+            Raw log file (plain or compressed).
+
+        Returns
+        -------
+        List[pathlib.Path]
+            Parts in file order; together they hold every complete line.
+
+        Notes
+        -----
+        The index is only updated in memory; call :meth:`save` (or use the
+        cache as a context manager) once the batch is done.
+        """
+        path = Path(log_path)
+        st = path.stat()
+        key = str(path.resolve())
+        entry = self.index.get(key)
+
+        if entry and entry.get("schema") != SCHEMA:
+            entry = None                        # written by an older column layout
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns \
+                and self._parts_exist(entry):
+            self.hits += 1
+        elif entry and self._parts_exist(entry) and self._try_append(path, st, entry):
+            self.appends += 1
+        else:
+            self.misses += 1
+            old = self.index.pop(key, None)
+            if old:
+                self._release(old)
+            entry = self._build(path, st)
+            self.index[key] = entry
+
+        entry["last_used"] = time.time()
+        self._dirty = True
+        if self._total > self.max_bytes:
+            self._evict(keep=key)
+        return [self.cache_dir / name for name in entry["parts"]]
+
+    def clear(self) -> None:
+        """Remove every cached part and the index."""
+        for part in self.cache_dir.glob("*.npz"):
+            part.unlink()
+        self.index = {}
+        self._total = 0
+        self._dirty = True
+        self.save()
+
+    def total_bytes(self) -> int:
+        """Size of all parts referenced by the index (from the recorded sizes)."""
+        sizes = {name: size for entry in self.index.values()
+                 for name, size in entry["part_bytes"].items()}
+        return sum(sizes.values())
+
+    # ------------------------------------------------------------------ #
+    # Building parts
+    # ------------------------------------------------------------------ #
+    def _release(self, entry: dict) -> None:
+        """Delete the parts of a dropped *entry* that no other file references."""
+        still_used = {name for other in self.index.values() for name in other["parts"]}
+        for name, size in entry["part_bytes"].items():
+            if name not in still_used:
+                (self.cache_dir / name).unlink(missing_ok=True)
+                self._total -= size
+
+    def _parts_exist(self, entry: dict) -> bool:
+        return all((self.cache_dir / name).exists() for name in entry["parts"])
+
+    def _write_part(self, entry: dict, digest: str, entries) -> None:
+        """Write *entries* as part ``<digest>.npz`` (unless it exists) and add it to *entry*."""
+        name = f"{digest}.npz"
+        target = self.cache_dir / name
+        if not target.exists():
+            tmp = self.cache_dir / f"{digest}.tmp.npz"
+            with ColumnarWriter(tmp) as writer:
+                writer.write_many(entries)
+            tmp.replace(target)
+            self._total += target.stat().st_size
+        entry["parts"].append(name)
+        entry["part_bytes"][name] = target.stat().st_size
+
+    def _build(self, path: Path, st: os.stat_result) -> dict:
+        """Parse the whole file into a single part."""
+        compression = detect_compression(path)
+        end = st.st_size if compression else _complete_end(path, st.st_size)
+        entry = {
+            "schema": SCHEMA,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "compressed": bool(compression),
+            "parsed_bytes": end,
+            "fingerprint": "" if compression else _fingerprint(path, end),
+            "parts": [],
+            "part_bytes": {},
+        }
+        if end:
+            # the whole file is parsed anyway, so hashing all of it is affordable here
+            digest = _hash_range(path, 0, end).hexdigest()
+            entries = iter_entries(path) if compression else _iter_range_entries(path, 0, end)
+            self._write_part(entry, digest, entries)
+        return entry
+
+    def _try_append(self, path: Path, st: os.stat_result, entry: dict) -> bool:
+        """
+        Handle append-only growth: parse just the new tail into another part.
+
+        Returns ``False`` (caller rebuilds) if the file shrank, is compressed,
+        or the head / end of its already-parsed prefix changed.  Only those
+        two :data:`CHECK_BLOCK` windows and the new tail are read.
+        """
+        start = entry["parsed_bytes"]
+        if entry["compressed"] or st.st_size < start:
+            return False
+        if _fingerprint(path, start) != entry["fingerprint"]:
+            return False
+
+        end = _complete_end(path, st.st_size)
+        if end > start:
+            tail_digest = _hash_range(path, start, end).hexdigest()
+            self._write_part(entry, tail_digest, _iter_range_entries(path, start, end))
+            entry["fingerprint"] = _fingerprint(path, end)
+            entry["parsed_bytes"] = end
+        entry["size"] = st.st_size
+        entry["mtime_ns"] = st.st_mtime_ns
+        return True
+
+    # ------------------------------------------------------------------ #
+    # LRU eviction
+    # ------------------------------------------------------------------ #
+    def _evict(self, keep: str) -> None:
+        """Drop least recently used files until the cache fits in ``max_bytes``."""
+        by_age = sorted(self.index.items(), key=lambda item: item[1].get("last_used", 0))
+        for key, entry in by_age:
+            if self._total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            del self.index[key]
+            self._release(entry)
+
+
+def _main() -> None:
+    cli = argparse.ArgumentParser(description="Manage the parsed-log cache.")
+    cli.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR),
+                     help=f"cache directory (default: {DEFAULT_CACHE_DIR})")
+    sub = cli.add_subparsers(dest="command", required=True)
+    sub.add_parser("info", help="show cached files and total size")
+    warm = sub.add_parser("warm", help="parse logs into the cache ahead of time")
+    warm.add_argument("logfiles", nargs="+")
+    sub.add_parser("clear", help="delete every cached part")
+    args = cli.parse_args()
+
+    with ParseCache(args.cache_dir) as cache:
+        if args.command == "warm":
+            for log_file in args.logfiles:
+                start = time.perf_counter()
+                parts = cache.parts(log_file)
+                print(f"{log_file}: {len(parts)} part(s) in {time.perf_counter() - start:.3f} sec")
+            print(f"hits={cache.hits} appends={cache.appends} misses={cache.misses}")
+        elif args.command == "clear":
+            cache.clear()
+            print(f"Cleared {cache.cache_dir}")
+        else:
+            for key, entry in sorted(cache.index.items()):
+                print(f"{key}: {entry['parsed_bytes']:,} bytes parsed, {len(entry['parts'])} part(s)")
+            print(f"{len(cache.index)} file(s), {cache.total_bytes() / 1024 / 1024:.1f} MB "
+                  f"(limit {cache.max_bytes / 1024 / 1024:.0f} MB)")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,394 @@
+"""
+Columnar binary storage for parsed log entries.
+
+JSON Lines is convenient for ingestion, but every reload has to ``json.loads``
+each line again.  This module stores the fields the analytics scripts use as
+typed columns instead:
+
+* ``level`` / ``source`` / ``model`` / ``event`` / ``action`` / ``user_id`` /
+  ``path`` / ``screen`` are dictionary-encoded (small integer codes plus one
+  shared string table);
+* ``req_id`` is a plain string column: it is unique per request, so a
+  dictionary would grow as large as the column itself and the writer's
+  memory would grow with the log;
+* ``latency_ms`` / ``duration_ms`` / ``avg_latency_ms`` are 64-bit integers;
+* ``timestamp`` is stored as epoch seconds (log times are taken as UTC).
+
+Rows are written in chunks of :data:`CHUNK_ROWS`, and a reader can load just
+the columns it needs, one chunk at a time.
+
+Two on-disk layouts are supported, chosen by the file suffix:
+
+``.parquet``
+    Parquet row groups with dictionary encoding.  Needs ``pyarrow``.
+``.npz``
+    A NumPy ``.npz`` archive (``chunk00000/level``, ``dict/level``, ...)
+    written with the standard library only, so NumPy is not required to
+    produce or read it; ``numpy.load`` opens it as usual.
+
+Only the columns above are kept; JSON Lines remains the full-fidelity export.
+"""
+
+from __future__ import annotations
+
+import ast
+import struct
+import sys
+import zipfile
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+try:                                   # optional: only needed for .parquet
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+try:                                   # optional: only needed for iter_array_chunks
+    import numpy as np
+except ImportError:
+    np = None
+
+# Rows per chunk (one Parquet row group / one set of .npy members).
+CHUNK_ROWS = 64 * 1024
+
+# Stored in integer columns (and as a dictionary code) when a value is absent.
+NULL = -1
+
+DICT_COLUMNS = ("level", "source", "model", "event", "action", "user_id", "path", "screen")
+STR_COLUMNS = ("req_id",)      # high-cardinality: stored as-is, chunk by chunk
+INT_COLUMNS = ("timestamp", "latency_ms", "duration_ms", "avg_latency_ms")
+COLUMNS = DICT_COLUMNS + STR_COLUMNS + INT_COLUMNS
+
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def default_suffix() -> str:
+    """``.parquet`` when pyarrow is installed, otherwise ``.npz``."""
+    return ".parquet" if pa is not None else ".npz"
+
+
+# --------------------------------------------------------------------------- #
+# Row extraction
+# --------------------------------------------------------------------------- #
+
+def _to_int(value: Optional[str]) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return NULL
+
+
+def _epoch_seconds(timestamp: str) -> int:
+    try:
+        dt = datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return NULL
+    return int(dt.timestamp())
+
+
+# Actions whose ``name`` field is the screen the user moved to.
+SCREEN_ACTIONS = ("open_screen", "view_page")
+
+
+def screen_of(fields) -> Optional[str]:
+    """The screen an entry refers to: ``screen=...``, or ``name=...`` of a screen action."""
+    screen = fields.get("screen")
+    if screen is None and fields.get("action") in SCREEN_ACTIONS:
+        screen = fields.get("name")
+    return screen
+
+
+def _row(entry) -> tuple:
+    """Column values of one LogEntry, in :data:`COLUMNS` order."""
+    fields = entry.fields
+    return (
+        entry.level,
+        entry.source,
+        fields.get("model"),
+        fields.get("event"),
+        fields.get("action"),
+        fields.get("user_id") or fields.get("user"),
+        fields.get("path"),
+        screen_of(fields),
+        fields.get("req_id"),
+        _epoch_seconds(entry.timestamp),
+        _to_int(fields.get("latency_ms")),
+        _to_int(fields.get("duration_ms")),
+        _to_int(fields.get("avg_latency_ms")),
+    )
+
+
+# --------------------------------------------------------------------------- #
+# Minimal .npy encoding (no NumPy needed)
+# --------------------------------------------------------------------------- #
+
+def _npy_bytes(descr: str, count: int, payload: bytes) -> bytes:
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({count},), }}"
+    # Pad so the data starts on a 64-byte boundary, as numpy does.
+    pad = 64 - (len(_NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header = header + " " * (pad % 64) + "\n"
+    return _NPY_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1") + payload
+
+
+def _npy_int64(values: Sequence[int]) -> bytes:
+    data = array("q", values)
+    if _BIG_ENDIAN:
+        data.byteswap()
+    return _npy_bytes("<i8", len(data), data.tobytes())
+
+
+def _npy_int32(values: Sequence[int]) -> bytes:
+    data = array("i", values)
+    if _BIG_ENDIAN:
+        data.byteswap()
+    return _npy_bytes("<i4", len(data), data.tobytes())
+
+
+def _npy_strings(values: Sequence[str]) -> bytes:
+    width = max((len(v) for v in values), default=0) or 1
+    payload = b"".join(v.encode("utf-32-le").ljust(width * 4, b"\0") for v in values)
+    return _npy_bytes(f"<U{width}", len(values), payload)
+
+
+def _read_npy(blob: bytes) -> list:
+    """Decode the 1-D int or unicode arrays written by this module."""
+    if not blob.startswith(b"\x93NUMPY"):
+        raise ValueError("not a .npy array")
+    header_len = struct.unpack("<H", blob[8:10])[0]
+    header = ast.literal_eval(blob[10:10 + header_len].decode("latin1"))
+    payload = blob[10 + header_len:]
+    descr = header["descr"]
+    if descr.startswith("<U"):
+        width = int(descr[2:]) * 4
+        return [
+            payload[i:i + width].decode("utf-32-le").rstrip("\0")
+            for i in range(0, len(payload), width)
+        ]
+    data = array({"<i8": "q", "<i4": "i"}[descr])
+    data.frombytes(payload)
+    if _BIG_ENDIAN:
+        data.byteswap()
+    return data.tolist()
+
+
+# --------------------------------------------------------------------------- #
+# Writer
+# --------------------------------------------------------------------------- #
+
+class ColumnarWriter:
+    """
+    Append LogEntry objects to a columnar file, one chunk at a time.
+
+    Parameters
+    ----------
+    path : str | pathlib.Path
+        Output file; the suffix (``.parquet`` or ``.npz``) picks the layout.
+    chunk_rows : int
+        Rows buffered before a chunk is written out.
+
+    Examples
+    --------
+    >>> with ColumnarWriter("logs.npz") as writer:   # doctest: +SKIP
+    ...     writer.write_many(iter_entries("mobile.log"))
+    """
+
+    def __init__(self, path: str | Path, chunk_rows: int = CHUNK_ROWS) -> None:
+        self.path = Path(path)
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._buffer: List[tuple] = []
+        self._chunks = 0
+        # value -> code, shared by all chunks of the .npz layout
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in DICT_COLUMNS}
+
+        if self.path.suffix == ".parquet":
+            if pq is None:
+                raise RuntimeError("writing .parquet needs pyarrow; use a .npz output instead")
+            schema = pa.schema(
+                [(name, pa.string()) for name in DICT_COLUMNS + STR_COLUMNS]
+                + [(name, pa.int64()) for name in INT_COLUMNS]
+            )
+            self._parquet = pq.ParquetWriter(self.path, schema, use_dictionary=list(DICT_COLUMNS))
+            self._zip = None
+        elif self.path.suffix == ".npz":
+            self._parquet = None
+            self._zip = zipfile.ZipFile(self.path, "w", zipfile.ZIP_DEFLATED)
+        else:
+            raise ValueError(f"unsupported columnar suffix: {self.path.suffix!r}")
+
+    def write(self, entry) -> None:
+        """Buffer one entry; a chunk is flushed every ``chunk_rows`` rows."""
+        self._buffer.append(_row(entry))
+        if len(self._buffer) >= self.chunk_rows:
+            self._flush()
+
+    def write_many(self, entries: Iterable) -> int:
+        """Write every entry of *entries*; return how many were written."""
+        before = self.rows + len(self._buffer)
+        for entry in entries:
+            self.write(entry)
+        return self.rows + len(self._buffer) - before
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        columns = list(zip(*self._buffer))
+        n_dict = len(DICT_COLUMNS)
+        n_str = n_dict + len(STR_COLUMNS)
+        if self._parquet is not None:
+            arrays = [pa.array(col, type=pa.string()) for col in columns[:n_str]]
+            arrays += [
+                pa.array([None if v == NULL else v for v in col], type=pa.int64())
+                for col in columns[n_str:]
+            ]
+            self._parquet.write_table(pa.Table.from_arrays(arrays, names=list(COLUMNS)))
+        else:
+            prefix = f"chunk{self._chunks:05d}"
+            for name, col in zip(DICT_COLUMNS, columns[:n_dict]):
+                codes = self._codes[name]
+                encoded = [NULL if v is None else codes.setdefault(v, len(codes)) for v in col]
+                self._zip.writestr(f"{prefix}/{name}.npy", _npy_int32(encoded))
+            for name, col in zip(STR_COLUMNS, columns[n_dict:n_str]):
+                # a missing value is stored as "" and read back as None
+                self._zip.writestr(f"{prefix}/{name}.npy",
+                                   _npy_strings(["" if v is None else v for v in col]))
+            for name, col in zip(INT_COLUMNS, columns[n_str:]):
+                self._zip.writestr(f"{prefix}/{name}.npy", _npy_int64(col))
+        self.rows += len(self._buffer)
+        self._chunks += 1
+        self._buffer = []
+
+    def close(self) -> None:
+        """Flush the last chunk and finish the file."""
+        self._flush()
+        if self._parquet is not None:
+            self._parquet.close()
+        elif self._zip is not None:
+            for name, codes in self._codes.items():
+                self._zip.writestr(f"dict/{name}.npy", _npy_strings(list(codes)))
+            self._zip.close()
+            self._zip = None
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# --------------------------------------------------------------------------- #
+# Reader
+# --------------------------------------------------------------------------- #
+
+def iter_column_chunks(
+    path: str | Path, columns: Sequence[str] = COLUMNS
+) -> Iterator[Dict[str, list]]:
+    """
+    Load selected columns of a columnar file, one chunk at a time.
+
+    Parameters
+    ----------
+    path : str | pathlib.Path
+        ``.parquet`` or ``.npz`` file written by :class:`ColumnarWriter`.
+    columns : Sequence[str]
+        Columns to load; the others are never read from disk.
+
+    Yields
+    ------
+    Dict[str, list]
+        ``{column: values}`` for one chunk.  Dictionary columns come back as
+        strings, integer columns as ints; missing values are ``None``.
+    """
+    path = Path(path)
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"unknown columns: {sorted(unknown)}")
+
+    if path.suffix == ".parquet":
+        if pq is None:
+            raise RuntimeError("reading .parquet needs pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(columns=list(columns)):
+            yield batch.to_pydict()
+        return
+
+    with zipfile.ZipFile(path) as zf:
+        names = set(zf.namelist())
+        tables = {
+            name: _read_npy(zf.read(f"dict/{name}.npy"))
+            for name in columns if name in DICT_COLUMNS
+        }
+        chunks = sorted({n.split("/", 1)[0] for n in names if n.startswith("chunk")})
+        for chunk in chunks:
+            out: Dict[str, list] = {}
+            for name in columns:
+                values = _read_npy(zf.read(f"{chunk}/{name}.npy"))
+                if name in tables:
+                    table = tables[name]
+                    out[name] = [None if code == NULL else table[code] for code in values]
+                elif name in STR_COLUMNS:
+                    out[name] = [v or None for v in values]
+                else:
+                    out[name] = [None if v == NULL else v for v in values]
+            yield out
+
+
+def iter_array_chunks(path: str | Path, columns: Sequence[str] = COLUMNS) -> Iterator[Dict]:
+    """
+    Like :func:`iter_column_chunks`, but yield NumPy arrays.  Needs numpy.
+
+    Dictionary columns stay encoded, as a ``(codes, table)`` pair: ``codes``
+    is an integer array indexing the Python list ``table``, and missing values
+    point at a trailing ``""`` entry, so every code is valid.  Comparing or
+    grouping codes is much cheaper than working on arrays of strings.
+    String columns (:data:`STR_COLUMNS`) are plain string arrays with ``""``
+    for missing values.  Integer columns are ``int64`` arrays with
+    :data:`NULL` for missing values.
+    """
+    if np is None:
+        raise RuntimeError("iter_array_chunks needs numpy")
+    path = Path(path)
+
+    if path.suffix == ".parquet":
+        if pq is None:
+            raise RuntimeError("reading .parquet needs pyarrow")
+        dict_names = [name for name in columns if name in DICT_COLUMNS]
+        parquet = pq.ParquetFile(path, read_dictionary=dict_names)
+        for batch in parquet.iter_batches(columns=list(columns)):
+            out = {}
+            for name in columns:
+                col = batch.column(name)
+                if name in DICT_COLUMNS:
+                    table = col.dictionary.to_pylist() + [""]
+                    codes = pc.fill_null(col.indices, len(table) - 1).to_numpy()
+                    out[name] = (codes, table)
+                elif name in STR_COLUMNS:
+                    out[name] = pc.fill_null(col, "").to_numpy(zero_copy_only=False)
+                else:
+                    out[name] = pc.fill_null(col, NULL).to_numpy().astype(np.int64)
+            yield out
+        return
+
+    with zipfile.ZipFile(path) as zf:
+        tables = {
+            name: _read_npy(zf.read(f"dict/{name}.npy")) + [""]
+            for name in columns if name in DICT_COLUMNS
+        }
+        chunks = sorted({n.split("/", 1)[0] for n in zf.namelist() if n.startswith("chunk")})
+        for chunk in chunks:
+            out = {}
+            for name in columns:
+                with zf.open(f"{chunk}/{name}.npy") as f:
+                    values = np.lib.format.read_array(f)
+                if name in tables:
+                    table = tables[name]
+                    out[name] = (np.where(values == NULL, len(table) - 1, values), table)
+                elif name in STR_COLUMNS:
+                    out[name] = values
+                else:
+                    out[name] = values.astype(np.int64)
+            yield out
@@ -0,0 +1,448 @@
+"""
+On-disk inverted index of a raw log for fast lookups by field value.
+
+During an incident the questions are "every line with ``user_id=bob``" or
+"what happened to ``req_id=42``" - and scanning a multi-GB log for each one
+is slow.  :class:`LogIndex` maps every ``(field, value)`` of the entries
+produced by :func:`mobile_log_basic_ai.parse_line` to the byte offsets of
+the matching lines, so a query reads only the lines it returns.  The level
+and source from each line's header are indexed as ``@level`` and
+``@source``, so a body field that happens to be called ``level=`` or
+``source=`` stays a separate key.
+
+Storage
+-------
+The index lives next to the log in an SQLite file (``<log>.idx.sqlite``);
+SQLite provides the on-disk B-tree over the keys and atomic commits.  Each
+posting list is stored as a blob of delta-encoded LEB128 varints, so
+ascending offsets cost one or two bytes each.
+
+Incremental updates
+-------------------
+The log is indexed in segments of about :data:`SEGMENT_BYTES`; a segment
+and the new indexed offset are committed together.  When the log grows,
+only the new complete lines are indexed into further segments.  If the
+already indexed part looks different (its first and last indexed blocks no
+longer hash the same, or the file shrank), the log was rotated or rewritten
+and the index is rebuilt.  Many small segments are merged back into one by
+:meth:`LogIndex.compact`, which also runs automatically after
+:data:`COMPACT_AFTER` segments.
+
+Only plain (uncompressed) logs can be indexed, since lookups seek to byte
+offsets.
+
+Command line::
+
+    python log_index.py update app.log [--fields user_id,req_id,model]
+    python log_index.py query app.log user_id=bob [model=asr-small-v1 @level=ERROR ...] [--count]
+    python log_index.py info app.log
+    python log_index.py compact app.log
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import sqlite3
+import sys
+import time
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from log_io import detect_compression
+from mobile_log_basic_ai import parse_line
+
+# Approximate amount of log text indexed per committed segment.
+SEGMENT_BYTES = 64 * 1024 * 1024
+
+# Merge all segments into one once there are this many.
+COMPACT_AFTER = 16
+
+# Block size used when reading the log.
+READ_BLOCK = 4 * 1024 * 1024
+
+# Size of the head / tail blocks hashed to detect a rotated or rewritten log.
+CHECK_BLOCK = 4096
+
+INDEX_SUFFIX = ".idx.sqlite"
+
+# Keys under which the header level / source are indexed (body fields are \w+ only).
+LEVEL_KEY = "@level"
+SOURCE_KEY = "@source"
+
+# Bumped when the key layout changes; an index written by another version is rebuilt.
+INDEX_VERSION = "2"
+
+_META_DDL = "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+_POSTINGS_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    field   TEXT NOT NULL,
+    value   TEXT NOT NULL,
+    segment INTEGER NOT NULL,
+    count   INTEGER NOT NULL,
+    data    BLOB NOT NULL,
+    PRIMARY KEY (field, value, segment)
+) WITHOUT ROWID
+"""
+
+
+# --------------------------------------------------------------------------- #
+# Posting list encoding
+# --------------------------------------------------------------------------- #
+
+def encode_postings(offsets: Iterable[int]) -> bytes:
+    """
+    Encode ascending byte offsets as delta LEB128 varints.
+
+    Parameters
+    ----------
+    offsets : Iterable[int]
+        Strictly ascending, non-negative offsets.
+
+    Returns
+    -------
+    bytes
+        The compressed posting list.
+    """
+    out = bytearray()
+    previous = 0
+    for offset in offsets:
+        delta = offset - previous
+        previous = offset
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+
+def decode_postings(blob: bytes) -> List[int]:
+    """Inverse of :func:`encode_postings`."""
+    offsets = []
+    value = shift = previous = 0
+    for byte in blob:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += value
+        offsets.append(previous)
+        value = shift = 0
+    return offsets
+
+
+def _hash_block(f, start: int, end: int) -> str:
+    f.seek(start)
+    return hashlib.blake2b(f.read(end - start), digest_size=16).hexdigest()
+
+
+# --------------------------------------------------------------------------- #
+# Index
+# --------------------------------------------------------------------------- #
+
+class LogIndex:
+    """
+    Inverted index ``(field, value) -> line offsets`` of one plain log file.
+
+    Parameters
+    ----------
+    log_path : str | pathlib.Path
+        The log to index.
+    index_path : str | pathlib.Path | None
+        Index file; defaults to ``<log_path>.idx.sqlite``.
+
+    Examples
+    --------
+    >>> with LogIndex("app.log") as index:                       # doctest: +SKIP
+    ...     index.update()
+    ...     for offset, line in index.iter_lines(index.query([("user_id", "bob")])):
+    ...         print(line)
+    """
+
+    def __init__(self, log_path: str | Path, index_path: str | Path | None = None) -> None:
+        self.log_path = Path(log_path)
+        self.index_path = Path(index_path) if index_path else \
+            self.log_path.with_name(self.log_path.name + INDEX_SUFFIX)
+        self.db = sqlite3.connect(self.index_path)
+        self.db.execute(_META_DDL)
+        self.db.execute(_POSTINGS_DDL.format(table="postings"))
+
+    # ------------------------------------------------------------------ #
+    # Metadata
+    # ------------------------------------------------------------------ #
+    def _meta(self, key: str, default: str = "") -> str:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, **values) -> None:
+        self.db.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [(key, str(value)) for key, value in values.items()],
+        )
+
+    @property
+    def indexed_bytes(self) -> int:
+        """Offset up to which the log has been indexed."""
+        return int(self._meta("indexed_bytes", "0"))
+
+    def _fingerprint(self, f, end: int) -> Tuple[str, str]:
+        """Hashes of the first and last :data:`CHECK_BLOCK` bytes of ``[0, end)``."""
+        return (_hash_block(f, 0, min(end, CHECK_BLOCK)),
+                _hash_block(f, max(0, end - CHECK_BLOCK), end))
+
+    def _reset(self, fields: str) -> None:
+        self.db.execute("DELETE FROM postings")
+        self._set_meta(indexed_bytes=0, next_segment=0, fields=fields, head_hash="", tail_hash="",
+                       version=INDEX_VERSION)
+
+    # ------------------------------------------------------------------ #
+    # Building
+    # ------------------------------------------------------------------ #
+    def update(self, fields: Optional[Sequence[str]] = None) -> int:
+        """
+        Index whatever complete lines were added since the last update.
+
+        Parameters
+        ----------
+        fields : Sequence[str] | None
+            Fields to index (header fields as ``@level`` / ``@source``);
+            ``None`` means every field.  Changing the selection rebuilds the
+            index.
+
+        Returns
+        -------
+        int
+            Number of newly indexed lines.
+        """
+        if detect_compression(self.log_path):
+            raise ValueError(f"{self.log_path} is compressed; index the decompressed log")
+        wanted = frozenset(fields) if fields else None
+        fields_key = ",".join(sorted(wanted)) if wanted else "*"
+        size = self.log_path.stat().st_size
+
+        with self.log_path.open("rb") as f:
+            start = self.indexed_bytes
+            stale = (self._meta("fields", fields_key) != fields_key
+                     or self._meta("version", "1") != INDEX_VERSION
+                     or start > size
+                     or (start and self._fingerprint(f, start) != (self._meta("head_hash"),
+                                                                   self._meta("tail_hash"))))
+            if stale:
+                start = 0              # rotated, rewritten, re-configured or an older layout
+            if start == 0:
+                self._reset(fields_key)
+                self.db.commit()
+
+            indexed = self._index_from(f, start, wanted)
+
+        if int(self._meta("next_segment", "0")) >= COMPACT_AFTER:
+            self.compact()
+        return indexed
+
+    def _index_from(self, f, start: int, wanted: Optional[frozenset]) -> int:
+        """Index complete lines from *start*, committing a segment every SEGMENT_BYTES."""
+        postings: Dict[Tuple[str, str], array] = defaultdict(lambda: array("q"))
+        pos = segment_start = start
+        lines = 0
+        f.seek(start)
+        while True:
+            block = f.read(READ_BLOCK)
+            cut = block.rfind(b"\n") + 1
+            if cut == 0:
+                if len(block) < READ_BLOCK:
+                    break                          # EOF, or a partial last line
+                block += f.readline()              # one very long line
+                cut = block.rfind(b"\n") + 1
+                if cut == 0:
+                    break
+            f.seek(pos + cut)                      # leave the partial line for later
+
+            offset = pos
+            for raw in block[:cut].split(b"\n")[:-1]:
+                entry = parse_line(raw.decode("utf-8").rstrip("\r"))
+                if entry is not None:
+                    lines += 1
+                    pairs = [(LEVEL_KEY, entry.level), (SOURCE_KEY, entry.source)]
+                    pairs.extend(entry.fields.items())
+                    for key, value in pairs:
+                        if wanted is None or key in wanted:
+                            postings[key, value].append(offset)
+                offset += len(raw) + 1
+            pos += cut
+
+            if pos - segment_start >= SEGMENT_BYTES:
+                self._commit_segment(f, postings, pos)
+                postings.clear()
+                segment_start = pos
+        if pos > segment_start:
+            self._commit_segment(f, postings, pos)
+        return lines
+
+    def _commit_segment(self, f, postings, indexed_bytes: int) -> None:
+        """Store one segment and advance ``indexed_bytes`` in the same transaction."""
+        segment = int(self._meta("next_segment", "0"))
+        head_hash, tail_hash = self._fingerprint(f, indexed_bytes)
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO postings (field, value, segment, count, data) VALUES (?, ?, ?, ?, ?)",
+                ((key, value, segment, len(offsets), encode_postings(offsets))
+                 for (key, value), offsets in postings.items()),
+            )
+            self._set_meta(indexed_bytes=indexed_bytes, next_segment=segment + 1,
+                           head_hash=head_hash, tail_hash=tail_hash)
+
+    def compact(self) -> None:
+        """Merge every key's posting lists from all segments into one segment."""
+        def merged_rows():
+            current, merged = None, []
+            for field, value, data in self.db.execute(
+                    "SELECT field, value, data FROM postings ORDER BY field, value, segment"):
+                if (field, value) != current:
+                    if current is not None:
+                        yield (*current, len(merged), encode_postings(merged))
+                    current, merged = (field, value), []
+                merged.extend(decode_postings(data))
+            if current is not None:
+                yield (*current, len(merged), encode_postings(merged))
+
+        with self.db:
+            self.db.execute("DROP TABLE IF EXISTS postings_compact")
+            self.db.execute(_POSTINGS_DDL.format(table="postings_compact"))
+            self.db.executemany(
+                "INSERT INTO postings_compact (field, value, segment, count, data) "
+                "VALUES (?, ?, 0, ?, ?)", merged_rows())
+            self.db.execute("DROP TABLE postings")
+            self.db.execute("ALTER TABLE postings_compact RENAME TO postings")
+            self._set_meta(next_segment=1)
+        self.db.execute("VACUUM")
+
+    # ------------------------------------------------------------------ #
+    # Querying
+    # ------------------------------------------------------------------ #
+    def lookup(self, field: str, value: str) -> List[int]:
+        """Ascending offsets of the lines where *field* equals *value*."""
+        offsets: List[int] = []
+        for (data,) in self.db.execute(
+                "SELECT data FROM postings WHERE field = ? AND value = ? ORDER BY segment",
+                (field, value)):
+            offsets.extend(decode_postings(data))
+        return offsets
+
+    def query(self, criteria: Iterable[Tuple[str, str]]) -> List[int]:
+        """Offsets of the lines matching *all* ``(field, value)`` criteria."""
+        lists = sorted((self.lookup(field, value) for field, value in criteria), key=len)
+        if not lists:
+            return []
+        result = lists[0]
+        for other in lists[1:]:
+            keep = set(other)
+            result = [offset for offset in result if offset in keep]
+        return result
+
+    def iter_lines(self, offsets: Iterable[int]) -> Iterator[Tuple[int, str]]:
+        """Seek to each offset and yield ``(offset, line)``."""
+        with self.log_path.open("rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield offset, f.readline().decode("utf-8").rstrip("\r\n")
+
+    def info(self) -> Dict[str, object]:
+        """Size and coverage of the index."""
+        keys, segments, postings = self.db.execute(
+            "SELECT COUNT(DISTINCT field || '=' || value), COUNT(DISTINCT segment), "
+            "COALESCE(SUM(count), 0) FROM postings").fetchone()
+        return {
+            "log": str(self.log_path),
+            "log_bytes": self.log_path.stat().st_size,
+            "indexed_bytes": self.indexed_bytes,
+            "fields": self._meta("fields", "*"),
+            "keys": keys,
+            "segments": segments,
+            "postings": postings,
+            "index_bytes": self.index_path.stat().st_size,
+        }
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "LogIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# --------------------------------------------------------------------------- #
+# CLI
+# --------------------------------------------------------------------------- #
+
+def _parse_criteria(items: Sequence[str]) -> List[Tuple[str, str]]:
+    criteria = []
+    for item in items:
+        field, sep, value = item.partition("=")
+        if not sep or not field:
+            raise ValueError(f"expected FIELD=VALUE, got {item!r}")
+        criteria.append((field, value))
+    return criteria
+
+
+def _main() -> None:
+    cli = argparse.ArgumentParser(description="Inverted index of a raw log by field value.")
+    cli.add_argument("--index", help=f"index file (default: <logfile>{INDEX_SUFFIX})")
+    sub = cli.add_subparsers(dest="command", required=True)
+
+    p_update = sub.add_parser("update", help="build the index or add newly appended lines")
+    p_update.add_argument("logfile")
+    p_update.add_argument("--fields", help="comma-separated fields to index (default: all)")
+
+    p_query = sub.add_parser("query", help="print the lines matching every FIELD=VALUE")
+    p_query.add_argument("logfile")
+    p_query.add_argument("criteria", nargs="+", metavar="FIELD=VALUE")
+    p_query.add_argument("--count", action="store_true", help="only print the number of matches")
+    p_query.add_argument("--limit", type=int, default=0, help="print at most N lines")
+    p_query.add_argument("--no-update", action="store_true",
+                         help="do not index newly appended lines first")
+
+    for name, text in (("info", "show index statistics"), ("compact", "merge all segments")):
+        sub.add_parser(name, help=text).add_argument("logfile")
+    args = cli.parse_args()
+
+    try:
+        criteria = _parse_criteria(args.criteria) if args.command == "query" else []
+        with LogIndex(args.logfile, args.index) as index:
+            _run(args, criteria, index)
+    except ValueError as exc:
+        cli.error(str(exc))
+
+
+def _run(args: argparse.Namespace, criteria: List[Tuple[str, str]], index: LogIndex) -> None:
+    if args.command == "update":
+        start = time.perf_counter()
+        lines = index.update(args.fields.split(",") if args.fields else None)
+        print(f"Indexed {lines:,} new lines in {time.perf_counter() - start:.3f} sec "
+              f"({index.indexed_bytes:,} bytes covered).")
+    elif args.command == "query":
+        if not args.no_update:
+            stored = index._meta("fields", "*")
+            index.update(None if stored == "*" else stored.split(","))
+        start = time.perf_counter()
+        offsets = index.query(criteria)
+        if args.count:
+            print(len(offsets))
+        else:
+            for _, line in index.iter_lines(offsets[:args.limit] if args.limit else offsets):
+                print(line)
+        print(f"[INFO] {len(offsets):,} matching lines in "
+              f"{time.perf_counter() - start:.3f} sec", file=sys.stderr)
+    elif args.command == "compact":
+        index.compact()
+        print(f"Compacted {index.index_path}")
+    else:
+        for key, value in index.info().items():
+            print(f"{key:>14}: {value}")
+
+
+if __name__ == "__main__":
+    _main()
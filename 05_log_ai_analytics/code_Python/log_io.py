@@ -0,0 +1,211 @@
+"""
+Transparent reading of plain and compressed log files.
+
+Rotated logs are usually compressed.  :func:`open_text` / :func:`open_binary`
+sniff the first bytes of a file and stream-decompress gzip, bzip2, xz and
+zstd inputs on the fly, so nothing is ever decompressed to disk first.
+
+Decompression of a compressed file runs in a background thread that keeps a
+few large blocks ready ahead of the reader.  zlib, bz2, lzma and zstandard
+all release the GIL while inflating, so decompression overlaps with parsing
+in the calling thread.
+"""
+
+from __future__ import annotations
+
+import bz2
+import gzip
+import io
+import lzma
+import queue
+import threading
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Optional, TextIO
+
+try:                                   # optional: only needed for .zst logs
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Size of one decompressed block handed from the reader thread.
+READ_BUFFER = 1024 * 1024
+
+# Number of decompressed blocks the reader thread may keep ahead.
+PREFETCH_DEPTH = 4
+
+# Leading bytes of each supported container format.
+MAGIC_BYTES = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+
+# Everything reading a corrupt, truncated or unsupported log can raise.
+# Callers processing a fleet catch these to skip one bad file instead of
+# aborting the whole run.  (gzip / bz2 errors are OSError subclasses.)
+READ_ERRORS: tuple = (OSError, EOFError, UnicodeDecodeError, RuntimeError,
+                      lzma.LZMAError, zlib.error)
+if zstandard is not None:
+    READ_ERRORS += (zstandard.ZstdError,)
+
+
+def detect_compression(file_path: str | Path) -> Optional[str]:
+    """
+    Identify the compression format of a file from its magic bytes.
+
+    Parameters
+    ----------
+    file_path : str | pathlib.Path
+        File to inspect.  The extension is ignored.
+
+    Returns
+    -------
+    Optional[str]
+        ``"gzip"``, ``"bz2"``, ``"xz"`` or ``"zstd"``; ``None`` for a plain
+        (uncompressed) file.
+    """
+    with Path(file_path).open("rb") as f:
+        head = f.read(6)
+    for name, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def _open_decompressor(path: Path, compression: str) -> BinaryIO:
+    """Open a streaming decompressor for *path*."""
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "bz2":
+        return bz2.open(path, "rb")
+    if compression == "xz":
+        return lzma.open(path, "rb")
+    if zstandard is None:
+        raise RuntimeError(f"{path} is zstd-compressed; install 'zstandard' to read it")
+    # read_across_frames: logs appended frame by frame decode as one stream
+    return zstandard.ZstdDecompressor().stream_reader(
+        path.open("rb"), read_across_frames=True, closefd=True
+    )
+
+
+class _PrefetchReader(io.RawIOBase):
+    """
+    Raw stream fed by a background thread that reads ahead from *source*.
+
+    At most ``PREFETCH_DEPTH`` blocks are buffered, so a slow consumer
+    applies backpressure to the decompressor instead of growing memory.
+    """
+
+    def __init__(self, source: BinaryIO, block_size: int = READ_BUFFER,
+                 depth: int = PREFETCH_DEPTH) -> None:
+        super().__init__()
+        self._source = source
+        self._block_size = block_size
+        self._blocks: queue.Queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._current = memoryview(b"")
+        self._eof = False
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._fill, daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        """Queue *item*, giving up if the reader has been closed."""
+        while not self._stop.is_set():
+            try:
+                self._blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fill(self) -> None:
+        try:
+            while True:
+                block = self._source.read(self._block_size)
+                if not self._put(block) or not block:
+                    return
+        except Exception as exc:       # surfaced to the consumer in readinto
+            self._put(exc)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._current:
+            if self._error is not None:
+                raise self._error      # the producer has stopped; never block again
+            if self._eof:
+                return 0
+            block = self._blocks.get()
+            if isinstance(block, Exception):
+                self._error = block
+                raise block
+            if not block:
+                self._eof = True
+                return 0
+            self._current = memoryview(block)
+        n = min(len(buffer), len(self._current))
+        buffer[:n] = self._current[:n]
+        self._current = self._current[n:]
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stop.set()
+            while self._thread.is_alive():
+                try:                   # unblock a producer waiting on put()
+                    self._blocks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._source.close()
+        super().close()
+
+
+def open_binary(file_path: str | Path) -> BinaryIO:
+    """
+    Open a log file for binary reading, decompressing it if needed.
+
+    Parameters
+    ----------
+    file_path : str | pathlib.Path
+        Plain or compressed log file.
+
+    Returns
+    -------
+    BinaryIO
+        A buffered stream of the *decompressed* bytes.  It is not seekable
+        when the input is compressed.
+    """
+    path = Path(file_path)
+    compression = detect_compression(path)
+    if compression is None:
+        return path.open("rb", buffering=READ_BUFFER)
+    raw = _PrefetchReader(_open_decompressor(path, compression))
+    return io.BufferedReader(raw, buffer_size=READ_BUFFER)
+
+
+def open_text(file_path: str | Path, encoding: str = "utf-8") -> TextIO:
+    """
+    Open a log file for text reading, decompressing it if needed.
+
+    This is a drop-in replacement for ``open(path, encoding=...)``.
+
+    Parameters
+    ----------
+    file_path : str | pathlib.Path
+        Plain or compressed log file.
+    encoding : str
+        Text encoding of the (decompressed) content.
+
+    Returns
+    -------
+    TextIO
+        A text stream yielding the decompressed lines.
+    """
+    path = Path(file_path)
+    if detect_compression(path) is None:
+        return path.open(encoding=encoding, buffering=READ_BUFFER)
+    return io.TextIOWrapper(open_binary(path), encoding=encoding)
@@ -7,20 +7,32 @@ Date  : 2025-11-24
 
 from __future__ import annotations
 
+import argparse
 import json
 import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from log_columnar import ColumnarWriter, default_suffix
+from log_io import detect_compression, open_binary, open_text
 
 # --------------------------------------------------------------------------- #
 # 1.  LogEntry data class
 # --------------------------------------------------------------------------- #
-@dataclass
+@dataclass(slots=True)
 class LogEntry:
     """
     Represents a single log entry.
 
+    The class is slotted (no per-instance ``__dict__``) and the parser
+    interns ``level``, ``source``, field names and low-cardinality field
+    values, so millions of entries share one copy of each repeated string.
+
     Attributes
     ----------
     timestamp : str
@@ -40,10 +52,79 @@ class LogEntry:
     fields: Dict[str, str]
     raw_message: str = ""
 
+
+class LazyLogEntry:
+    """
+    A log entry whose body is tokenised only when it is first needed.
+
+    The header (timestamp, level, source) is split eagerly because filters
+    look at it; ``fields`` and ``raw_message`` are decoded from the kept
+    body on first access.  Entries that are filtered out on the header
+    therefore never pay for :func:`_parse_body`.
+
+    Attributes
+    ----------
+    timestamp, level, source : str
+        Same as :class:`LogEntry`.
+    fields : Dict[str, str]
+        Parsed key=value pairs (decoded on first access).
+    raw_message : str
+        Non key=value text (decoded on first access).
+    """
+
+    __slots__ = ("timestamp", "level", "source", "_body", "_fields", "_raw_message")
+
+    def __init__(self, timestamp: str, level: str, source: str, body: str) -> None:
+        self.timestamp = timestamp
+        self.level = level
+        self.source = source
+        self._body = body
+        self._fields: Optional[Dict[str, str]] = None
+        self._raw_message = ""
+
+    def _decode(self) -> None:
+        self._fields, self._raw_message = _parse_body(self._body)
+        self._body = ""
+
+    @property
+    def fields(self) -> Dict[str, str]:
+        if self._fields is None:
+            self._decode()
+        return self._fields
+
+    @property
+    def raw_message(self) -> str:
+        if self._fields is None:
+            self._decode()
+        return self._raw_message
+
+    def to_entry(self) -> LogEntry:
+        """Return the equivalent fully parsed :class:`LogEntry`."""
+        return LogEntry(self.timestamp, self.level, self.source, self.fields, self.raw_message)
+
+    def __repr__(self) -> str:
+        state = "decoded" if self._fields is not None else "lazy"
+        return (f"LazyLogEntry(timestamp={self.timestamp!r}, level={self.level!r}, "
+                f"source={self.source!r}, <{state}>)")
+
 # --------------------------------------------------------------------------- #
 # 2.  Helper functions
 # --------------------------------------------------------------------------- #
 
+# Tokenizer for the body of a log line, compiled once at import time.
+# Each match is one of:
+#   - key="quoted value"  (value may contain spaces, must end the token)
+#   - key=value           (unquoted, no spaces)
+#   - any other token     (collected into raw_message)
+_BODY_TOKEN_PATTERN = re.compile(r'(\w+)=("[^"]*"(?=\s|$)|\S+)|(\S+)')
+
+# Field values drawn from a small vocabulary; these are interned like the
+# field names.  High-cardinality values (req_id, ip, ...) are left alone so
+# the intern table does not grow with the log.
+_INTERNED_VALUE_KEYS = frozenset(
+    {"action", "event", "model", "screen", "network", "device", "os", "iface", "path"}
+)
+
 def _split_header_and_body(line: str) -> Optional[tuple[str, str, str, str]]:
     """
     Split a raw log line into timestamp, level, source and the remaining body.
@@ -58,7 +139,8 @@ def _split_header_and_body(line: str) -> Optional[tuple[str, str, str, str]]:
     tuple[str, str, str, str] | None
         (timestamp, level, source, body) or None if the line is invalid.
     """
-    parts = line.split()
+    # maxsplit=4 keeps the body verbatim, so quoted values keep their spaces
+    parts = line.split(None, 4)
     if len(parts) < 4:
         # Not enough tokens to form a valid log entry
         return None
@@ -67,7 +149,7 @@ def _split_header_and_body(line: str) -> Optional[tuple[str, str, str, str]]:
     timestamp = f"{parts[0]} {parts[1]}"
     level = parts[2]
     source = parts[3]
-    body = " ".join(parts[4:])
+    body = parts[4] if len(parts) == 5 else ""
     return timestamp, level, source, body
 
 
@@ -90,18 +172,16 @@ def _parse_body(body: str) -> tuple[Dict[str, str], str]:
     # We keep a list of tokens that were NOT key=value
     raw_tokens: List[str] = []
 
-    # Regular expression that matches key=value.  It supports:
-    #   - unquoted values (no spaces)
-    #   - quoted values (double quotes)
-    kv_pattern = re.compile(r'(\w+)=(".*?"|\S+)')
-
-    for token in body.split():
-        match = kv_pattern.fullmatch(token)
-        if match:
-            key, value = match.group(1), match.group(2)
+    # One left-to-right pass: every match is either a key=value pair or a
+    # plain token, so the body is never split or re-scanned.
+    for key, value, token in _BODY_TOKEN_PATTERN.findall(body):
+        if key:
             # Remove surrounding quotes if present
-            if value.startswith('"') and value.endswith('"'):
+            if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
                 value = value[1:-1]
+            key = sys.intern(key)
+            if key in _INTERNED_VALUE_KEYS:
+                value = sys.intern(value)
             fields[key] = value
         else:
             raw_tokens.append(token)
@@ -136,36 +216,61 @@ def parse_line(line: str) -> Optional[LogEntry]:
     fields, raw_message = _parse_body(body)
     return LogEntry(
         timestamp=timestamp,
-        level=level,
-        source=source,
+        level=sys.intern(level),
+        source=sys.intern(source),
         fields=fields,
         raw_message=raw_message,
     )
 
+
+def parse_line_lazy(line: str) -> Optional[LazyLogEntry]:
+    """
+    Like :func:`parse_line`, but defer tokenising the body.
+
+    Parameters
+    ----------
+    line : str
+        A raw log line.
+
+    Returns
+    -------
+    LazyLogEntry | None
+        A lazy entry, or ``None`` if the line is malformed.
+    """
+    header = _split_header_and_body(line)
+    if header is None:
+        return None
+    timestamp, level, source, body = header
+    return LazyLogEntry(timestamp, sys.intern(level), sys.intern(source), body)
+
 # --------------------------------------------------------------------------- #
 # 4.  Public API
 # --------------------------------------------------------------------------- #
 
-def parse_file(file_path: str | Path) -> List[LogEntry]:
+def iter_entries(file_path: str | Path) -> Iterator[LogEntry]:
     """
-    Parse an entire log file.
+    Lazily parse a log file, yielding one entry at a time.
+
+    Unlike :func:`parse_file`, nothing is accumulated, so memory stays flat
+    regardless of the size of the log.
 
     Parameters
     ----------
     file_path : str | pathlib.Path
-        Path to the log file.
-
-    Returns
-    -------
-    List[LogEntry]
-        A list of parsed log entries.
+        Path to the log file.  gzip / bzip2 / xz / zstd compressed files are
+        detected by their magic bytes and decompressed on the fly.
+
+    Yields
+    ------
+    LogEntry
+        Parsed log entries in file order.  Blank and malformed lines are
+        skipped.
     """
     path = Path(file_path)
-    entries: List[LogEntry] = []
 
     # Using UTF‑8 is safe for most log files; change if your logs use a
     # different encoding.
-    with path.open(encoding="utf-8") as f:
+    with open_text(path, encoding="utf-8") as f:
         for raw_line in f:
             line = raw_line.rstrip("\n")
             if not line:
@@ -173,12 +278,178 @@ def parse_file(file_path: str | Path) -> List[LogEntry]:
                 continue
             entry = parse_line(line)
             if entry is not None:
-                entries.append(entry)
+                yield entry
+
+
+@dataclass(frozen=True)
+class LogFilter:
+    """
+    Predicate for :func:`iter_filtered_entries`; empty criteria match all.
+
+    Criteria are checked cheapest first: a raw-bytes pre-scan, then the
+    header (level, source, time range), and only then the tokenised body
+    (field equality).
 
+    Attributes
+    ----------
+    levels : FrozenSet[str]
+        Accepted levels, e.g. ``frozenset({"ERROR"})``.
+    sources : FrozenSet[str]
+        Accepted sources, e.g. ``frozenset({"AIInference"})``.
+    since : str | None
+        Inclusive lower bound on the timestamp (``"YYYY-MM-DD HH:MM:SS"``;
+        a prefix such as ``"2025-11-16 09"`` also works).
+    until : str | None
+        Exclusive upper bound on the timestamp.
+    field_equals : Tuple[Tuple[str, str], ...]
+        ``(key, value)`` pairs that must all be present in ``fields``.
+    """
+    levels: FrozenSet[str] = frozenset()
+    sources: FrozenSet[str] = frozenset()
+    since: Optional[str] = None
+    until: Optional[str] = None
+    field_equals: Tuple[Tuple[str, str], ...] = ()
+
+    def needle(self) -> Optional[bytes]:
+        """
+        Bytes that every matching line must contain, or ``None``.
+
+        Lines without the needle are skipped before being decoded.  A
+        required field value is usually the most selective choice, then a
+        single level, then a single source.
+        """
+        values = [value for _, value in self.field_equals if value]
+        if values:
+            return max(values, key=len).encode("utf-8")
+        if len(self.levels) == 1:
+            return next(iter(self.levels)).encode("utf-8")
+        if len(self.sources) == 1:
+            return next(iter(self.sources)).encode("utf-8")
+        return None
+
+    def match_header(self, timestamp: str, level: str, source: str) -> bool:
+        """Check the criteria that only need the line header."""
+        if self.levels and level not in self.levels:
+            return False
+        if self.sources and source not in self.sources:
+            return False
+        if self.since is not None and timestamp < self.since:
+            return False
+        if self.until is not None and timestamp >= self.until:
+            return False
+        return True
+
+    def match_fields(self, fields: Dict[str, str]) -> bool:
+        """Check the field-equality criteria (needs the tokenised body)."""
+        return all(fields.get(key) == value for key, value in self.field_equals)
+
+    def matches(self, entry) -> bool:
+        """Check an already parsed :class:`LogEntry` or :class:`LazyLogEntry`."""
+        return (self.match_header(entry.timestamp, entry.level, entry.source)
+                and self.match_fields(entry.fields))
+
+
+# Size of one raw block scanned by :func:`iter_filtered_entries`.
+FILTER_BLOCK = 4 * 1024 * 1024
+
+
+def _candidate_lines(block: bytes, needle: Optional[bytes]) -> Iterator[bytes]:
+    """Yield the lines of *block* that contain *needle* (all lines if None)."""
+    if needle is None:
+        yield from block.split(b"\n")
+        return
+    pos = block.find(needle)
+    while pos != -1:
+        start = block.rfind(b"\n", 0, pos) + 1
+        end = block.find(b"\n", pos)
+        if end == -1:
+            end = len(block)
+        yield block[start:end]
+        pos = block.find(needle, end + 1)
+
+
+def iter_filtered_entries(file_path: str | Path, where: LogFilter) -> Iterator[LazyLogEntry]:
+    """
+    Lazily yield only the entries of a log file that match *where*.
+
+    The filter is pushed down as far as possible: lines lacking
+    :meth:`LogFilter.needle` are never decoded, non-matching headers are
+    rejected before the body is tokenised, and the body is only tokenised
+    for lines that pass the header and need a field check.  A query that
+    selects a few percent of the lines costs roughly that fraction of a
+    full parse.
+
+    Parameters
+    ----------
+    file_path : str | pathlib.Path
+        Path to the log file (plain or compressed).
+    where : LogFilter
+        Criteria every yielded entry satisfies.
+
+    Yields
+    ------
+    LazyLogEntry
+        Matching entries in file order.
+    """
+    needle = where.needle()
+    with open_binary(file_path) as f:
+        while True:
+            block = f.read(FILTER_BLOCK)
+            if not block:
+                return
+            block += f.readline()             # finish the line the block stopped in
+            for raw in _candidate_lines(block, needle):
+                line = raw.decode("utf-8").rstrip("\r")
+                header = _split_header_and_body(line)
+                if header is None:
+                    continue
+                timestamp, level, source, body = header
+                if not where.match_header(timestamp, level, source):
+                    continue
+                entry = LazyLogEntry(timestamp, sys.intern(level), sys.intern(source), body)
+                if where.field_equals and not where.match_fields(entry.fields):
+                    continue
+                yield entry
+
+
+def parse_file(file_path: str | Path, workers: int = 1) -> List[LogEntry]:
+    """
+    Parse an entire log file.
+
+    Parameters
+    ----------
+    file_path : str | pathlib.Path
+        Path to the log file.
+    workers : int
+        Number of worker processes.  With more than one worker the file is
+        split into newline-aligned byte ranges that are parsed in parallel;
+        entries are still returned in file order.  A compressed file is
+        decompressed once, as a stream, and its chunks are parsed in
+        parallel instead.
+
+    Returns
+    -------
+    List[LogEntry]
+        A list of parsed log entries.
+
+    Notes
+    -----
+    This materialises every entry in memory.  For large files prefer
+    :func:`iter_entries` or :func:`convert_to_json_lines`.
+    """
+    if workers <= 1:
+        return list(iter_entries(file_path))
+
+    path = Path(file_path)
+    entries: List[LogEntry] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tasks = _iter_tasks(path, _parse_range, _parse_chunk)
+        for chunk in _ordered_map(pool, tasks, workers * 2):
+            entries.extend(chunk)
     return entries
 
 
-def write_json_lines(output_path: str | Path, entries: Iterable[LogEntry]) -> None:
+def write_json_lines(output_path: str | Path, entries: Iterable[LogEntry]) -> int:
     """
     Write a collection of LogEntry objects as JSON Lines.
 
@@ -191,31 +462,332 @@ def write_json_lines(output_path: str | Path, entries: Iterable[LogEntry]) -> No
     output_path : str | pathlib.Path
         Destination file.  It will be created or truncated.
     entries : Iterable[LogEntry]
-        Log entries to write.
+        Log entries to write.  Any iterable works, including the generator
+        returned by :func:`iter_entries`.
+
+    Returns
+    -------
+    int
+        Number of entries written.
     """
     out_path = Path(output_path)
+    written = 0
     with out_path.open("w", encoding="utf-8") as f:
         for entry in entries:
             # asdict() turns the dataclass into a plain dict
             json_line = json.dumps(asdict(entry), ensure_ascii=False)
             f.write(json_line + "\n")
+            written += 1
+    return written
+
+
+def write_columnar(output_path: str | Path, entries: Iterable[LogEntry]) -> int:
+    """
+    Write log entries in the columnar binary format of :mod:`log_columnar`.
+
+    Compared with :func:`write_json_lines` this is faster to write, smaller
+    on disk, and lets the metrics step load only the columns it needs.
+
+    Parameters
+    ----------
+    output_path : str | pathlib.Path
+        Destination file.  ``.parquet`` (needs pyarrow) or ``.npz``.
+    entries : Iterable[LogEntry]
+        Log entries to write.
+
+    Returns
+    -------
+    int
+        Number of entries written.
+    """
+    with ColumnarWriter(output_path) as writer:
+        return writer.write_many(entries)
+
+
+@dataclass
+class ConversionStats:
+    """
+    Summary of a streaming text-to-JSONL conversion.
+
+    Attributes
+    ----------
+    entries : int
+        Number of entries written to the output.
+    elapsed_s : float
+        Wall-clock time spent converting, in seconds.
+    """
+    entries: int
+    elapsed_s: float
+
+    @property
+    def lines_per_sec(self) -> float:
+        """Throughput in parsed lines per second (0 if nothing was timed)."""
+        return self.entries / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+def convert_to_json_lines(
+    input_path: str | Path, output_path: str | Path, workers: int = 1
+) -> ConversionStats:
+    """
+    Stream a raw log file straight into a JSON Lines file.
+
+    Entries are parsed and written one at a time, so memory usage does not
+    depend on the size of the input.
+
+    Parameters
+    ----------
+    input_path : str | pathlib.Path
+        Raw log file to read; may be gzip / bzip2 / xz / zstd compressed.
+    output_path : str | pathlib.Path
+        Destination JSONL file.  It will be created or truncated.
+    workers : int
+        Number of worker processes.  With more than one worker, byte ranges
+        of the input are converted in parallel and written back in order;
+        at most ``2 * workers`` chunks are in flight at any time.
+
+    Returns
+    -------
+    ConversionStats
+        Number of entries written and the throughput achieved.
+    """
+    start = time.perf_counter()
+    if workers <= 1:
+        written = write_json_lines(output_path, iter_entries(input_path))
+        return ConversionStats(entries=written, elapsed_s=time.perf_counter() - start)
+
+    path = Path(input_path)
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            Path(output_path).open("w", encoding="utf-8") as out:
+        tasks = _iter_tasks(path, _convert_range, _convert_chunk)
+        for count, text in _ordered_map(pool, tasks, workers * 2):
+            out.write(text)
+            written += count
+    return ConversionStats(entries=written, elapsed_s=time.perf_counter() - start)
+
+
+def convert_to_columnar(
+    input_path: str | Path, output_path: str | Path, workers: int = 1
+) -> ConversionStats:
+    """
+    Stream a raw log file into a columnar file (see :func:`write_columnar`).
+
+    Parameters
+    ----------
+    input_path : str | pathlib.Path
+        Raw log file to read; may be compressed.
+    output_path : str | pathlib.Path
+        Destination ``.parquet`` or ``.npz`` file.
+    workers : int
+        Number of worker processes used for parsing, as in
+        :func:`convert_to_json_lines`.
+
+    Returns
+    -------
+    ConversionStats
+        Number of entries written and the throughput achieved.
+    """
+    start = time.perf_counter()
+    if workers <= 1:
+        written = write_columnar(output_path, iter_entries(input_path))
+        return ConversionStats(entries=written, elapsed_s=time.perf_counter() - start)
+
+    path = Path(input_path)
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, ColumnarWriter(output_path) as writer:
+        tasks = _iter_tasks(path, _parse_range, _parse_chunk)
+        for chunk in _ordered_map(pool, tasks, workers * 2):
+            written += writer.write_many(chunk)
+    return ConversionStats(entries=written, elapsed_s=time.perf_counter() - start)
 
 
 # --------------------------------------------------------------------------- #
-# 5.  Demo / CLI wrapper (optional)
+# 5.  Parallel chunked parsing
 # --------------------------------------------------------------------------- #
-def _demo() -> None:
+
+# Size of one unit of work handed to a worker process.
+CHUNK_SIZE = 32 * 1024 * 1024
+
+
+def _iter_byte_ranges(path: Path, chunk_size: int) -> Iterator[tuple[int, int]]:
     """
-    Simple command‑line demo: read *log.txt* and write *log.jsonl*.
+    Split a file into ``[start, end)`` byte ranges that end on a newline.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        File to split.
+    chunk_size : int
+        Approximate size of each range; every range is extended to the end
+        of the line it stops in.
+
+    Yields
+    ------
+    tuple[int, int]
+        Byte offsets ``(start, end)`` covering the whole file.
+    """
+    size = path.stat().st_size
+    with path.open("rb") as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()
+            end = min(f.tell(), size)
+            yield start, end
+            start = end
+
+
+def _iter_decompressed_chunks(path: Path, chunk_size: int) -> Iterator[bytes]:
+    """
+    Stream-decompress *path* into newline-aligned chunks of ~*chunk_size*.
+
+    Compressed files cannot be split by byte offset, so the parent process
+    decompresses once (in a read-ahead thread, see :mod:`log_io`) and ships
+    each chunk to a worker for parsing.
+    """
+    with open_binary(path) as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                return
+            yield data + f.readline()
+
+
+def _iter_tasks(path: Path, range_func, chunk_func) -> Iterator[tuple]:
+    """
+    Yield ``(func, *args)`` work items covering the whole file.
+
+    Plain files are handed out as byte ranges that workers read themselves;
+    compressed files as decompressed chunks.
+    """
+    if detect_compression(path) is None:
+        for byte_range in _iter_byte_ranges(path, CHUNK_SIZE):
+            yield range_func, path, byte_range
+    else:
+        for data in _iter_decompressed_chunks(path, CHUNK_SIZE):
+            yield chunk_func, data
+
+
+def _read_range(path: Path, byte_range: tuple[int, int]) -> bytes:
+    """Read the raw bytes of one range (runs in a worker process)."""
+    start, end = byte_range
+    with path.open("rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _iter_chunk_entries(data: bytes) -> Iterator[LogEntry]:
+    """Parse the lines inside one chunk of raw bytes."""
+    for line in data.decode("utf-8").split("\n"):
+        line = line.rstrip("\r")
+        if not line:
+            continue
+        entry = parse_line(line)
+        if entry is not None:
+            yield entry
+
+
+def _parse_chunk(data: bytes) -> List[LogEntry]:
+    """Worker: parse one chunk into a list of entries."""
+    return list(_iter_chunk_entries(data))
+
+
+def _parse_range(path: Path, byte_range: tuple[int, int]) -> List[LogEntry]:
+    """Worker: parse one byte range into a list of entries."""
+    return _parse_chunk(_read_range(path, byte_range))
+
+
+def _convert_chunk(data: bytes) -> tuple[int, str]:
+    """Worker: turn one chunk into JSON Lines text."""
+    lines = [
+        json.dumps(asdict(entry), ensure_ascii=False)
+        for entry in _iter_chunk_entries(data)
+    ]
+    text = "\n".join(lines) + "\n" if lines else ""
+    return len(lines), text
+
+
+def _convert_range(path: Path, byte_range: tuple[int, int]) -> tuple[int, str]:
+    """Worker: turn one byte range into JSON Lines text."""
+    return _convert_chunk(_read_range(path, byte_range))
+
+
+def _ordered_map(pool, tasks: Iterable[tuple], window: int):
     """
-    log_file = Path("./datasets/example_mobile_ai.log")          # <-- change to your log file
-    output_file = Path("example_logs.jsonl")     # <-- output destination
+    Like ``pool.map`` but with at most *window* tasks in flight.
 
-    entries = parse_file(log_file)
-    write_json_lines(output_file, entries)
+    Each task is a ``(func, *args)`` tuple.  Results are yielded in
+    submission order, and because new work is only submitted as old results
+    are consumed, memory stays bounded even when the consumer is slower than
+    the workers.
+    """
+    pending: deque = deque()
+    for func, *args in tasks:
+        pending.append(pool.submit(func, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
 
-    print(f"Parsed {len(entries)} log entries.")
-    print(f"JSON Lines written to {output_file}")
+
+# --------------------------------------------------------------------------- #
+# 6.  Demo / CLI wrapper (optional)
+# --------------------------------------------------------------------------- #
+def _demo() -> None:
+    """
+    Simple command‑line demo: read *log.txt* and write *log.jsonl*.
+    """
+    cli = argparse.ArgumentParser(description="Convert a raw log file to JSON Lines.")
+    cli.add_argument("logfile", nargs="?", default="./datasets/example_mobile_ai.log",
+                     help="raw log file to parse (plain or gzip/bz2/xz/zstd)")
+    cli.add_argument("output", nargs="?", default=None,
+                     help="output file (default: example_logs.jsonl, or "
+                          "example_logs.parquet/.npz with --format columnar)")
+    cli.add_argument("--format", choices=("jsonl", "columnar"), default="jsonl",
+                     help="JSON Lines, or columnar Parquet/.npz (default: jsonl)")
+    cli.add_argument("--workers", type=int, default=1,
+                     help="number of worker processes (default: 1)")
+    query = cli.add_argument_group("filters (only matching entries are written)")
+    query.add_argument("--level", action="append", default=[],
+                       help="keep this level; repeat for several (e.g. --level ERROR)")
+    query.add_argument("--source", action="append", default=[],
+                       help="keep this source; repeat for several")
+    query.add_argument("--since", help='inclusive start time, e.g. "2025-11-16 09:00:00"')
+    query.add_argument("--until", help="exclusive end time")
+    query.add_argument("--where", action="append", default=[], metavar="KEY=VALUE",
+                       help="keep entries whose field KEY equals VALUE; repeatable")
+    args = cli.parse_args()
+
+    log_file = Path(args.logfile)
+    pairs = tuple(tuple(item.split("=", 1)) for item in args.where)
+    if any(len(pair) != 2 for pair in pairs):
+        cli.error("--where expects KEY=VALUE")
+    where = LogFilter(frozenset(args.level), frozenset(args.source),
+                      args.since, args.until, pairs)
+
+    if where != LogFilter():
+        # Filtered runs are single-process: the pushdown already skips most work
+        output_file = Path(args.output or "example_logs" + (
+            default_suffix() if args.format == "columnar" else ".jsonl"))
+        write = write_columnar if args.format == "columnar" else write_json_lines
+        start = time.perf_counter()
+        written = write(output_file,
+                        (entry.to_entry() for entry in iter_filtered_entries(log_file, where)))
+        print(f"Matched {written} log entries in {time.perf_counter() - start:.3f} sec.")
+        print(f"Output written to {output_file}")
+        return
+
+    if args.format == "columnar":
+        output_file = Path(args.output or "example_logs" + default_suffix())
+        stats = convert_to_columnar(log_file, output_file, workers=args.workers)
+    else:
+        output_file = Path(args.output or "example_logs.jsonl")
+        stats = convert_to_json_lines(log_file, output_file, workers=args.workers)
+
+    print(f"Parsed {stats.entries} log entries "
+          f"({stats.lines_per_sec:,.0f} lines/sec).")
+    print(f"{'Columnar data' if args.format == 'columnar' else 'JSON Lines'} "
+          f"written to {output_file}")
 
 if __name__ == "__main__":
     _demo()
\ No newline at end of file
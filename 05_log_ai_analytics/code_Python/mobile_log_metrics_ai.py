@@ -6,7 +6,19 @@ mobile_log_metrics.py
 
 計算手機 AI 服務日誌中的關鍵度量指標與 SLO 觸發情況。
 用法:
-    python mobile_log_metrics.py <path_to_jsonl_log> [--out-json=out.json] [--out-csv=out.csv]
+    python mobile_log_metrics.py <path_to_jsonl_log> [--out-json=out.json] [--out-csv=out.csv] [--exact]
+    python mobile_log_metrics.py <log_dir | "logs/*/device_*.jsonl"> [--concurrency=8]
+    python mobile_log_metrics.py <path> --engine=numpy     # 向量化批次彙整（需要 numpy）
+    python mobile_log_metrics.py <path> --json-backend=auto # msgspec > orjson > json
+    python mobile_log_metrics.py device.log [--cache-dir=DIR] # 原始文字日誌，經解析快取
+    python mobile_log_metrics.py <path> --requests          # 以 req_id 關聯網路 + 推論的端到端延遲
+    python mobile_log_metrics.py <path> --sessions [--sessions-out=s.jsonl]  # 每位用戶的 session 還原
+
+傳入目錄或 glob 時，會同時讀取所有裝置的 log，彙整成一份全機群報表。
+gzip / bz2 / xz / zstd 壓縮檔依 magic bytes 自動辨識，邊讀邊解壓，不必先解壓到磁碟。
+也可以讀 mobile_log_basic_ai.py --format columnar 產生的 .parquet / .npz，只載入需要的欄位。
+原始文字日誌（*.log、*.log.gz …）會先經 log_cache.py 的解析快取轉成列式分段：
+未變動的檔案不再解析，只有尾端新增的行才需要解析。
 
 日誌格式:
     每行一條 JSON，包含
@@ -17,10 +29,36 @@ mobile_log_metrics.py
 
 import json
 import argparse
+import glob
+import math
 import statistics
 import sys
 from pathlib import Path
-from collections import defaultdict, Counter
+from collections import defaultdict, deque, Counter, OrderedDict
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from typing import Optional, Union
+
+try:                                  # 選用：--engine numpy 才需要
+    import numpy as np
+except ImportError:
+    np = None
+
+try:                                  # 選用：較快的 JSON 解碼器
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from log_cache import DEFAULT_CACHE_DIR, ParseCache
+from log_columnar import NULL, iter_array_chunks, iter_column_chunks, screen_of
+from log_io import READ_ERRORS, open_text
 
 def parse_int(value, default=0):
     """嘗試把字串轉為 int，失敗則回傳 default。"""
@@ -29,130 +67,917 @@ def parse_int(value, default=0):
     except (TypeError, ValueError):
         return default
 
-def compute_p95(values):
-    """計算 95% 分位。若數量 < 2，回傳 0。"""
+PERCENTILES = (50, 90, 95, 99)       # 每個模型輸出的延遲分位
+
+def compute_percentile(values, pct):
+    """計算 pct% 分位（nearest-rank，與 compute_p95 相同規則）。若無資料，回傳 0。"""
     if not values:
         return 0
     sorted_vals = sorted(values)
-    idx = int(len(sorted_vals) * 0.95) - 1
+    idx = int(len(sorted_vals) * pct / 100) - 1
     idx = max(0, idx)  # 確保索引合法
     return sorted_vals[idx]
 
-def main(log_path, out_json=None, out_csv=None):
+def compute_p95(values):
+    """計算 95% 分位。若數量 < 2，回傳 0。"""
+    return compute_percentile(values, 95)
+
+# =====================
+# 分位數引擎（可替換）
+# =====================
+class ExactQuantiles:
+    """保留所有樣本、排序後取分位。結果精確，但記憶體隨樣本數成長（--exact 驗證用）。"""
+
+    def __init__(self):
+        self.values = []
+
+    def add(self, value):
+        self.values.append(value)
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    def mean(self):
+        return statistics.mean(self.values)
+
+    def percentile(self, pct):
+        return compute_percentile(self.values, pct)
+
+class DDSketch:
+    """
+    DDSketch 風格的分位數 sketch：記憶體固定，誤差有上界。
+
+    - 每個值放進對數等距的 bucket：bucket k 涵蓋 (gamma^(k-1), gamma^k]
+    - 回傳的分位值相對誤差 <= relative_accuracy（預設 1%）
+    - bucket 數超過 max_buckets 時合併最小的幾個 bucket，只影響最低端的分位
+    - 各自統計的 sketch 可以用 merge() 合併
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets = Counter()       # bucket index -> 次數
+        self.min_index = None          # 合併過最小的 bucket 後，比它小的值都記在這一格
+        self.zero_count = 0            # <= 0 的值另外計數
+        self.count = 0
+        self.total = 0
+
+    def add(self, value):
+        self.add_count(value, 1)
+
+    def add_count(self, value, n):
+        """一次加入 n 個相同的值。"""
+        self.count += n
+        self.total += value * n
+        if value <= 0:
+            self.zero_count += n
+            return
+        idx = math.ceil(math.log(value) / self.log_gamma)
+        if self.min_index is not None and idx < self.min_index:
+            idx = self.min_index
+        self.buckets[idx] += n
+        if len(self.buckets) > self.max_buckets:
+            self._collapse_lowest()
+
+    def merge(self, other):
+        """合併另一個 sketch（relative_accuracy 必須相同），例如各檔案分別統計的結果。"""
+        if other.gamma != self.gamma:
+            raise ValueError("只能合併 relative_accuracy 相同的 sketch")
+        self.count += other.count
+        self.total += other.total
+        self.zero_count += other.zero_count
+        self.buckets.update(other.buckets)
+        if self.min_index is None or (other.min_index is not None
+                                      and other.min_index > self.min_index):
+            self.min_index = other.min_index
+        if self.min_index is not None:
+            for idx in [idx for idx in self.buckets if idx < self.min_index]:
+                self.buckets[self.min_index] += self.buckets.pop(idx)
+        if len(self.buckets) > self.max_buckets:
+            self._collapse_lowest()
+
+    def add_array(self, values):
+        """加入 numpy 陣列：延遲多為整數 ms，相異值不多，每個相異值只算一次 bucket。"""
+        uniq, counts = np.unique(values, return_counts=True)
+        for value, n in zip(uniq.tolist(), counts.tolist()):
+            self.add_count(value, n)
+
+    def _collapse_lowest(self):
+        """
+        把最小的幾個 bucket 併進它們上面那一格，維持 bucket 數上限。
+
+        一次多併 max_buckets // 8 格，並記下 min_index：之後更小的值直接記進
+        min_index 那一格，不會再產生新 bucket，排序的成本分攤到很多次 add。
+        """
+        keys = sorted(self.buckets)
+        cut = len(keys) - self.max_buckets + self.max_buckets // 8
+        floor = keys[cut]
+        for idx in keys[:cut]:
+            self.buckets[floor] += self.buckets.pop(idx)
+        self.min_index = floor
+
+    def mean(self):
+        return self.total / self.count
+
+    def percentile(self, pct):
+        """回傳 pct% 分位的估計值（rank 規則與 compute_percentile 相同）。"""
+        if not self.count:
+            return 0
+        rank = max(0, int(self.count * pct / 100) - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if rank < seen:
+                # bucket 中點（以相對誤差而言）
+                return 2 * self.gamma ** idx / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+# =====================
+# 多檔讀取（機群模式）
+# =====================
+DEFAULT_CONCURRENCY = 8              # 同時讀取的檔案數
+DIR_PATTERNS = ("*.jsonl*", "*.npz", "*.parquet")  # 傳入目錄時遞迴搜尋的檔名（含 .jsonl.gz 等壓縮檔）
+COLUMNAR_SUFFIXES = (".npz", ".parquet")
+RAW_LOG_SUFFIX = ".log"              # 原始文字日誌（含 .log.gz 等壓縮檔），經解析快取讀取
+# 統計只需要這些欄位；列式檔案只讀這幾欄
+METRIC_COLUMNS = ('source', 'model', 'event', 'action', 'user_id', 'latency_ms', 'avg_latency_ms')
+
+def expand_log_paths(target):
+    """把檔案 / 目錄 / glob 樣式展開成排序後的檔案清單。"""
+    path = Path(target)
+    if path.is_file():
+        return [path]
+    if path.is_dir():
+        found = {p for pattern in DIR_PATTERNS for p in path.rglob(pattern) if p.is_file()}
+        return sorted(found)
+    return sorted(Path(p) for p in glob.glob(str(target), recursive=True) if Path(p).is_file())
+
+def _read_lines(path):
+    """Thread worker：讀入整個檔案並切行（開檔、讀取與解壓縮都不佔 GIL）。
+
+    只依 "\n" 切行，與單檔逐行串流一致；splitlines() 還會在 U+2028、\x85、
+    \x0c 等字元切開，訊息裡含這些字元的 JSONL 行會被拆成兩行壞資料。
+    """
+    with open_text(path, encoding='utf-8') as f:
+        return f.read().split('\n')
+
+def iter_log_lines(paths, concurrency=DEFAULT_CONCURRENCY):
+    """
+    依序 yield (path, line_no, raw)。
+
+    - 只有一個檔案時直接逐行串流，記憶體固定
+    - 多個檔案時以 thread pool 同時讀取；最多 concurrency * 2 個檔案
+      在讀取中或等待處理（backpressure），彙整跟不上時不會無限制地預讀
+    """
+    if len(paths) == 1:
+        with open_text(paths[0], encoding='utf-8') as f:
+            for line_no, raw in enumerate(f, 1):
+                yield paths[0], line_no, raw
+        return
+
+    window = max(1, concurrency) * 2
+    todo = iter(paths)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        pending = deque()
+        for path in todo:
+            pending.append((path, pool.submit(_read_lines, path)))
+            if len(pending) >= window:
+                break
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(todo, None)
+            if next_path is not None:
+                pending.append((next_path, pool.submit(_read_lines, next_path)))
+            try:
+                lines = future.result()
+            except READ_ERRORS as e:
+                print(f"⚠️ 無法讀取 {path}: {e}", file=sys.stderr)
+                continue
+            for line_no, raw in enumerate(lines, 1):
+                yield path, line_no, raw
+
+def iter_columnar_entries(path):
+    """讀取列式檔案中統計需要的欄位，組成與 JSONL 相同形狀的 entry（不必 json.loads）。"""
+    for chunk in iter_column_chunks(path, METRIC_COLUMNS):
+        for source, *values in zip(*(chunk[name] for name in METRIC_COLUMNS)):
+            fields = {name: value for name, value in zip(METRIC_COLUMNS[1:], values)
+                      if value is not None}
+            yield {'source': source, 'fields': fields}
+
+# =====================
+# JSON 解碼（可替換）
+# =====================
+JSON_BACKENDS = ('auto', 'msgspec', 'orjson', 'json')
+
+if msgspec is not None:
+    FieldValue = Optional[Union[str, int, float]]
+
+    class _DictLike(msgspec.Struct, gc=False):
+        """讓 Struct 支援 entry.get() / in / []，aggregate_entries 不必區分解碼器。"""
+
+        def get(self, name, default=None):
+            value = getattr(self, name, None)
+            return default if value is None else value
+
+        def __contains__(self, name):
+            return getattr(self, name, None) is not None
+
+        def __getitem__(self, name):
+            value = getattr(self, name, None)
+            if value is None:
+                raise KeyError(name)
+            return value
+
+    class MetricFields(_DictLike, gc=False):
+        """fields 中統計會用到的 key；其他 key 解碼時直接略過，不建立物件。"""
+        model: FieldValue = None
+        event: FieldValue = None
+        action: FieldValue = None
+        user_id: FieldValue = None
+        user: FieldValue = None
+        latency_ms: FieldValue = None
+        avg_latency_ms: FieldValue = None
+        duration_ms: FieldValue = None
+        path: FieldValue = None
+        req_id: FieldValue = None
+        screen: FieldValue = None
+        name: FieldValue = None
+
+    class LogRecord(_DictLike, gc=False):
+        """write_json_lines() 輸出的一行 JSON。"""
+        timestamp: str = ''
+        level: str = ''
+        source: Optional[str] = None
+        fields: MetricFields = msgspec.field(default_factory=MetricFields)
+        raw_message: str = ''
+
+def make_decoder(backend='auto'):
+    """
+    回傳 (backend 名稱, decode(raw) -> entry dict, 解碼失敗時的例外類別)。
+
+    - msgspec：依 LogRecord schema 直接解碼成 Struct，fields 中用不到的 key 不建物件
+    - orjson：完整解碼，但比標準庫快數倍
+    - json：標準庫（一定可用）
+    auto 依序選第一個已安裝的。
+    """
+    if backend == 'auto':
+        backend = 'msgspec' if msgspec is not None else 'orjson' if orjson is not None else 'json'
+    if backend == 'msgspec':
+        if msgspec is None:
+            raise RuntimeError("--json-backend msgspec 需要先安裝 msgspec")
+        return backend, msgspec.json.Decoder(LogRecord).decode, (msgspec.DecodeError,)
+    if backend == 'orjson':
+        if orjson is None:
+            raise RuntimeError("--json-backend orjson 需要先安裝 orjson")
+        return backend, orjson.loads, (orjson.JSONDecodeError,)
+    return 'json', json.loads, (json.JSONDecodeError,)
+
+def resolve_raw_logs(paths, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    把原始文字日誌換成解析快取中的列式分段（.npz），其餘檔案原樣保留。
+
+    快取以路徑 + 大小 + mtime + 頭尾區塊的雜湊判斷：未變動的檔案直接命中，
+    只往尾端追加的檔案只解析新增部分。
+    """
+    if not any(RAW_LOG_SUFFIX in p.suffixes for p in paths):
+        return paths
+    resolved = []
+    with ParseCache(cache_dir) as cache:      # 整批處理完才寫一次 index.json
+        for path in paths:
+            if RAW_LOG_SUFFIX in path.suffixes:
+                resolved.extend(cache.parts(path))
+            else:
+                resolved.append(path)
+    print(f"[INFO] 解析快取：命中 {cache.hits}、增量 {cache.appends}、重新解析 {cache.misses}")
+    return resolved
+
+def _split_columnar(paths):
+    """把檔案清單分成（列式檔案, JSONL 檔案）。"""
+    columnar = [p for p in paths if p.suffix in COLUMNAR_SUFFIXES]
+    return columnar, [p for p in paths if p.suffix not in COLUMNAR_SUFFIXES]
+
+def iter_jsonl_entries(paths, concurrency=DEFAULT_CONCURRENCY, decoder=None):
+    """依序 yield JSONL 檔案中的 entry dict；解析失敗的行印出警告並略過。"""
+    _, decode, errors = decoder or make_decoder()
+    for log_file, line_no, raw in iter_log_lines(paths, concurrency):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            yield decode(raw)
+        except errors as e:
+            print(f"⚠️ {log_file} 第 {line_no} 行解析失敗: {e}", file=sys.stderr)
+
+def iter_log_entries(paths, concurrency=DEFAULT_CONCURRENCY, decoder=None):
+    """依序 yield 每個檔案中的 entry dict（列式檔案先讀）。"""
+    columnar, text_paths = _split_columnar(paths)
+    for path in columnar:
+        yield from iter_columnar_entries(path)
+    if text_paths:
+        yield from iter_jsonl_entries(text_paths, concurrency, decoder)
+
+# =====================
+# 彙整（兩種引擎共用同一組容器）
+# =====================
+class MetricTotals:
+    """彙整中的統計容器；quantile_engine 決定延遲樣本怎麼保存。"""
+
+    def __init__(self, quantile_engine):
+        self.model_latencies = defaultdict(quantile_engine)  # model -> 分位數引擎
+        self.user_login_success = Counter()                # user -> count
+        self.user_login_failure = Counter()                # user -> count
+        self.http_status_counts = Counter()                # '2xx', '4xx', '5xx'
+        self.anomaly_counts = Counter()                    # wifi_disconnected, tcp_reset, http_504, http_503
+
+def aggregate_entries(totals, entries):
+    """Python 引擎：逐筆判斷 source / event 並累加。"""
+    model_latencies = totals.model_latencies
+    user_login_success = totals.user_login_success
+    user_login_failure = totals.user_login_failure
+    http_status_counts = totals.http_status_counts
+    anomaly_counts = totals.anomaly_counts
+
+    for entry in entries:
+        source = entry.get('source')
+        fields = entry.get('fields', {})
+        # ---------- AIInference ----------
+        if source == 'AIInference':
+            model = fields.get('model')
+            if not model:
+                continue
+            # 延遲
+            if 'latency_ms' in fields:
+                latency = parse_int(fields['latency_ms'])
+                model_latencies[model].add(latency)
+            # 有時會直接寫入 slo 檢查
+            if fields.get('event') == 'health_check' and 'avg_latency_ms' in fields:
+                # 可視作一次延遲樣本
+                latency = parse_int(fields['avg_latency_ms'])
+                model_latencies[model].add(latency)
+
+        # ---------- MobileApp ----------
+        elif source == 'MobileApp':
+            user = fields.get('user_id') or fields.get('user_id') or fields.get('user')
+            if not user:
+                # 某些日誌用 user_id
+                user = fields.get('user_id')
+            if not user:
+                continue
+            action = fields.get('action')
+            if action == 'login_success':
+                user_login_success[user] += 1
+            elif action == 'login_failure' or action == 'login':
+                user_login_failure[user] += 1
+            elif action == 'login':
+                # 某些日誌中 login 只表示請求，成功/失敗由後續 event
+                pass
+
+        # ---------- NetService ----------
+        elif source == 'NetService':
+            event = fields.get('event')
+            # HTTP 狀態統計
+            if event and event.startswith('http_'):
+                code = event.split('_')[1]
+                if code.isdigit():
+                    code_int = int(code)
+                    if 200 <= code_int < 300:
+                        http_status_counts['2xx'] += 1
+                    elif 400 <= code_int < 500:
+                        http_status_counts['4xx'] += 1
+                    elif 500 <= code_int < 600:
+                        http_status_counts['5xx'] += 1
+                # 特殊 504 / 503 異常
+                if event in ('http_504', 'http_503'):
+                    anomaly_counts[event] += 1
+
+            # 其他網路異常
+            if event == 'wifi_disconnected':
+                anomaly_counts['wifi_disconnected'] += 1
+            if event == 'tcp_reset':
+                anomaly_counts['tcp_reset'] += 1
+
+# =====================
+# NumPy 批次引擎（--engine numpy）
+# =====================
+NUMPY_CHUNK_ROWS = 64 * 1024          # JSONL 輸入每次轉成陣列的筆數
+ANOMALY_EVENTS = ('http_504', 'http_503', 'wifi_disconnected', 'tcp_reset')
+
+class ArrayQuantiles:
+    """ExactQuantiles 的 numpy 版：樣本存成 int64 陣列，結果與 ExactQuantiles 完全相同。"""
+
+    def __init__(self):
+        self.parts = []
+        self.count = 0
+        self.total = 0
+        self._sorted = None
+
+    def add_array(self, values):
+        self.parts.append(values)
+        self.count += len(values)
+        self.total += int(values.sum())
+        self._sorted = None
+
+    def mean(self):
+        # 與 statistics.mean 對整數樣本的結果一致（整除時回傳 int）
+        quotient, remainder = divmod(self.total, self.count)
+        return quotient if remainder == 0 else self.total / self.count
+
+    def percentile(self, pct):
+        if not self.count:
+            return 0
+        if self._sorted is None:
+            self._sorted = np.sort(np.concatenate(self.parts))
+        idx = max(0, int(self.count * pct / 100) - 1)
+        return self._sorted[idx].item()
+
+def _entries_to_arrays(entries):
+    """把一批 JSONL entry 轉成與 iter_array_chunks 相同形狀的欄位（字串欄位為 (codes, table)）。"""
+    tables = {name: {'': 0} for name in ('source', 'model', 'event', 'action', 'user_id')}
+    cols = {name: [] for name in METRIC_COLUMNS}
+    for entry in entries:
+        fields = entry.get('fields', {})
+        values = (
+            ('source', entry.get('source') or ''),
+            ('model', fields.get('model') or ''),
+            ('event', fields.get('event') or ''),
+            ('action', fields.get('action') or ''),
+            ('user_id', fields.get('user_id') or fields.get('user') or ''),
+        )
+        for name, value in values:
+            table = tables[name]
+            code = table.get(value)
+            if code is None:
+                code = table[value] = len(table)
+            cols[name].append(code)
+        for name in ('latency_ms', 'avg_latency_ms'):
+            cols[name].append(parse_int(fields[name]) if name in fields else NULL)
+    chunk = {name: np.array(cols[name], dtype=np.int64) for name in ('latency_ms', 'avg_latency_ms')}
+    for name, table in tables.items():
+        chunk[name] = (np.array(cols[name], dtype=np.int32), list(table))
+    return chunk
+
+def iter_metric_arrays(paths, concurrency=DEFAULT_CONCURRENCY, decoder=None):
+    """依序 yield 每個 chunk 的欄位陣列；列式檔案直接載入，JSONL 每 NUMPY_CHUNK_ROWS 筆轉一次。"""
+    columnar, text_paths = _split_columnar(paths)
+    for path in columnar:
+        yield from iter_array_chunks(path, METRIC_COLUMNS)
+    if text_paths:
+        entries = iter_jsonl_entries(text_paths, concurrency, decoder)
+        while True:
+            batch = list(islice(entries, NUMPY_CHUNK_ROWS))
+            if not batch:
+                break
+            yield _entries_to_arrays(batch)
+
+def _codes_where(column, predicate):
+    """字串欄位 (codes, table) 中，值符合 predicate 的列 → bool mask（只對 table 逐一判斷）。"""
+    codes, table = column
+    lut = np.array([bool(predicate(value)) for value in table])
+    return lut[codes]
+
+def _http_code(event):
+    """'http_503' → 503；不是 HTTP 事件時回傳 -1（判斷規則與 aggregate_entries 相同）。"""
+    if not event.startswith('http_'):
+        return -1
+    code = event.split('_')[1]
+    return int(code) if code.isdigit() else -1
+
+def aggregate_arrays(totals, chunk):
+    """NumPy 引擎：以向量化 mask 一次處理整個 chunk，結果與 aggregate_entries 相同。"""
+    model_codes, models = chunk['model']
+    event_codes, events = chunk['event']
+    user_codes, users = chunk['user_id']
+
+    # ---------- AIInference ----------
+    ai = _codes_where(chunk['source'], lambda v: v == 'AIInference') & _codes_where(chunk['model'], bool)
+    if ai.any():
+        has_latency = ai & (chunk['latency_ms'] != NULL)
+        # health_check 的 avg_latency_ms 也視作一次延遲樣本
+        health = ai & _codes_where(chunk['event'], lambda v: v == 'health_check') \
+            & (chunk['avg_latency_ms'] != NULL)
+        keys = np.concatenate([model_codes[has_latency], model_codes[health]])
+        values = np.concatenate([chunk['latency_ms'][has_latency], chunk['avg_latency_ms'][health]])
+        # 依 model code 排序後切段，每個 model 一段
+        order = np.argsort(keys, kind='stable')
+        counts = np.bincount(keys, minlength=len(models))
+        for code, samples in enumerate(np.split(values[order], np.cumsum(counts)[:-1])):
+            if len(samples):
+                totals.model_latencies[models[code]].add_array(samples)
+
+    # ---------- MobileApp ----------
+    app = _codes_where(chunk['source'], lambda v: v == 'MobileApp') & _codes_where(chunk['user_id'], bool)
+    success = app & _codes_where(chunk['action'], lambda v: v == 'login_success')
+    failure = app & _codes_where(chunk['action'], lambda v: v in ('login_failure', 'login'))
+    for counter, mask in ((totals.user_login_success, success), (totals.user_login_failure, failure)):
+        for code, n in enumerate(np.bincount(user_codes[mask], minlength=len(users)).tolist()):
+            if n:
+                counter[users[code]] += n
+
+    # ---------- NetService ----------
+    net = _codes_where(chunk['source'], lambda v: v == 'NetService')
+    if net.any():
+        net_events = event_codes[net]
+        # 每個相異 event 只解析一次狀態碼，再查表映射回每一列
+        codes = np.array([_http_code(e) for e in events], dtype=np.int64)[net_events]
+        for label, low in (('2xx', 200), ('4xx', 400), ('5xx', 500)):
+            n = int(np.count_nonzero((codes >= low) & (codes < low + 100)))
+            if n:
+                totals.http_status_counts[label] += n
+        for code, n in enumerate(np.bincount(net_events, minlength=len(events)).tolist()):
+            if n and events[code] in ANOMALY_EVENTS:
+                totals.anomaly_counts[events[code]] += n
+
+def _latency_stats(latencies):
+    """{key: 分位數引擎} → {key: {'avg_ms', 'p50_ms', ...}}（key 排序，略過沒有樣本的 key）。"""
+    stats = {}
+    for key, lats in sorted(latencies.items()):
+        if lats.count:
+            stats[key] = {'avg_ms': round(lats.mean(), 2)}
+            for pct in PERCENTILES:
+                stats[key][f'p{pct}_ms'] = round(lats.percentile(pct), 2)
+    return stats
+
+def summarize(totals):
+    """把累加結果轉成輸出用的 dict（key 排序，兩種引擎的 JSON 完全相同）。"""
+    # AI 模型延遲統計
+    model_stats = _latency_stats(totals.model_latencies)
+
+    # 用戶登錄統計
+    user_stats = {}
+    for user in sorted(set(totals.user_login_success) | set(totals.user_login_failure)):
+        user_stats[user] = {
+            'login_success': totals.user_login_success.get(user, 0),
+            'login_failure': totals.user_login_failure.get(user, 0)
+        }
+
+    return {
+        'model_stats': model_stats,
+        'user_stats': user_stats,
+        'http_status_counts': dict(sorted(totals.http_status_counts.items())),
+        'anomaly_counts': dict(sorted(totals.anomaly_counts.items()))
+    }
+
+# =====================
+# req_id 關聯（端到端延遲）
+# =====================
+REQUEST_COLUMNS = ('timestamp', 'source', 'req_id', 'model', 'path', 'latency_ms')
+REQUEST_SOURCES = ('NetService', 'AIInference')
+REQUEST_TTL_S = 300                  # 未配對的一半最多等多久（依 log 時間，秒）
+REQUEST_MAX_PENDING = 100_000        # 同時等待配對的 req_id 上限
+
+def _epoch_seconds(timestamp):
+    """'2025-11-16 09:00:01' → epoch 秒（視為 UTC，與列式檔案相同）；無法解析時回傳 None。"""
+    try:
+        return int(datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+def iter_request_halves(paths, concurrency=DEFAULT_CONCURRENCY, decoder=None):
+    """
+    依序 yield 帶 req_id 與 latency_ms 的 NetService / AIInference 紀錄：
+    (epoch 秒, source, req_id, 標籤, latency_ms)，標籤是 AIInference 的 model 或 NetService 的 path。
+    列式檔案只讀 REQUEST_COLUMNS 這幾欄。
+    """
+    columnar, text_paths = _split_columnar(paths)
+    for path in columnar:
+        for chunk in iter_column_chunks(path, REQUEST_COLUMNS):
+            rows = zip(*(chunk[name] for name in REQUEST_COLUMNS))
+            for ts, source, req_id, model, req_path, latency in rows:
+                if req_id is None or latency is None or source not in REQUEST_SOURCES:
+                    continue
+                label = model if source == 'AIInference' else req_path
+                yield ts, source, req_id, label or '-', latency
+    if text_paths:
+        for entry in iter_jsonl_entries(text_paths, concurrency, decoder):
+            source = entry.get('source')
+            fields = entry.get('fields', {})
+            req_id = fields.get('req_id')
+            if req_id is None or 'latency_ms' not in fields or source not in REQUEST_SOURCES:
+                continue
+            label = fields.get('model') if source == 'AIInference' else fields.get('path')
+            yield (_epoch_seconds(entry.get('timestamp')), source, str(req_id),
+                   label or '-', parse_int(fields['latency_ms']))
+
+class RequestJoiner:
+    """
+    以 req_id 做串流 hash join：NetService（網路段）+ AIInference（推論段）
+    → 每個 request 的端到端延遲 = 兩段 latency_ms 相加，依 model 與 path 各自統計分位。
+
+    - 先到的一半放進 pending（依到達順序），等另一半出現就配對並移除
+    - 依 log 時間淘汰：比目前最新時間早 ttl_s 以上仍未配對的一半視為 expired
+    - pending 超過 max_pending 時淘汰最舊的（evicted），記憶體有上限，
+      與一天的總流量無關，只與 ttl_s 內未配對的數量有關
+    - req_id 假設在 ttl_s 內不重複；同一段重複出現時以新的一筆為準
+    """
+
+    def __init__(self, quantile_engine, ttl_s=REQUEST_TTL_S, max_pending=REQUEST_MAX_PENDING):
+        self.by_model = defaultdict(quantile_engine)   # model -> 端到端延遲
+        self.by_path = defaultdict(quantile_engine)    # path -> 端到端延遲
+        self.pending = OrderedDict()                   # req_id -> (ts, source, label, latency)
+        self.ttl_s = ttl_s
+        self.max_pending = max_pending
+        self.watermark = None                          # 目前看到的最新 log 時間
+        self.matched = self.expired = self.evicted = self.duplicates = 0
+
+    def add(self, ts, source, req_id, label, latency):
+        """加入一半；若另一半已在 pending 就配對。"""
+        if ts is not None and (self.watermark is None or ts > self.watermark):
+            self.watermark = ts
+            self._expire()
+
+        other = self.pending.pop(req_id, None)
+        if other is not None:
+            if other[1] != source:
+                model, path = (label, other[2]) if source == 'AIInference' else (other[2], label)
+                total = latency + other[3]
+                self.by_model[model].add(total)
+                self.by_path[path].add(total)
+                self.matched += 1
+                return
+            self.duplicates += 1
+
+        self.pending[req_id] = (ts, source, label, latency)
+        if len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.evicted += 1
+
+    def _expire(self):
+        """從最舊的開始，丟掉等待超過 ttl_s 的一半（沒有時間的也一併丟掉）。"""
+        limit = self.watermark - self.ttl_s
+        while self.pending:
+            ts = next(iter(self.pending.values()))[0]
+            if ts is not None and ts >= limit:
+                break
+            self.pending.popitem(last=False)
+            self.expired += 1
+
+    def summary(self):
+        return {
+            'by_model': _latency_stats(self.by_model),
+            'by_path': _latency_stats(self.by_path),
+            'matched': self.matched,
+            'unmatched_expired': self.expired,
+            'unmatched_evicted': self.evicted,
+            'unmatched_pending': len(self.pending),
+            'duplicates': self.duplicates,
+        }
+
+def correlate_requests(paths, quantile_engine, concurrency=DEFAULT_CONCURRENCY, decoder=None,
+                       ttl_s=REQUEST_TTL_S, max_pending=REQUEST_MAX_PENDING):
+    """把所有檔案的 request 兩段串流配對，回傳 RequestJoiner.summary()。"""
+    joiner = RequestJoiner(quantile_engine, ttl_s, max_pending)
+    for half in iter_request_halves(paths, concurrency, decoder):
+        joiner.add(*half)
+    return joiner.summary()
+
+# =====================
+# Session 還原（每位用戶）
+# =====================
+SESSION_COLUMNS = ('timestamp', 'level', 'source', 'user_id', 'action', 'screen', 'duration_ms')
+SESSION_GAP_S = 30 * 60              # 同一用戶超過這麼久沒有事件就切成新 session（秒）
+SESSION_START_ACTIONS = ('open_app', 'reopen_app')
+SESSION_END_ACTIONS = ('close_app', 'logout')
+SCREEN_PATH_MAX = 20                 # 每個 session 最多記錄的畫面數
+SESSION_TOP_PATHS = 10               # 輸出最常見的幾條畫面路徑
+
+def iter_session_events(paths, concurrency=DEFAULT_CONCURRENCY, decoder=None):
+    """
+    依序 yield 帶 user_id 的 MobileApp 事件：
+    (epoch 秒, user_id, level, action, screen, duration_ms)。列式檔案只讀 SESSION_COLUMNS。
+    """
+    columnar, text_paths = _split_columnar(paths)
+    for path in columnar:
+        for chunk in iter_column_chunks(path, SESSION_COLUMNS):
+            rows = zip(*(chunk[name] for name in SESSION_COLUMNS))
+            for ts, level, source, user, action, screen, duration in rows:
+                if source == 'MobileApp' and user and ts is not None:
+                    yield ts, user, level, action, screen, duration
+    if text_paths:
+        for entry in iter_jsonl_entries(text_paths, concurrency, decoder):
+            if entry.get('source') != 'MobileApp':
+                continue
+            fields = entry.get('fields', {})
+            user = fields.get('user_id') or fields.get('user')
+            ts = _epoch_seconds(entry.get('timestamp'))
+            if not user or ts is None:
+                continue
+            duration = parse_int(fields['duration_ms'], None) if 'duration_ms' in fields else None
+            yield ts, user, entry.get('level'), fields.get('action'), screen_of(fields), duration
+
+class _Session:
+    """一個進行中的 session（只保留彙整需要的欄位）。"""
+    __slots__ = ('user', 'start', 'last', 'events', 'active_ms', 'screens', 'has_error')
+
+    def __init__(self, user, ts):
+        self.user = user
+        self.start = self.last = ts
+        self.events = 0
+        self.active_ms = 0
+        self.screens = []
+        self.has_error = False
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+class Sessionizer:
+    """
+    單次串流把每位用戶的 MobileApp 事件切成 session。
+
+    - 同一用戶超過 gap_s 沒有事件、或出現 open_app / reopen_app 時開新 session
+    - close_app / logout 結束 session
+    - 進行中的 session 依最後活動時間排序；每個事件推進 log 時間，
+      閒置超過 gap_s 的用戶立即結算並移除，記憶體只與同時在線的用戶數有關
+    - 每個結束的 session 交給 on_session（例如寫成 JSONL），並累加長度分位、
+      含 ERROR 的 session 數、結束原因與常見畫面路徑
+    """
+
+    def __init__(self, quantile_engine, gap_s=SESSION_GAP_S, on_session=None):
+        self.gap_s = gap_s
+        self.on_session = on_session
+        self.active = OrderedDict()          # user -> _Session，最久沒活動的在前
+        self.watermark = None
+        self.lengths = quantile_engine()     # session 長度（秒）
+        self.count = 0
+        self.error_sessions = 0
+        self.ended_by = Counter()
+        self.paths = Counter()               # 畫面路徑 -> session 數（只保留常見的）
+        self.peak_active = 0
+
+    def add(self, ts, user, level, action, screen, duration_ms):
+        if self.watermark is None or ts > self.watermark:
+            self.watermark = ts
+            self._expire()
+
+        session = self.active.get(user)
+        if session is not None and (ts - session.last > self.gap_s
+                                    or action in SESSION_START_ACTIONS):
+            self._close(self.active.pop(user), 'idle' if ts - session.last > self.gap_s else 'reopen')
+            session = None
+        if session is None:
+            session = self.active[user] = _Session(user, ts)
+            self.peak_active = max(self.peak_active, len(self.active))
+        else:
+            self.active.move_to_end(user)
+
+        session.last = max(session.last, ts)
+        session.events += 1
+        if duration_ms is not None:
+            session.active_ms += duration_ms
+        if level == 'ERROR':
+            session.has_error = True
+        if screen and len(session.screens) < SCREEN_PATH_MAX \
+                and (not session.screens or session.screens[-1] != screen):
+            session.screens.append(screen)
+        if action in SESSION_END_ACTIONS:
+            self._close(self.active.pop(user), action)
+
+    def _expire(self):
+        """結算最後活動早於 watermark - gap_s 的 session。"""
+        limit = self.watermark - self.gap_s
+        while self.active:
+            user, session = next(iter(self.active.items()))
+            if session.last >= limit:
+                break
+            del self.active[user]
+            self._close(session, 'idle')
+
+    def _close(self, session, reason):
+        self.count += 1
+        self.lengths.add(session.last - session.start)
+        self.error_sessions += session.has_error
+        self.ended_by[reason] += 1
+        if session.screens:
+            self.paths[' > '.join(session.screens)] += 1
+            if len(self.paths) > SESSION_TOP_PATHS * 100:
+                # 路徑種類太多時只保留常見的，計數變成近似值但記憶體有上限
+                self.paths = Counter(dict(self.paths.most_common(SESSION_TOP_PATHS * 10)))
+        if self.on_session is not None:
+            self.on_session({
+                'user_id': session.user,
+                'start': _iso(session.start),
+                'end': _iso(session.last),
+                'length_s': session.last - session.start,
+                'events': session.events,
+                'active_ms': session.active_ms,
+                'screens': session.screens,
+                'has_error': session.has_error,
+                'ended_by': reason,
+            })
+
+    def finish(self):
+        """串流結束：結算所有還在進行中的 session。"""
+        while self.active:
+            _, session = self.active.popitem(last=False)
+            self._close(session, 'end_of_stream')
+
+    def summary(self):
+        lengths = {}
+        if self.lengths.count:
+            lengths = {'avg_s': round(self.lengths.mean(), 2)}
+            for pct in PERCENTILES:
+                lengths[f'p{pct}_s'] = round(self.lengths.percentile(pct), 2)
+        return {
+            'count': self.count,
+            'length': lengths,
+            'error_sessions': self.error_sessions,
+            'ended_by': dict(sorted(self.ended_by.items())),
+            'top_screen_paths': [[path, n] for path, n in
+                                 sorted(self.paths.items(), key=lambda kv: (-kv[1], kv[0]))
+                                 [:SESSION_TOP_PATHS]],
+            'peak_active_users': self.peak_active,
+        }
+
+def sessionize(paths, quantile_engine, concurrency=DEFAULT_CONCURRENCY, decoder=None,
+               gap_s=SESSION_GAP_S, sessions_out=None):
+    """把所有檔案的 MobileApp 事件切成 session，回傳 Sessionizer.summary()；可同時寫出每個 session。"""
+    out = Path(sessions_out).open('w', encoding='utf-8') if sessions_out else None
+    try:
+        on_session = (lambda s: out.write(json.dumps(s, ensure_ascii=False) + '\n')) if out else None
+        sessionizer = Sessionizer(quantile_engine, gap_s, on_session)
+        for event in iter_session_events(paths, concurrency, decoder):
+            sessionizer.add(*event)
+        sessionizer.finish()
+    finally:
+        if out:
+            out.close()
+    return sessionizer.summary()
+
+def main(log_path, out_json=None, out_csv=None, exact=False, concurrency=DEFAULT_CONCURRENCY,
+         engine='python', json_backend='auto', cache_dir=DEFAULT_CACHE_DIR, requests=False,
+         request_ttl=REQUEST_TTL_S, sessions=False, session_gap=SESSION_GAP_S, sessions_out=None):
     # =====================
     # 初始化統計容器
     # =====================
-    model_latencies = defaultdict(list)          # model -> list[latency]
-    user_login_success = Counter()                # user -> count
-    user_login_failure = Counter()                # user -> count
-    http_status_counts = Counter()                # '2xx', '4xx', '5xx'
-    anomaly_counts = Counter()                    # wifi_disconnected, tcp_reset, http_504, http_503
+    # --exact 時保留所有樣本（舊行為），否則用固定記憶體的 sketch
+    if engine == 'numpy' and np is None:
+        print("❌ --engine numpy 需要先安裝 numpy", file=sys.stderr)
+        sys.exit(1)
+    if exact:
+        quantile_engine = ArrayQuantiles if engine == 'numpy' else ExactQuantiles
+    else:
+        quantile_engine = DDSketch
+    totals = MetricTotals(quantile_engine)
+    try:
+        decoder = make_decoder(json_backend)
+    except RuntimeError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
 
     # =====================
     # 讀取日誌
     # =====================
-    log_file = Path(log_path)
-    if not log_file.is_file():
+    log_files = expand_log_paths(log_path)
+    if not log_files:
         print(f"❌ 無法找到日誌文件: {log_path}", file=sys.stderr)
         sys.exit(1)
+    if len(log_files) > 1:
+        print(f"[INFO] 機群模式：{len(log_files)} 個檔案，同時讀取 {concurrency} 個")
+    log_files = resolve_raw_logs(log_files, cache_dir)
 
-    with log_file.open(encoding='utf-8') as f:
-        for line_no, raw in enumerate(f, 1):
-            raw = raw.strip()
-            if not raw:
-                continue
-            try:
-                entry = json.loads(raw)
-            except json.JSONDecodeError as e:
-                print(f"⚠️ 第 {line_no} 行解析失敗: {e}", file=sys.stderr)
-                continue
-
-            source = entry.get('source')
-            fields = entry.get('fields', {})
-            # ---------- AIInference ----------
-            if source == 'AIInference':
-                model = fields.get('model')
-                if not model:
-                    continue
-                # 延遲
-                if 'latency_ms' in fields:
-                    latency = parse_int(fields['latency_ms'])
-                    model_latencies[model].append(latency)
-                # 有時會直接寫入 slo 檢查
-                if fields.get('event') == 'health_check' and 'avg_latency_ms' in fields:
-                    # 可視作一次延遲樣本
-                    latency = parse_int(fields['avg_latency_ms'])
-                    model_latencies[model].append(latency)
-
-            # ---------- MobileApp ----------
-            elif source == 'MobileApp':
-                user = fields.get('user_id') or fields.get('user_id') or fields.get('user')
-                if not user:
-                    # 某些日誌用 user_id
-                    user = fields.get('user_id')
-                if not user:
-                    continue
-                action = fields.get('action')
-                if action == 'login_success':
-                    user_login_success[user] += 1
-                elif action == 'login_failure' or action == 'login':
-                    user_login_failure[user] += 1
-                elif action == 'login':
-                    # 某些日誌中 login 只表示請求，成功/失敗由後續 event
-                    pass
-
-            # ---------- NetService ----------
-            elif source == 'NetService':
-                event = fields.get('event')
-                # HTTP 狀態統計
-                if event and event.startswith('http_'):
-                    code = event.split('_')[1]
-                    if code.isdigit():
-                        code_int = int(code)
-                        if 200 <= code_int < 300:
-                            http_status_counts['2xx'] += 1
-                        elif 400 <= code_int < 500:
-                            http_status_counts['4xx'] += 1
-                        elif 500 <= code_int < 600:
-                            http_status_counts['5xx'] += 1
-                    # 特殊 504 / 503 異常
-                    if event in ('http_504', 'http_503'):
-                        anomaly_counts[event] += 1
-
-                # 其他網路異常
-                if event == 'wifi_disconnected':
-                    anomaly_counts['wifi_disconnected'] += 1
-                if event == 'tcp_reset':
-                    anomaly_counts['tcp_reset'] += 1
+    if engine == 'numpy':
+        for chunk in iter_metric_arrays(log_files, concurrency, decoder):
+            aggregate_arrays(totals, chunk)
+    else:
+        aggregate_entries(totals, iter_log_entries(log_files, concurrency, decoder))
 
     # =====================
     # 結果計算
     # =====================
-    # AI 模型延遲統計
-    model_stats = {}
-    for model, lats in model_latencies.items():
-        if lats:
-            avg = statistics.mean(lats)
-            p95 = compute_p95(lats)
-            model_stats[model] = {
-                'avg_ms': round(avg, 2),
-                'p95_ms': p95
-            }
-
-    # 用戶登錄統計
-    user_stats = {}
-    for user in set(user_login_success) | set(user_login_failure):
-        user_stats[user] = {
-            'login_success': user_login_success.get(user, 0),
-            'login_failure': user_login_failure.get(user, 0)
-        }
+    out_data = summarize(totals)
+    if requests:
+        # 另跑一趟只讀 req_id 相關欄位的串流 join（列式檔案只載入 REQUEST_COLUMNS）
+        try:
+            out_data['request_latency'] = correlate_requests(
+                log_files, ExactQuantiles if exact else DDSketch, concurrency, decoder,
+                ttl_s=request_ttl)
+        except (KeyError, ValueError) as e:
+            print(f"❌ 列式檔案缺少 req_id / path 欄位，請重新轉檔: {e}", file=sys.stderr)
+            sys.exit(1)
+    if sessions:
+        try:
+            out_data['sessions'] = sessionize(
+                log_files, ExactQuantiles if exact else DDSketch, concurrency, decoder,
+                gap_s=session_gap, sessions_out=sessions_out)
+        except (KeyError, ValueError) as e:
+            print(f"❌ 列式檔案缺少 screen 欄位，請重新轉檔: {e}", file=sys.stderr)
+            sys.exit(1)
+    model_stats = out_data['model_stats']
+    user_stats = out_data['user_stats']
+    http_status_counts = out_data['http_status_counts']
+    anomaly_counts = out_data['anomaly_counts']
 
     # =====================
     # 輸出格式化
     # =====================
     print("\n=== AI 模型延遲統計 ===")
     for model, stats in sorted(model_stats.items()):
-        print(f"- {model}: 平均延遲 = {stats['avg_ms']:.2f} ms, 95% 分位 = {stats['p95_ms']} ms")
+        pcts = ", ".join(f"P{pct} = {stats[f'p{pct}_ms']} ms" for pct in PERCENTILES)
+        print(f"- {model}: 平均延遲 = {stats['avg_ms']:.2f} ms, {pcts}")
 
     print("\n=== 用戶登錄成功/失敗統計 ===")
     for user, stats in sorted(user_stats.items()):
@@ -166,36 +991,77 @@ def main(log_path, out_json=None, out_csv=None):
     for anomaly, count in sorted(anomaly_counts.items()):
         print(f"- {anomaly} = {count}")
 
+    if requests:
+        req = out_data['request_latency']
+        print("\n=== 端到端延遲（req_id 關聯：網路 + 推論） ===")
+        print(f"- 配對成功 = {req['matched']}, 逾時未配對 = {req['unmatched_expired']}, "
+              f"超量淘汰 = {req['unmatched_evicted']}, 結束時未配對 = {req['unmatched_pending']}")
+        for title, key in (('model', 'by_model'), ('path', 'by_path')):
+            for label, stats in req[key].items():
+                pcts = ", ".join(f"P{pct} = {stats[f'p{pct}_ms']} ms" for pct in PERCENTILES)
+                print(f"- {title} {label}: 平均 = {stats['avg_ms']:.2f} ms, {pcts}")
+
+    if sessions:
+        sess = out_data['sessions']
+        print("\n=== 用戶 Session 統計 ===")
+        print(f"- session 數 = {sess['count']}, 含 ERROR = {sess['error_sessions']}, "
+              f"同時在線用戶峰值 = {sess['peak_active_users']}")
+        if sess['length']:
+            pcts = ", ".join(f"P{pct} = {sess['length'][f'p{pct}_s']} s" for pct in PERCENTILES)
+            print(f"- 長度: 平均 = {sess['length']['avg_s']:.2f} s, {pcts}")
+        print("- 結束原因: " + ", ".join(f"{k} = {v}" for k, v in sess['ended_by'].items()))
+        for path, n in sess['top_screen_paths']:
+            print(f"- 畫面路徑 {path}: {n}")
+        if sessions_out:
+            print(f"\n✅ 每個 session 已寫入: {sessions_out}")
+
     # =====================
     # 可選 JSON / CSV 輸出
     # =====================
     if out_json:
-        out_data = {
-            'model_stats': model_stats,
-            'user_stats': user_stats,
-            'http_status_counts': dict(http_status_counts),
-            'anomaly_counts': dict(anomaly_counts)
-        }
         Path(out_json).write_text(json.dumps(out_data, ensure_ascii=False, indent=2))
         print(f"\n✅ JSON 結果已寫入: {out_json}")
 
     if out_csv:
-        # CSV 只寫 AI 模型延遲統計（平均、P95）
+        # CSV 只寫 AI 模型延遲統計（平均、各分位）
         import csv
         with Path(out_csv).open('w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
-            writer.writerow(['model', 'avg_ms', 'p95_ms'])
+            writer.writerow(['model', 'avg_ms'] + [f'p{pct}_ms' for pct in PERCENTILES])
             for model, stats in sorted(model_stats.items()):
-                writer.writerow([model, f"{stats['avg_ms']:.2f}", stats['p95_ms']])
+                writer.writerow([model, f"{stats['avg_ms']:.2f}"]
+                                + [stats[f'p{pct}_ms'] for pct in PERCENTILES])
         print(f"\n✅ CSV 結果已寫入: {out_csv}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="計算手機 AI 服務日誌中的關鍵度量指標。"
     )
-    parser.add_argument('logfile', help='JSONL 日誌文件路徑')
+    parser.add_argument('logfile', help='JSONL（或 .parquet / .npz 列式、.log 原始文字）日誌文件路徑；也可以是目錄或 glob 樣式（機群模式）')
     parser.add_argument('--out-json', help='輸出 JSON 結果文件')
     parser.add_argument('--out-csv', help='輸出 CSV 結果文件（僅 AI 延遲統計）')
+    parser.add_argument('--exact', action='store_true',
+                        help='保留所有延遲樣本計算精確分位（記憶體隨資料量成長，驗證用）')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'機群模式下同時讀取的檔案數（預設 {DEFAULT_CONCURRENCY}）')
+    parser.add_argument('--engine', choices=('python', 'numpy'), default='python',
+                        help='python：逐筆彙整；numpy：以欄位陣列批次向量化彙整（需要 numpy，結果相同）')
+    parser.add_argument('--json-backend', choices=JSON_BACKENDS, default='auto',
+                        help='JSONL 解碼器：auto 依序選 msgspec / orjson / json（預設 auto）')
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR),
+                        help=f'原始 .log 的解析快取目錄（預設 {DEFAULT_CACHE_DIR}）')
+    parser.add_argument('--requests', action='store_true',
+                        help='以 req_id 關聯 NetService 與 AIInference，輸出每個 model / path 的端到端延遲')
+    parser.add_argument('--request-ttl', type=int, default=REQUEST_TTL_S,
+                        help=f'未配對的一半最多等待的秒數（依 log 時間，預設 {REQUEST_TTL_S}）')
+    parser.add_argument('--sessions', action='store_true',
+                        help='把每位用戶的 MobileApp 事件切成 session（長度、畫面路徑、是否含 ERROR）')
+    parser.add_argument('--session-gap', type=int, default=SESSION_GAP_S,
+                        help=f'閒置多少秒後切成新 session（預設 {SESSION_GAP_S}）')
+    parser.add_argument('--sessions-out', help='把每個 session 寫成 JSONL（需搭配 --sessions）')
     args = parser.parse_args()
 
-    main(args.logfile, out_json=args.out_json, out_csv=args.out_csv)
\ No newline at end of file
+    main(args.logfile, out_json=args.out_json, out_csv=args.out_csv, exact=args.exact,
+         concurrency=args.concurrency, engine=args.engine, json_backend=args.json_backend,
+         cache_dir=args.cache_dir, requests=args.requests, request_ttl=args.request_ttl,
+         sessions=args.sessions, session_gap=args.session_gap, sessions_out=args.sessions_out)
\ No newline at end of file
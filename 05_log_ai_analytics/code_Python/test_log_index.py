@@ -0,0 +1,56 @@
+"""
+test_log_index.py
+
+LogIndex 的查詢測試：header 的 level / source 與 body 裡同名的欄位不可混在一起。
+
+    python -m unittest test_log_index      # 或 python -m pytest -q
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from log_index import LogIndex
+
+LINES = [
+    "2025-11-16 09:00:01 WARN MobileApp user_id=bob level=x",
+    "2025-11-16 09:00:02 ERROR NetService source=cdn event=http_500",
+    "2025-11-16 09:00:03 WARN AIInference model=asr-small-v1 latency_ms=250",
+]
+
+
+class LogIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_path = Path(self.tmp.name) / "app.log"
+        self.log_path.write_text("\n".join(LINES) + "\n", encoding="utf-8")
+        self.index = LogIndex(self.log_path)
+        self.index.update()
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def lines(self, *criteria):
+        return [line for _, line in self.index.iter_lines(self.index.query(criteria))]
+
+    def test_header_and_body_fields_are_separate_keys(self):
+        self.assertEqual(self.lines(("level", "x")), LINES[:1])
+        self.assertEqual(self.lines(("@level", "WARN")), [LINES[0], LINES[2]])
+        self.assertEqual(self.lines(("@level", "x")), [])
+        self.assertEqual(self.lines(("source", "cdn")), LINES[1:2])
+        self.assertEqual(self.lines(("@source", "NetService")), LINES[1:2])
+        self.assertEqual(self.lines(("@source", "cdn")), [])
+
+    def test_query_intersects_header_and_body(self):
+        self.assertEqual(self.lines(("@level", "WARN"), ("model", "asr-small-v1")), LINES[2:])
+
+    def test_appended_lines_are_indexed(self):
+        with self.log_path.open("a", encoding="utf-8") as f:
+            f.write("2025-11-16 09:00:04 WARN MobileApp user_id=bob action=close_app\n")
+        self.assertEqual(self.index.update(), 1)
+        self.assertEqual(len(self.lines(("user_id", "bob"), ("@level", "WARN"))), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
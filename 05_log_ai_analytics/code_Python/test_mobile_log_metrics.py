@@ -0,0 +1,87 @@
+"""
+test_mobile_log_metrics.py
+
+DDSketch 與 ExactQuantiles 的誤差比較（只用標準函式庫）：
+
+    python -m unittest test_mobile_log_metrics      # 或 python -m pytest -q
+"""
+
+import random
+import unittest
+
+from mobile_log_metrics_ai import DDSketch, ExactQuantiles
+
+CHECKED_PERCENTILES = (50, 95, 99)
+
+
+def _long_tail(n, seed):
+    """長尾延遲分佈：大多數 100~200 ms，少數到數秒（與 bench_mobile_log sketch 相同）。"""
+    rng = random.Random(seed)
+    return [int(rng.lognormvariate(5.0, 0.6)) for _ in range(n)]
+
+
+def _fill(engine, values):
+    for value in values:
+        engine.add(value)
+    return engine
+
+
+class DDSketchTest(unittest.TestCase):
+    def assert_within_accuracy(self, sketch, exact, percentiles=CHECKED_PERCENTILES):
+        for pct in percentiles:
+            want, got = exact.percentile(pct), sketch.percentile(pct)
+            self.assertLessEqual(abs(got - want) / want, sketch.relative_accuracy,
+                                 f"P{pct}: exact = {want}, sketch = {got}")
+
+    def test_percentiles_within_relative_accuracy(self):
+        values = _long_tail(200_000, seed=42)
+        sketch = _fill(DDSketch(), values)
+        self.assert_within_accuracy(sketch, _fill(ExactQuantiles(), values))
+        self.assertEqual(sketch.count, len(values))
+        self.assertLess(len(sketch.buckets), 1000)     # 記憶體與樣本數無關
+
+    def test_merge_matches_single_sketch(self):
+        left, right = _long_tail(50_000, seed=1), _long_tail(50_000, seed=2)
+        merged = _fill(DDSketch(), left)
+        merged.merge(_fill(DDSketch(), right))
+        self.assertEqual(merged.buckets, _fill(DDSketch(), left + right).buckets)
+        self.assertEqual(merged.count, len(left) + len(right))
+        self.assert_within_accuracy(merged, _fill(ExactQuantiles(), left + right))
+
+    def test_merge_rejects_different_accuracy(self):
+        with self.assertRaises(ValueError):
+            DDSketch(0.01).merge(DDSketch(0.02))
+
+    def test_max_buckets_collapse_keeps_upper_percentiles(self):
+        # 1 ms ~ 1000 s 的對數均勻分佈需要約 700 個 bucket，上限只有 64
+        rng = random.Random(7)
+        values = [10 ** rng.uniform(0, 6) for _ in range(100_000)]
+        sketch = DDSketch(max_buckets=64)
+        collapse = sketch._collapse_lowest
+        calls = []
+        sketch._collapse_lowest = lambda: calls.append(1) or collapse()
+        _fill(sketch, values)
+        exact = _fill(ExactQuantiles(), values)
+
+        self.assertLessEqual(len(sketch.buckets), 64)
+        self.assertLess(len(calls), 1000)       # 不是滿了之後每次 add 都重新排序
+        self.assertEqual(sketch.count, len(values))
+        self.assert_within_accuracy(sketch, exact, percentiles=(99,))
+        # 被合併的低端分位只會高估，不會低估
+        self.assertGreaterEqual(sketch.percentile(50), exact.percentile(50))
+
+    def test_collapsed_sketches_merge_within_bound(self):
+        rng = random.Random(3)
+        low = [10 ** rng.uniform(0, 3) for _ in range(20_000)]
+        high = [10 ** rng.uniform(3, 6) for _ in range(20_000)]
+        merged = _fill(DDSketch(max_buckets=64), low)
+        merged.merge(_fill(DDSketch(max_buckets=64), high))
+
+        self.assertLessEqual(len(merged.buckets), 64)
+        self.assertEqual(min(merged.buckets), merged.min_index)
+        self.assert_within_accuracy(merged, _fill(ExactQuantiles(), low + high),
+                                    percentiles=(99,))
+
+
+if __name__ == "__main__":
+    unittest.main()
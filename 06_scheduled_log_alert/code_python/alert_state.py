@@ -0,0 +1,109 @@
+"""
+alert_state.py
+
+告警去重 / 限流用的狀態快取：
+- 以 (規則名稱, fingerprint) 當 key，記錄告警第一次觸發、最後一次出現、最後一次通知的時間
+- 只有「新觸發 (fired)」與「已恢復 (resolved)」這兩種狀態變化才需要寄信
+- 持續中的告警不重複寄信；可設定每隔多久提醒一次
+- 超過 resolve_after 沒再出現的告警視為恢復並從快取移除（TTL）
+- 狀態存成 JSON 檔，排程每次重新啟動也能延續
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_STATE_PATH = Path(__file__).parent / ".alert_state.json"
+
+
+class AlertStateCache:
+    """持久化的告警狀態快取。
+
+    :param path: 狀態檔路徑
+    :param resolve_after_s: 多久沒再觸發就視為 resolved（秒）
+    :param repeat_after_s: 持續中的告警多久再提醒一次（秒），0 表示不提醒
+    """
+
+    def __init__(self, path: Path, resolve_after_s: float, repeat_after_s: float = 0) -> None:
+        self.path = Path(path)
+        self.resolve_after_s = resolve_after_s
+        self.repeat_after_s = repeat_after_s
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self) -> None:
+        """讀取狀態檔；不存在或損毀時從空白開始。"""
+        if not self.path.exists():
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] alert state unreadable, starting from scratch: {e}")
+            self.entries = {}
+
+    def save(self) -> None:
+        """先寫暫存檔再 rename，避免寫到一半被中斷時狀態檔損毀。"""
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2, ensure_ascii=False)
+        tmp.replace(self.path)
+
+    def update(
+        self, active: Dict[str, Any], fingerprint: str = "", now: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """用這次觸發的告警更新狀態，回傳需要通知的 (fired, resolved)。
+
+        :param active: 這次觸發的告警 {規則名稱: 指標值}
+        :param fingerprint: 區分同一規則的不同來源（例如 log 檔路徑）
+        :param now: 目前時間（epoch 秒），預設為 time.time()
+        """
+        now = time.time() if now is None else now
+        fired: Dict[str, Any] = {}
+        resolved: Dict[str, Any] = {}
+
+        for rule, value in active.items():
+            key = f"{rule}|{fingerprint}"
+            entry = self.entries.get(key)
+            if entry is None:
+                # 新觸發
+                self.entries[key] = {
+                    "rule": rule,
+                    "fingerprint": fingerprint,
+                    "value": value,
+                    "first_fired": now,
+                    "last_seen": now,
+                    "last_notified": now,
+                }
+                fired[rule] = value
+                continue
+
+            entry["value"] = value
+            entry["last_seen"] = now
+            if self.repeat_after_s and now - entry["last_notified"] >= self.repeat_after_s:
+                # 持續中的告警，到了提醒間隔才再寄一次
+                entry["last_notified"] = now
+                fired[rule] = value
+
+        # 同一 fingerprint 下這次沒出現、且超過 TTL 的告警 → resolved
+        for key, entry in list(self.entries.items()):
+            if entry["fingerprint"] != fingerprint or entry["rule"] in active:
+                continue
+            if now - entry["last_seen"] >= self.resolve_after_s:
+                resolved[entry["rule"]] = entry["value"]
+                del self.entries[key]
+
+        return fired, resolved
+
+
+def state_cache_from_config(cfg: Dict[str, Any]) -> Optional[AlertStateCache]:
+    """依 alert_config.yaml 的 dedup: 區段建立快取；未啟用時回傳 None。"""
+    dcfg = cfg.get("dedup") or {}
+    if not dcfg.get("enabled"):
+        return None
+    return AlertStateCache(
+        path=Path(dcfg.get("state_file", DEFAULT_STATE_PATH)),
+        resolve_after_s=dcfg.get("resolve_after_minutes", 15) * 60,
+        repeat_after_s=dcfg.get("repeat_after_minutes", 0) * 60,
+    )
@@ -5,14 +5,29 @@ email_utils.py
 - 不寫死帳號/密碼在程式裡
 - 從呼叫端傳入 subject / body
 - 適合拿來做「log 告警通知」用途
+- PooledMailer：保持同一條已登入的 SMTP 連線、批次寄送、背景佇列寄信，
+  斷線時自動重連；告警判斷不會被 SMTP 延遲卡住
 """
 
 import os
+import queue
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import Header
-from typing import List
+from typing import List, Optional, Sequence, Tuple
+
+
+def build_message(sender_email: str, recipients: List[str], subject: str, body: str) -> MIMEMultipart:
+    """組出純文字 email（UTF-8）。"""
+    msg = MIMEMultipart()
+    msg["From"] = sender_email
+    msg["To"] = ", ".join(recipients)
+    msg["Subject"] = Header(subject, "utf-8")
+    msg.attach(MIMEText(body, "plain", "utf-8"))
+    return msg
 
 
 def send_email(
@@ -39,11 +54,7 @@ def send_email(
         print(f"[ERROR] env var {sender_password_env} not set, cannot send email.")
         return
 
-    msg = MIMEMultipart()
-    msg["From"] = sender_email
-    msg["To"] = ", ".join(recipients)
-    msg["Subject"] = Header(subject, "utf-8")
-    msg.attach(MIMEText(body, "plain", "utf-8"))
+    msg = build_message(sender_email, recipients, subject, body)
 
     try:
         with smtplib.SMTP(smtp_host, smtp_port) as smtp:
@@ -53,4 +64,218 @@ def send_email(
             smtp.sendmail(sender_email, recipients, msg.as_string())
         print("[INFO] Email sent successfully.")
     except Exception as e:
-        print(f"[ERROR] Failed to send email: {e}")
\ No newline at end of file
+        print(f"[ERROR] Failed to send email: {e}")
+
+
+# (收件者, 標題, 內文)
+Message = Tuple[List[str], str, str]
+
+
+class PooledMailer:
+    """可重複使用的寄信器。
+
+    - 第一次寄信時建立連線並 EHLO / STARTTLS / login，之後沿用同一條連線
+    - send_batch() 一次寄多封，只付一次握手成本
+    - start() 後可用 submit() 丟進背景佇列，立刻返回；背景執行緒會把
+      佇列中累積的信件一批寄出
+    - 連線中斷（伺服器 idle timeout 等）時自動重連並重試
+
+    用法::
+
+        with PooledMailer("smtp.gmail.com", 587, sender, "ASR_SMTP_PASS", recipients) as mailer:
+            mailer.submit("[Log Alert] ...", body)
+
+    :param sender_password_env: 儲存 App Password 的環境變數名稱；None 表示不登入
+        （例如本機測試用的 SMTP stand-in）
+    :param default_recipients: submit() 沒指定收件者時使用
+    :param max_batch: 背景執行緒一次最多寄幾封
+    :param queue_size: 背景佇列上限，滿了就丟棄新信件並印出錯誤，不阻塞呼叫端
+    :param retries: 同一封信連線失敗時最多重連重試幾次（寄出一封後重新計算）
+    :param retry_backoff: 第一次重連前等待的秒數，之後每次加倍
+    """
+
+    def __init__(
+        self,
+        smtp_host: str,
+        smtp_port: int,
+        sender_email: str,
+        sender_password_env: Optional[str],
+        default_recipients: Optional[List[str]] = None,
+        use_tls: bool = True,
+        timeout: float = 30.0,
+        max_batch: int = 20,
+        queue_size: int = 1000,
+        retries: int = 2,
+        retry_backoff: float = 1.0,
+    ) -> None:
+        self.smtp_host = smtp_host
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.sender_password_env = sender_password_env
+        self.default_recipients = list(default_recipients or [])
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_batch = max_batch
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._lock = threading.Lock()          # 同一時間只有一個執行緒使用連線
+        self._queue: "queue.Queue[Optional[Message]]" = queue.Queue(maxsize=queue_size)
+        self._worker: Optional[threading.Thread] = None
+
+    # ---------- 連線管理 ----------
+    def _connect(self) -> smtplib.SMTP:
+        password = None
+        if self.sender_password_env:
+            password = os.environ.get(self.sender_password_env)
+            if not password:
+                raise RuntimeError(f"env var {self.sender_password_env} not set, cannot send email.")
+
+        smtp = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.use_tls:
+                smtp.starttls()
+                smtp.ehlo()
+            if password:
+                smtp.login(self.sender_email, password)
+        except Exception:
+            smtp.close()
+            raise
+        return smtp
+
+    def _disconnect(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+    # ---------- 同步寄送 ----------
+    def send_batch(self, messages: Sequence[Message]) -> int:
+        """用同一條連線寄出多封信，回傳成功寄出的封數。
+
+        連線失敗時等一下（retry_backoff 秒起，每次加倍）再重連，從尚未寄出的
+        那封繼續；同一封最多重試 retries 次，寄出一封後次數歸零。
+        被伺服器拒收的信（收件者 / 寄件者被拒）只跳過那一封，不重連。
+        """
+        sent = 0
+        idx = 0                                # 下一封要寄的信
+        attempts = 0                           # 目前這封信已重試幾次
+        with self._lock:
+            while idx < len(messages):
+                recipients, subject, body = messages[idx]
+                try:
+                    if self._smtp is None:
+                        self._smtp = self._connect()
+                    msg = build_message(self.sender_email, recipients, subject, body)
+                    refused = self._smtp.sendmail(self.sender_email, recipients, msg.as_string())
+                    if refused:
+                        print(f"[WARN] Email '{subject}' refused for {sorted(refused)}")
+                    sent += 1
+                    idx += 1
+                    attempts = 0
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                        smtplib.SMTPDataError) as e:
+                    # 這一封被伺服器拒收（smtplib 已 RSET）：跳過它，連線照常使用。
+                    # SMTPException 是 OSError 的子類別，必須在下面的 OSError 之前攔截
+                    print(f"[ERROR] Email '{subject}' rejected: {e}")
+                    idx += 1
+                    attempts = 0
+                except (smtplib.SMTPAuthenticationError, RuntimeError) as e:
+                    # 登入失敗 / 沒有密碼：剩下的信也寄不出去，整批放棄
+                    print(f"[ERROR] Cannot log in to SMTP server: {e}")
+                    self._disconnect()
+                    break
+                except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError) as e:
+                    # 連線層的錯誤：丟掉舊連線，重連後再試
+                    self._disconnect()
+                    attempts += 1
+                    if attempts > self.retries:
+                        print(f"[ERROR] Failed to send email after {self.retries} retries: {e}")
+                        break
+                    delay = self.retry_backoff * 2 ** (attempts - 1)
+                    print(f"[WARN] SMTP connection lost ({e}), reconnecting in {delay:g}s...")
+                    time.sleep(delay)
+                except Exception as e:
+                    # 其他非預期錯誤：跳過這封並重建連線
+                    print(f"[ERROR] Failed to send email '{subject}': {e}")
+                    idx += 1
+                    attempts = 0
+                    self._disconnect()
+        return sent
+
+    def send(self, subject: str, body: str, recipients: Optional[List[str]] = None) -> bool:
+        """同步寄出一封信（沿用既有連線）。"""
+        return self.send_batch([(recipients or self.default_recipients, subject, body)]) == 1
+
+    # ---------- 背景佇列 ----------
+    def start(self) -> "PooledMailer":
+        """啟動背景寄信執行緒。"""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="PooledMailer", daemon=True)
+            self._worker.start()
+        return self
+
+    def submit(self, subject: str, body: str, recipients: Optional[List[str]] = None) -> bool:
+        """把信丟進背景佇列後立刻返回；佇列滿了就丟棄並回傳 False。"""
+        if self._worker is None:
+            self.start()
+        try:
+            self._queue.put_nowait((recipients or self.default_recipients, subject, body))
+            return True
+        except queue.Full:
+            print(f"[ERROR] mail queue full, dropping email '{subject}'.")
+            return False
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            # 把佇列裡已經累積的信一起帶走，批次寄出
+            while len(batch) < self.max_batch:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._send_and_report(batch)
+                    return
+                batch.append(nxt)
+            self._send_and_report(batch)
+
+    def _send_and_report(self, batch: List[Message]) -> None:
+        sent = self.send_batch(batch)
+        print(f"[INFO] {sent}/{len(batch)} email(s) sent.")
+
+    def close(self) -> None:
+        """寄完佇列中剩下的信，停止背景執行緒並關閉連線。"""
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+        with self._lock:
+            self._disconnect()
+
+    def __enter__(self) -> "PooledMailer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def mailer_from_config(email_cfg: dict) -> PooledMailer:
+    """依 alert_config.yaml 的 email: 區段建立 PooledMailer。"""
+    return PooledMailer(
+        smtp_host=email_cfg["smtp_host"],
+        smtp_port=email_cfg["smtp_port"],
+        sender_email=email_cfg["sender"],
+        sender_password_env=email_cfg.get("sender_password_env"),
+        default_recipients=email_cfg["recipients"],
+        use_tls=email_cfg.get("use_tls", True),
+    )
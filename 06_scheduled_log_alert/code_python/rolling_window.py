@@ -0,0 +1,177 @@
+"""
+rolling_window.py
+
+以「每分鐘一格」的 ring buffer 保存滑動時間窗的統計：
+- 每格有一個 Counter（事件次數）與數個 LatencyHistogram（延遲分佈）
+- 查詢「最近 N 分鐘」只需要看 N 格，不必重掃 log
+- 格子依 minute % 容量 循環使用，寫入新分鐘時舊資料自動被淘汰
+
+時間以 log 裡的時間戳為準（不是系統時間），重播舊 log 也能得到正確結果。
+"""
+
+import calendar
+import math
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class LatencyHistogram:
+    """
+    對數等距 bucket 的延遲直方圖，可合併，分位數相對誤差 <= relative_accuracy。
+
+    bucket 的算法與 05 mobile_log_metrics_ai.DDSketch 相同，也同樣有 max_buckets
+    上限：超過時把最小的幾個 bucket 併進上一格（只影響最低端的分位），
+    之後比 min_index 小的值都記在 min_index 那一格。
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets: Counter = Counter()
+        self.min_index: Optional[int] = None
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        idx = math.ceil(math.log(value) / self.log_gamma)
+        if self.min_index is not None and idx < self.min_index:
+            idx = self.min_index
+        self.buckets[idx] += 1
+        if len(self.buckets) > self.max_buckets:
+            self._collapse_lowest()
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.buckets.update(other.buckets)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if self.min_index is None or (other.min_index is not None
+                                      and other.min_index > self.min_index):
+            self.min_index = other.min_index
+        if self.min_index is not None:
+            for idx in [idx for idx in self.buckets if idx < self.min_index]:
+                self.buckets[self.min_index] += self.buckets.pop(idx)
+        if len(self.buckets) > self.max_buckets:
+            self._collapse_lowest()
+
+    def _collapse_lowest(self) -> None:
+        """一次併掉最低的幾格（多併 max_buckets // 8 格），排序成本分攤到很多次 add。"""
+        keys = sorted(self.buckets)
+        cut = len(keys) - self.max_buckets + self.max_buckets // 8
+        floor = keys[cut]
+        for idx in keys[:cut]:
+            self.buckets[floor] += self.buckets.pop(idx)
+        self.min_index = floor
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """nearest-rank 分位數的估計值；沒有資料時回傳 None。"""
+        if not self.count:
+            return None
+        rank = max(0, int(self.count * pct / 100) - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if rank < seen:
+                return 2 * self.gamma ** idx / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class _MinuteBucket:
+    __slots__ = ("minute", "counts", "histograms")
+
+    def __init__(self, minute: int):
+        self.minute = minute
+        self.counts: Counter = Counter()
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+
+class RollingWindow:
+    """
+    每分鐘一格的 ring buffer。
+
+    :param max_minutes: 最長要能查詢幾分鐘（= 格數）
+    """
+
+    def __init__(self, max_minutes: int):
+        self.max_minutes = max(1, max_minutes)
+        self.slots: List[Optional[_MinuteBucket]] = [None] * self.max_minutes
+        self.latest_minute: Optional[int] = None
+        self._last_prefix = ""
+        self._last_minute = 0
+
+    def minute_of(self, timestamp: str) -> int:
+        """把 "YYYY-MM-DD HH:MM:SS" 轉成分鐘序號；同一分鐘的連續行只解析一次。
+
+        時間戳直接當成 UTC 換算（calendar.timegm），不經過本機時區：
+        用 local time 換算時，夏令時間切換會讓兩個不同的分鐘落在同一格、
+        或讓時間窗憑空多出 / 少掉一小時。
+        """
+        prefix = timestamp[:16]
+        if prefix != self._last_prefix:
+            dt = datetime.strptime(prefix, "%Y-%m-%d %H:%M")
+            self._last_prefix = prefix
+            self._last_minute = calendar.timegm(dt.timetuple()) // 60
+        return self._last_minute
+
+    def advance(self, minute: int) -> None:
+        """推進「目前時間」；每一行 log 都要呼叫，沒有事件的分鐘也要算進時間窗。"""
+        if self.latest_minute is None or minute > self.latest_minute:
+            self.latest_minute = minute
+
+    def _bucket(self, minute: int) -> Optional[_MinuteBucket]:
+        """取得要寫入的格子；比時間窗還舊的資料回傳 None（丟棄）。"""
+        self.advance(minute)
+        if minute <= self.latest_minute - self.max_minutes:
+            return None
+        slot = minute % self.max_minutes
+        bucket = self.slots[slot]
+        if bucket is None or bucket.minute != minute:
+            # 這格放的是 max_minutes 分鐘前的資料，直接覆蓋（自動淘汰）
+            bucket = _MinuteBucket(minute)
+            self.slots[slot] = bucket
+        return bucket
+
+    def add_count(self, key: str, minute: int, n: int = 1) -> None:
+        bucket = self._bucket(minute)
+        if bucket is not None:
+            bucket.counts[key] += n
+
+    def add_value(self, key: str, minute: int, value: float) -> None:
+        bucket = self._bucket(minute)
+        if bucket is None:
+            return
+        hist = bucket.histograms.get(key)
+        if hist is None:
+            hist = bucket.histograms[key] = LatencyHistogram()
+        hist.add(value)
+
+    def _window(self, minutes: int):
+        """依序回傳最近 minutes 分鐘（含最新一分鐘）內仍有效的格子。"""
+        if self.latest_minute is None:
+            return
+        minutes = min(minutes, self.max_minutes)
+        for minute in range(self.latest_minute - minutes + 1, self.latest_minute + 1):
+            bucket = self.slots[minute % self.max_minutes]
+            if bucket is not None and bucket.minute == minute:
+                yield bucket
+
+    def count(self, key: str, minutes: int) -> int:
+        """最近 minutes 分鐘內 key 的次數，O(minutes)。"""
+        return sum(bucket.counts[key] for bucket in self._window(minutes))
+
+    def percentile(self, key: str, pct: float, minutes: int) -> Optional[float]:
+        """最近 minutes 分鐘內 key 的 pct% 分位數；沒有樣本時回傳 None。"""
+        merged = LatencyHistogram()
+        for bucket in self._window(minutes):
+            hist = bucket.histograms.get(key)
+            if hist is not None:
+                merged.merge(hist)
+        return merged.percentile(pct)
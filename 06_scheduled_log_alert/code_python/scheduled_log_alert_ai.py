@@ -1,21 +1,563 @@
 """
 scheduled_log_alert_ai.py
 
-在課堂上，你可以：
+AI 重構版：把 scheduled_log_alert_manual.py 寫死的五個偵測條件，
+改成「從 alert_config.yaml 讀規則」的 rule engine：
 
-1. 將 scheduled_log_alert_manual.py 貼給 ChatGPT / OpenWebUI
-2. 使用 5_Prompt/01_alert_engine_refactor.md
-3. 要求 AI：
-   - 將異常檢查邏輯抽成「規則引擎」
-   - 從 alert_config.yaml 讀取所有規則與門檻
-   - 使用 schedule 套件依照 config 排程執行 main()
+1. build_rules_from_config()：把 alerts: 區段的每條規則轉成 AlertRule
+2. RuleEngine：把所有規則編譯成一張依 (source, event) 分派的表
+   - 每行 log 只切一次 token
+   - 只交給可能相關的規則判斷，新增規則不會多一次「整份 log 的掃描」
+3. check_alerts()：依 min_* / max_* 門檻判斷哪些規則被觸發
+4. run_once()：讀新 log → 計算 → 有異常就寄信
+   （傳入 PooledMailer 時改由背景佇列寄送，不會卡住規則判斷；
+   啟用 dedup 時只通知新觸發與已恢復的告警；沒有新 log 時也會檢查是否已恢復）
+   規則設定 window_minutes 時，指標改從 rolling_window.RollingWindow
+   （每分鐘一格的 ring buffer）查「最近 N 分鐘」，不必重掃 log
+5. AlertDaemon / run_scheduler_forever()：常駐模式，依 schedule: 區段用
+   schedule 套件定時執行；設定、編譯好的規則、檔案 offset、告警狀態與
+   mailer 都留在記憶體，alert_config.yaml 的 mtime 變了才重新載入
 
-下面先留一個最小骨架，讓 AI 產生完整版本後貼上。
+讀檔（checkpoint / lookback）沿用 scheduled_log_alert_manual.py 的函式。
+
+用法:
+    python scheduled_log_alert_ai.py            # 跑一次（適合 cron）
+    python scheduled_log_alert_ai.py --daemon   # 常駐，依 schedule: 設定定時執行
 """
 
-# TODO：上課時由 AI 產生，建議包含：
-# - load_config()
-# - parse_log()
-# - build_rules_from_config()
-# - check_alerts(entries, rules)
-# - run_once() / run_forever_with_schedule()
\ No newline at end of file
+import argparse
+import re
+import time
+import traceback
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import schedule
+import yaml
+
+from alert_state import AlertStateCache, state_cache_from_config
+from email_utils import PooledMailer, mailer_from_config, send_email
+from rolling_window import RollingWindow
+from scheduled_log_alert_manual import (
+    CONFIG_PATH,
+    DEFAULT_CHECKPOINT_PATH,
+    load_checkpoints,
+    load_config,
+    load_new_log_lines,
+    save_checkpoints,
+)
+
+# body 的 tokenizer；與 mobile_log_basic_ai._BODY_TOKEN_PATTERN 相同，
+# 讓告警引擎和分析 parser 對 key="含空白的值" 的切法一致。只編譯一次。
+#   - key="quoted value"（值可含空白）
+#   - key=value
+#   - 其他 token（忽略）
+KV_PATTERN = re.compile(r'(\w+)=("[^"]*"(?=\s|$)|\S+)|(\S+)')
+# metric 名稱，例如 p95 / p99
+PERCENTILE_METRIC = re.compile(r"p(\d{1,2})$")
+
+
+@dataclass
+class AlertRule:
+    """一條告警規則（由 alert_config.yaml 的 alerts: 區段產生）。"""
+    name: str
+    description: str
+    level: Optional[frozenset]          # None 表示不限
+    source: Optional[frozenset]
+    event: Optional[frozenset]
+    fields: Dict[str, frozenset]        # 其他 key=value 條件
+    metric: str = "count"               # count 或 pNN
+    value_field: Optional[str] = None   # pNN 要取哪個欄位的數值
+    op: str = ">="                      # ">=" (min_*) 或 ">" (max_*)
+    threshold: float = 1
+    window_minutes: int = 0             # > 0：只看最近 N 分鐘（跨次執行累積）
+
+    def matches(self, entry: Dict[str, Any]) -> bool:
+        """source / event 已由分派表篩過，這裡只檢查剩下的條件。"""
+        if self.level is not None and entry["level"] not in self.level:
+            return False
+        entry_fields = entry["fields"]
+        for key, allowed in self.fields.items():
+            if entry_fields.get(key) not in allowed:
+                return False
+        return True
+
+
+def _as_set(value) -> Optional[frozenset]:
+    """YAML 裡的值可以是單一值或清單，統一轉成 frozenset。"""
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        return frozenset(str(v) for v in value)
+    return frozenset([str(value)])
+
+
+def build_rules_from_config(cfg: Dict[str, Any]) -> List[AlertRule]:
+    """把 alerts: 區段中 enabled 的規則轉成 AlertRule 清單。"""
+    rules = []
+    lookback = int((cfg.get("log") or {}).get("lookback_minutes", 0) or 0)
+    for name, rcfg in (cfg.get("alerts") or {}).items():
+        if not rcfg or not rcfg.get("enabled"):
+            continue
+        match = dict(rcfg.get("match") or {})
+        thresholds = [(k, v) for k, v in rcfg.items() if k.startswith(("min_", "max_"))]
+        if len(thresholds) != 1:
+            raise ValueError(f"alert '{name}' needs exactly one min_*/max_* threshold")
+        key, threshold = thresholds[0]
+
+        metric = rcfg.get("metric", "count")
+        if metric != "count" and not PERCENTILE_METRIC.match(metric):
+            raise ValueError(f"alert '{name}': unknown metric '{metric}'")
+        if metric != "count" and not rcfg.get("field"):
+            raise ValueError(f"alert '{name}': metric '{metric}' needs a field")
+        window_minutes = int(rcfg.get("window_minutes", 0))
+        if lookback and window_minutes > lookback:
+            # 每次只讀最近 lookback 分鐘的 log，時間窗永遠填不滿，規則實際算的是別的窗
+            raise ValueError(f"alert '{name}': window_minutes={window_minutes} exceeds "
+                             f"log.lookback_minutes={lookback}")
+
+        rules.append(AlertRule(
+            name=name,
+            description=rcfg.get("description", name),
+            level=_as_set(match.pop("level", None)),
+            source=_as_set(match.pop("source", None)),
+            event=_as_set(match.pop("event", None)),
+            fields={k: _as_set(v) for k, v in match.items()},
+            metric=metric,
+            value_field=rcfg.get("field"),
+            op=">=" if key.startswith("min_") else ">",
+            threshold=threshold,
+            window_minutes=window_minutes,
+        ))
+    return rules
+
+
+def parse_log_line(line: str) -> Optional[Dict[str, Any]]:
+    """把一行 `timestamp LEVEL Source key=value ...` 切成 dict；格式不符回傳 None。"""
+    parts = line.split(None, 4)
+    if len(parts) < 4:
+        return None
+    body = parts[4] if len(parts) == 5 else ""
+    fields = {}
+    for key, value, _token in KV_PATTERN.findall(body):
+        if key:
+            if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+                value = value[1:-1]     # 去掉引號，與 mobile_log_basic_ai 相同
+            fields[key] = value
+    return {
+        "timestamp": f"{parts[0]} {parts[1]}",
+        "level": parts[2],
+        "source": parts[3],
+        "fields": fields,
+    }
+
+
+def _to_float(raw: Optional[str]) -> Optional[float]:
+    """欄位值轉成數字；沒有或格式錯誤時回傳 None。"""
+    if raw is None:
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def _percentile(values: List[float], pct: int) -> float:
+    """nearest-rank 分位數，與 manual 版 asr_p95 的算法相同。"""
+    ordered = sorted(values)
+    return ordered[max(0, int(len(ordered) * pct / 100) - 1)]
+
+
+class RuleEngine:
+    """
+    把規則編譯成分派表：(source, event) -> 規則清單。
+
+    沒指定 source / event 的規則放在 None 的位置，所以每行最多只查 4 個 key：
+    (source, event)、(source, None)、(None, event)、(None, None)。
+
+    有 window_minutes 的規則會把命中的事件寫進 RollingWindow；window 跟著
+    engine 留在記憶體，常駐模式下可以跨多次 tick 累積。
+    """
+
+    def __init__(self, rules: List[AlertRule], window: Optional[RollingWindow] = None):
+        self.rules = rules
+        max_window = max((rule.window_minutes for rule in rules), default=0)
+        if window is not None and window.max_minutes == max_window:
+            self.window: Optional[RollingWindow] = window      # 重新載入設定時沿用舊資料
+        else:
+            self.window = RollingWindow(max_window) if max_window else None
+        self.dispatch: Dict[Tuple[Optional[str], Optional[str]], List[AlertRule]] = defaultdict(list)
+        for rule in rules:
+            for source in rule.source or [None]:
+                for event in rule.event or [None]:
+                    self.dispatch[(source, event)].append(rule)
+
+    def candidates(self, source: str, event: Optional[str]) -> List[AlertRule]:
+        """回傳這個 (source, event) 可能會命中的規則。"""
+        if event is None:
+            keys = ((source, None), (None, None))
+        else:
+            keys = ((source, event), (source, None), (None, event), (None, None))
+        found = []
+        for key in keys:
+            found.extend(self.dispatch.get(key, ()))
+        return found
+
+    def evaluate(self, lines: List[str]) -> Dict[str, Any]:
+        """單次掃描所有行，回傳 {rule name: 指標值}（pNN 沒有樣本時為 None）。"""
+        counts = {rule.name: 0 for rule in self.rules}
+        samples: Dict[str, List[float]] = {rule.name: [] for rule in self.rules}
+        window = self.window
+
+        for line in lines:
+            entry = parse_log_line(line)
+            if entry is None:
+                continue
+            minute = None
+            if window is not None:
+                try:
+                    minute = window.minute_of(entry["timestamp"])
+                    window.advance(minute)
+                except ValueError:
+                    pass                    # 時間戳格式不符，無法放進時間窗
+            for rule in self.candidates(entry["source"], entry["fields"].get("event")):
+                if not rule.matches(entry):
+                    continue
+                if rule.window_minutes:
+                    if minute is None:
+                        continue
+                    if rule.metric == "count":
+                        window.add_count(rule.name, minute)
+                    else:
+                        value = _to_float(entry["fields"].get(rule.value_field))
+                        if value is not None:
+                            window.add_value(rule.name, minute, value)
+                elif rule.metric == "count":
+                    counts[rule.name] += 1
+                else:
+                    value = _to_float(entry["fields"].get(rule.value_field))
+                    if value is not None:
+                        samples[rule.name].append(value)
+
+        metrics: Dict[str, Any] = {}
+        for rule in self.rules:
+            pct = None if rule.metric == "count" else int(PERCENTILE_METRIC.match(rule.metric).group(1))
+            if rule.window_minutes:
+                if pct is None:
+                    metrics[rule.name] = window.count(rule.name, rule.window_minutes)
+                else:
+                    value = window.percentile(rule.name, pct, rule.window_minutes)
+                    metrics[rule.name] = None if value is None else round(value, 2)
+            elif pct is None:
+                metrics[rule.name] = counts[rule.name]
+            else:
+                values = samples[rule.name]
+                metrics[rule.name] = _percentile(values, pct) if values else None
+        return metrics
+
+
+def check_alerts(metrics: Dict[str, Any], rules: List[AlertRule]) -> List[Dict[str, Any]]:
+    """依門檻判斷哪些規則被觸發，回傳觸發清單。"""
+    triggered = []
+    for rule in rules:
+        value = metrics.get(rule.name)
+        if value is None:
+            continue
+        hit = value >= rule.threshold if rule.op == ">=" else value > rule.threshold
+        if hit:
+            condition = f"{rule.metric} {rule.op} {rule.threshold}"
+            if rule.window_minutes:
+                condition += f"（最近 {rule.window_minutes} 分鐘）"
+            triggered.append({
+                "name": rule.name,
+                "description": rule.description,
+                "value": value,
+                "condition": condition,
+            })
+    return triggered
+
+
+def build_email_body(
+    metrics: Dict[str, Any],
+    triggered: List[Dict[str, Any]],
+    resolved: Optional[Dict[str, Any]] = None,
+) -> str:
+    """組出告警 Email 內文。resolved 為已恢復的告警 {規則名稱: 最後數值}。"""
+    lines = ["瑞昱行動 AI 服務 log 健康檢查結果：", ""]
+    if triggered:
+        lines.append("【觸發告警的條件】")
+        for t in triggered:
+            lines.append(f"- {t['description']}（{t['name']}）：{t['value']}，條件 {t['condition']}")
+        lines.append("")
+    if resolved:
+        lines.append("【已恢復的告警】")
+        for name, value in resolved.items():
+            lines.append(f"- {name}（最後一次數值：{value}）")
+        lines.append("")
+    if metrics:
+        lines.append("【所有規則的指標】")
+        for name, value in metrics.items():
+            lines.append(f"- {name}: {value if value is not None else '無資料'}")
+        lines.append("")
+    lines.append("如需調整門檻或新增規則，請修改 alert_config.yaml 的 alerts: 區段。")
+    return "\n".join(lines)
+
+
+def evaluate_and_notify(
+    cfg: Dict[str, Any],
+    log_path: Path,
+    lines: List[str],
+    rules: List[AlertRule],
+    engine: RuleEngine,
+    state: Optional[AlertStateCache] = None,
+    mailer: Optional[PooledMailer] = None,
+) -> List[Dict[str, Any]]:
+    """規則判斷 → 去重 → 寄信。run_once() 與常駐模式共用。回傳這次通知的觸發清單。"""
+    metrics = engine.evaluate(lines)
+    print("[INFO] metrics:", metrics)
+    triggered = check_alerts(metrics, rules)
+
+    # 去重：持續中的告警不重複寄信，只通知新觸發與已恢復
+    resolved: Dict[str, Any] = {}
+    if state is not None:
+        fired, resolved = state.update({t["name"]: t["value"] for t in triggered},
+                                       fingerprint=str(log_path))
+        state.save()
+        triggered = [t for t in triggered if t["name"] in fired]
+
+    if not triggered and not resolved:
+        print("[INFO] no new or resolved alert, no email sent.")
+        return []
+
+    subject = "[Log Alert] 瑞昱行動 AI 服務異常告警" if triggered else "[Log Alert] 告警已恢復"
+    _notify(cfg, subject, build_email_body(metrics, triggered, resolved), mailer)
+    return triggered
+
+
+def resolve_quiet_alerts(
+    cfg: Dict[str, Any],
+    log_path: Path,
+    state: Optional[AlertStateCache] = None,
+    mailer: Optional[PooledMailer] = None,
+) -> Dict[str, Any]:
+    """沒有新 log 時仍檢查告警是否已恢復，回傳已恢復的告警。
+
+    錯誤風暴停下來時 log 往往正好很安靜；若只在有新行時才呼叫 state.update()，
+    要等到下一筆無關的 log 出現才會寄出「已恢復」。
+    """
+    if state is None:
+        return {}
+    _, resolved = state.update({}, fingerprint=str(log_path))
+    if not resolved:
+        return {}
+    state.save()
+    _notify(cfg, "[Log Alert] 告警已恢復", build_email_body({}, [], resolved), mailer)
+    return resolved
+
+
+def _notify(cfg: Dict[str, Any], subject: str, body: str, mailer: Optional[PooledMailer]) -> None:
+    """有 mailer 時丟進背景佇列，沒有的話用 send_email() 同步寄送。"""
+    if mailer is not None:
+        mailer.submit(subject, body)
+        return
+
+    email_cfg = cfg["email"]
+    send_email(
+        smtp_host=email_cfg["smtp_host"],
+        smtp_port=email_cfg["smtp_port"],
+        sender_email=email_cfg["sender"],
+        sender_password_env=email_cfg["sender_password_env"],
+        recipients=email_cfg["recipients"],
+        subject=subject,
+        body=body,
+    )
+
+
+def run_once(
+    cfg: Optional[Dict[str, Any]] = None, mailer: Optional[PooledMailer] = None
+) -> List[Dict[str, Any]]:
+    """執行一次：讀新 log → 規則判斷 → 有異常就寄信。回傳觸發清單。
+
+    :param mailer: 已啟動的 PooledMailer；有的話信件丟進背景佇列後立刻返回，
+        沒有的話用 send_email() 同步寄送
+    """
+    cfg = cfg or load_config()
+    log_path = Path(cfg["log"]["file"])
+    checkpoint_path = Path(cfg["log"].get("checkpoint_file", DEFAULT_CHECKPOINT_PATH))
+
+    checkpoints = load_checkpoints(checkpoint_path)
+    lookback = cfg["log"].get("lookback_minutes", 0)
+    lines, checkpoint = load_new_log_lines(log_path, checkpoints.get(str(log_path)), lookback)
+    if checkpoint is not None:
+        checkpoints[str(log_path)] = checkpoint
+        save_checkpoints(checkpoint_path, checkpoints)
+    state = state_cache_from_config(cfg)
+    if not lines:
+        print("[INFO] no new log lines since last run.")
+        resolve_quiet_alerts(cfg, log_path, state, mailer)
+        return []
+
+    rules = build_rules_from_config(cfg)
+    return evaluate_and_notify(cfg, log_path, lines, rules, RuleEngine(rules), state, mailer)
+
+
+class AlertDaemon:
+    """
+    常駐的告警排程器。
+
+    和每次由 cron 冷啟動的 run_once() 不同，以下東西都只建立一次、留在記憶體：
+    - 解析好的 config（alert_config.yaml 的 mtime 改變才重新讀）
+    - 編譯好的規則與 RuleEngine 分派表，以及滑動時間窗的統計
+    - 每個 log 檔的 offset / inode checkpoint（仍會寫回檔案，重啟後可接續）
+    - 告警去重狀態與已登入的 PooledMailer
+
+    所以每次 tick 的成本只和新增的 log 量有關。
+    """
+
+    def __init__(self, config_path: Path = CONFIG_PATH):
+        self.config_path = Path(config_path)
+        self.config_mtime: Optional[float] = None
+        self.cfg: Dict[str, Any] = {}
+        self.rules: List[AlertRule] = []
+        self.engine = RuleEngine([])
+        self.state: Optional[AlertStateCache] = None
+        self.mailer: Optional[PooledMailer] = None
+        self.checkpoint_path = DEFAULT_CHECKPOINT_PATH
+        self.checkpoints: Dict[str, Dict[str, int]] = {}
+        self._reload_error: Optional[str] = None
+        # 啟動時設定檔就有問題：直接失敗，不要變成一個什麼都不排程的常駐程式
+        self._apply_config(*self._load_config())
+
+    # ---------- 設定 ----------
+    def _load_config(self) -> Tuple[Dict[str, Any], List[AlertRule], float]:
+        """讀取並驗證設定檔；有問題時丟出 OSError / yaml.YAMLError / ValueError。"""
+        mtime = self.config_path.stat().st_mtime
+        with self.config_path.open("r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f)
+        if not isinstance(cfg, dict):
+            raise ValueError("config is empty or not a mapping")
+        for section, key in (("log", "file"), ("email", "smtp_host")):
+            if not isinstance(cfg.get(section), dict) or key not in cfg[section]:
+                raise ValueError(f"config needs a {section}: section with {key}:")
+        return cfg, build_rules_from_config(cfg), mtime
+
+    def reload_config_if_changed(self) -> bool:
+        """config 的 mtime 有變才重新載入並重建規則 / 排程，回傳是否有重新載入。"""
+        try:
+            mtime = self.config_path.stat().st_mtime
+            if mtime == self.config_mtime:
+                return False
+            cfg, rules, mtime = self._load_config()
+        except (OSError, yaml.YAMLError, ValueError) as e:
+            # 改到一半 / 正在 rename 的設定檔不要讓常駐程式掛掉，沿用舊設定；
+            # 同樣的錯誤只印一次，修好（mtime 改變）後會再試
+            if str(e) != self._reload_error:
+                print(f"[ERROR] failed to reload {self.config_path}, keeping previous config: {e}")
+                self._reload_error = str(e)
+            return False
+        self._apply_config(cfg, rules, mtime)
+        return True
+
+    def _apply_config(self, cfg: Dict[str, Any], rules: List[AlertRule], mtime: float) -> None:
+        old_cfg = self.cfg
+        self.cfg, self.config_mtime = cfg, mtime
+        self._reload_error = None
+        self.rules, self.engine = rules, RuleEngine(rules, window=self.engine.window)
+        self.state = state_cache_from_config(cfg)
+
+        checkpoint_path = Path(cfg["log"].get("checkpoint_file", DEFAULT_CHECKPOINT_PATH))
+        if checkpoint_path != self.checkpoint_path or not old_cfg:
+            self.checkpoint_path = checkpoint_path
+            self.checkpoints = load_checkpoints(checkpoint_path)
+
+        if cfg.get("email") != old_cfg.get("email"):
+            if self.mailer is not None:
+                self.mailer.close()
+            self.mailer = mailer_from_config(cfg["email"]).start()
+
+        if cfg.get("schedule") != old_cfg.get("schedule"):
+            self.schedule_jobs()
+
+        print(f"[INFO] loaded {self.config_path} ({len(rules)} rules).")
+
+    def schedule_jobs(self) -> None:
+        """依 schedule: 區段重新登記排程。"""
+        schedule.clear("log-alert")
+        scfg = self.cfg.get("schedule") or {}
+        mode = scfg.get("mode", "daily")
+        if mode == "interval":
+            minutes = scfg.get("interval_minutes") or 1
+            schedule.every(minutes).minutes.do(self.safe_tick).tag("log-alert")
+            print(f"[INFO] scheduled every {minutes} minute(s).")
+        elif mode == "daily":
+            at = scfg.get("daily_time", "09:05")
+            schedule.every().day.at(at).do(self.safe_tick).tag("log-alert")
+            print(f"[INFO] scheduled daily at {at}.")
+        else:
+            print(f"[ERROR] unknown schedule mode '{mode}', nothing scheduled.")
+
+    # ---------- 執行 ----------
+    def tick(self) -> List[Dict[str, Any]]:
+        """一次排程工作：只讀新增的 log，交給已編譯好的規則。"""
+        self.reload_config_if_changed()
+        log_path = Path(self.cfg["log"]["file"])
+        lookback = self.cfg["log"].get("lookback_minutes", 0)
+
+        lines, checkpoint = load_new_log_lines(
+            log_path, self.checkpoints.get(str(log_path)), lookback)
+        if checkpoint is not None:
+            self.checkpoints[str(log_path)] = checkpoint
+            save_checkpoints(self.checkpoint_path, self.checkpoints)
+        if not lines:
+            print("[INFO] no new log lines since last tick.")
+            resolve_quiet_alerts(self.cfg, log_path, self.state, self.mailer)
+            return []
+
+        return evaluate_and_notify(self.cfg, log_path, lines, self.rules, self.engine,
+                                   self.state, self.mailer)
+
+    def safe_tick(self) -> None:
+        """排程呼叫的入口：單次 tick 出錯只記錄下來，常駐程式繼續執行。"""
+        try:
+            self.tick()
+        except Exception:
+            print("[ERROR] scheduled tick failed:")
+            traceback.print_exc()
+
+    def run_forever(self, poll_seconds: float = 1.0) -> None:
+        """主迴圈：執行到期的排程，並定期檢查設定檔是否被修改。"""
+        print("[INFO] alert daemon started, press Ctrl+C to stop.")
+        try:
+            while True:
+                self.reload_config_if_changed()
+                schedule.run_pending()
+                time.sleep(poll_seconds)
+        except KeyboardInterrupt:
+            print("[INFO] alert daemon stopped.")
+        finally:
+            schedule.clear("log-alert")
+            if self.mailer is not None:
+                self.mailer.close()
+
+
+def run_scheduler_forever(config_path: Path = CONFIG_PATH) -> None:
+    """常駐模式入口；初始設定無效時直接結束（exit code 1）。"""
+    try:
+        daemon = AlertDaemon(config_path)
+    except (OSError, yaml.YAMLError, ValueError) as e:
+        raise SystemExit(f"[ERROR] invalid config {config_path}: {e}")
+    daemon.run_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="規則化的 log 告警")
+    parser.add_argument("--daemon", action="store_true",
+                        help="常駐執行，依 alert_config.yaml 的 schedule: 定時檢查")
+    args = parser.parse_args()
+
+    if args.daemon:
+        run_scheduler_forever()
+    else:
+        run_once()
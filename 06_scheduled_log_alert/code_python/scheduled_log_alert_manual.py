@@ -3,24 +3,32 @@ scheduled_log_alert_manual.py
 
 最初版：
 - 讀取 alert_config.yaml
-- 讀取 log 檔
+- 讀取 log 檔（只讀上次執行後新增的部分，offset 記在 checkpoint 檔）
+- 依 lookback_minutes 用二分搜尋直接跳到時間窗起點，不掃整份檔
 - 做幾個簡單的「異常條件」檢查
-- 有異常就寄 email
+- 有異常就寄 email（啟用 dedup 時只在「新觸發 / 已恢復」時寄信）
 
 之後會用 AI 重構成：
 - 規則化的 alert engine
 - 支援 schedule / 多種 alert 類型
 """
 
+import json
+from datetime import datetime, timedelta
 from pathlib import Path
 import yaml
 from statistics import median
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
+from alert_state import state_cache_from_config
 from email_utils import send_email
 
 
 CONFIG_PATH = Path(__file__).parent / "alert_config.yaml"
+DEFAULT_CHECKPOINT_PATH = Path(__file__).parent / ".alert_checkpoint.json"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"   # log 行開頭的時間格式，例如 2025-11-16 09:00:01
+TAIL_PROBE_BYTES = 64 * 1024             # 找最後一筆時間戳時，從檔尾往前讀的大小
+READ_BLOCK = 4 * 1024 * 1024             # 讀取新增內容時每次讀的大小
 
 
 def load_config() -> Dict[str, Any]:
@@ -36,6 +44,180 @@ def load_log_lines(log_file: Path):
         return [line.strip() for line in f if line.strip()]
 
 
+def load_checkpoints(path: Path) -> Dict[str, Dict[str, int]]:
+    """讀取 checkpoint 檔：{log 路徑: {"inode": ..., "offset": ...}}，不存在就回傳空 dict。"""
+    if not path.exists():
+        return {}
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] checkpoint unreadable, starting from scratch: {e}")
+        return {}
+
+
+def save_checkpoints(path: Path, checkpoints: Dict[str, Dict[str, int]]) -> None:
+    """先寫暫存檔再 rename，避免寫到一半被中斷時 checkpoint 損毀。"""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(checkpoints, f, indent=2)
+    tmp.replace(path)
+
+
+def _read_complete_lines(log_file: Path, offset: int, final: bool = False) -> Tuple[List[str], int]:
+    """
+    從 offset 讀到檔尾，只回傳完整的行；最後一行若還沒寫完，留到下次再讀。
+
+    以 READ_BLOCK 為單位讀取、逐段 decode，第一次執行遇到好幾 GB 的 log 時，
+    也不會先把 offset 之後的 raw bytes 整段讀進記憶體。
+    final=True 表示檔案已經不會再寫入（例如 rotate 掉的舊檔），
+    沒有換行結尾的最後一行也一併回傳。
+    """
+    lines: List[str] = []
+    end = offset
+    pending = b""                         # 上一個 block 結尾還沒遇到換行的部分
+    with log_file.open("rb") as f:
+        f.seek(offset)
+        while True:
+            block = f.read(READ_BLOCK)
+            if not block:
+                break
+            data = pending + block
+            cut = data.rfind(b"\n") + 1   # 沒有換行時為 0，整段留到下一個 block
+            pending = data[cut:]
+            if cut:
+                end += cut
+                text = data[:cut].decode("utf-8", errors="replace")
+                lines.extend(line.strip() for line in text.splitlines() if line.strip())
+    if final and pending:
+        end += len(pending)
+        line = pending.decode("utf-8", errors="replace").strip()
+        if line:
+            lines.append(line)
+    return lines, end
+
+
+def _find_rotated_file(log_file: Path, inode: int) -> Optional[Path]:
+    """log 被 rotate（例如改名成 xxx.log.1）時，依 inode 找回舊檔。"""
+    for candidate in sorted(log_file.parent.glob(log_file.name + ".*")):
+        try:
+            if candidate.stat().st_ino == inode:
+                return candidate
+        except OSError:
+            continue
+    return None
+
+
+def _parse_timestamp(line: bytes) -> Optional[datetime]:
+    """取出 log 行開頭的時間戳；格式不符時回傳 None。"""
+    try:
+        return datetime.strptime(line[:19].decode("ascii"), TIMESTAMP_FORMAT)
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+def _last_timestamp(log_file: Path) -> Optional[datetime]:
+    """從檔尾往前讀一小段，找出最後一筆有時間戳的行。"""
+    size = log_file.stat().st_size
+    with log_file.open("rb") as f:
+        f.seek(max(0, size - TAIL_PROBE_BYTES))
+        tail = f.read()
+    for line in reversed(tail.splitlines()):
+        ts = _parse_timestamp(line)
+        if ts is not None:
+            return ts
+    return None
+
+
+def _first_timestamp_at_or_after(f, pos: int) -> Tuple[int, Optional[datetime]]:
+    """
+    從 pos 往後找第一個「行首」，回傳 (該行 offset, 時間戳)。
+
+    沒有時間戳的行（例如多行 stack trace）會略過；到檔尾則回傳 (檔尾 offset, None)。
+    """
+    f.seek(max(0, pos - 1))
+    if pos > 0:
+        f.readline()                 # 跳到下一個行首（pos 剛好是行首時不會跳過）
+    while True:
+        start = f.tell()
+        line = f.readline()
+        if not line:
+            return start, None
+        ts = _parse_timestamp(line)
+        if ts is not None:
+            return start, ts
+
+
+def find_offset_for_time(log_file: Path, since: datetime) -> int:
+    """
+    log 依時間排序，所以可以用二分搜尋找出第一筆 >= since 的行首 offset。
+
+    只需要 O(log 檔案大小) 次 seek，20 GB 的檔也只要幾十次讀取。
+    """
+    lo, hi = 0, log_file.stat().st_size
+    with log_file.open("rb") as f:
+        while lo < hi:
+            mid = (lo + hi) // 2
+            _, ts = _first_timestamp_at_or_after(f, mid)
+            if ts is not None and ts < since:
+                lo = mid + 1
+            else:
+                hi = mid
+        return _first_timestamp_at_or_after(f, lo)[0]
+
+
+def lookback_offset(log_file: Path, minutes: int) -> int:
+    """回傳「最後一筆 log 往前 minutes 分鐘」的起點 offset；minutes <= 0 時回傳 0。"""
+    if minutes <= 0:
+        return 0
+    last_ts = _last_timestamp(log_file)
+    if last_ts is None:
+        return 0
+    return find_offset_for_time(log_file, last_ts - timedelta(minutes=minutes))
+
+
+def load_new_log_lines(
+    log_file: Path, checkpoint: Optional[Dict[str, int]], lookback_minutes: int = 0
+) -> Tuple[List[str], Optional[Dict[str, int]]]:
+    """
+    只讀上次 checkpoint 之後新增的 log 行。
+
+    - inode 相同：從上次的 offset 接著讀
+    - inode 相同但檔案變小（copytruncate）：從頭讀
+    - inode 不同（rotate）：先把舊檔剩下的部分讀完（含沒有換行結尾的最後一行），
+      再從新檔開頭讀
+    - lookback_minutes > 0：起點不早於最近 N 分鐘的時間窗（二分搜尋定位）
+
+    回傳 (新的行, 新的 checkpoint)；log 不存在時回傳 ([], 原本的 checkpoint)。
+    """
+    if not log_file.exists():
+        print(f"[ERROR] log file not found: {log_file}")
+        return [], checkpoint
+
+    st = log_file.stat()
+    lines: List[str] = []
+    offset = 0
+    if checkpoint:
+        if checkpoint["inode"] == st.st_ino:
+            if checkpoint["offset"] <= st.st_size:
+                offset = checkpoint["offset"]
+            else:
+                print(f"[INFO] {log_file} was truncated, reading from start.")
+        else:
+            rotated = _find_rotated_file(log_file, checkpoint["inode"])
+            if rotated is not None:
+                print(f"[INFO] {log_file} was rotated, finishing {rotated} first.")
+                lines, _ = _read_complete_lines(rotated, checkpoint["offset"], final=True)
+            else:
+                print(f"[INFO] {log_file} was rotated, reading new file from start.")
+
+    # 時間窗比 checkpoint 更晚開始時，直接跳到時間窗起點
+    offset = max(offset, lookback_offset(log_file, lookback_minutes))
+    new_lines, new_offset = _read_complete_lines(log_file, offset)
+    lines.extend(new_lines)
+    return lines, {"inode": st.st_ino, "offset": new_offset}
+
+
 def analyze_log(lines):
     """非常陽春的異常偵測，只為了示範，之後會交給 AI 強化。"""
     error_count = 0
@@ -113,8 +295,10 @@ def check_abnormal(summary: Dict[str, Any], cfg: Dict[str, Any]) -> Dict[str, An
     return triggered
 
 
-def build_email_body(summary: Dict[str, Any], triggered: Dict[str, Any]) -> str:
-    """設定 Email 通知內容（第 5 點）。"""
+def build_email_body(
+    summary: Dict[str, Any], triggered: Dict[str, Any], resolved: Optional[Dict[str, Any]] = None
+) -> str:
+    """設定 Email 通知內容（第 5 點）。resolved 為已恢復的告警（dedup 啟用時才會有）。"""
     lines = []
     lines.append("瑞昱行動 AI 服務日常 log 健康檢查結果：")
     lines.append("")
@@ -138,6 +322,12 @@ def build_email_body(summary: Dict[str, Any], triggered: Dict[str, Any]) -> str:
     else:
         lines.append("【目前未觸發任何告警條件】")
 
+    if resolved:
+        lines.append("")
+        lines.append("【已恢復的告警】")
+        for k, v in resolved.items():
+            lines.append(f"- {k}（最後一次數值：{v}）")
+
     lines.append("")
     lines.append("建議後續處理：")
     lines.append("- 請登入監控平台確認是否有對應的 spike 或異常 pattern")
@@ -150,21 +340,37 @@ def build_email_body(summary: Dict[str, Any], triggered: Dict[str, Any]) -> str:
 def main():
     cfg = load_config()
     log_path = Path(cfg["log"]["file"])
-    lines = load_log_lines(log_path)
+    checkpoint_path = Path(cfg["log"].get("checkpoint_file", DEFAULT_CHECKPOINT_PATH))
+
+    # 只處理上次執行後新增的部分，每次的成本與新資料量成正比
+    checkpoints = load_checkpoints(checkpoint_path)
+    lookback = cfg["log"].get("lookback_minutes", 0)
+    lines, checkpoint = load_new_log_lines(log_path, checkpoints.get(str(log_path)), lookback)
+    if checkpoint is not None:
+        checkpoints[str(log_path)] = checkpoint
+        save_checkpoints(checkpoint_path, checkpoints)
     if not lines:
-        return
+        # 不直接結束：log 安靜下來正是告警該恢復的時候，下面照樣更新去重狀態
+        print("[INFO] no new log lines since last run.")
 
     summary = analyze_log(lines)
     print("[INFO] summary:", summary)
     triggered = check_abnormal(summary, cfg)
 
-    if not triggered:
-        print("[INFO] no abnormal conditions triggered, no email sent.")
+    # 去重：持續中的告警不重複寄信，只通知新觸發與已恢復
+    resolved: Dict[str, Any] = {}
+    state = state_cache_from_config(cfg)
+    if state is not None:
+        triggered, resolved = state.update(triggered, fingerprint=str(log_path))
+        state.save()
+
+    if not triggered and not resolved:
+        print("[INFO] no new or resolved alert, no email sent.")
         return
 
     email_cfg = cfg["email"]
-    subject = "[Log Alert] 瑞昱行動 AI 服務異常告警"
-    body = build_email_body(summary, triggered)
+    subject = "[Log Alert] 瑞昱行動 AI 服務異常告警" if triggered else "[Log Alert] 告警已恢復"
+    body = build_email_body(summary, triggered, resolved)
 
     send_email(
         smtp_host=email_cfg["smtp_host"],
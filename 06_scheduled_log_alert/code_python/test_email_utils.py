@@ -0,0 +1,117 @@
+"""
+test_email_utils.py
+
+PooledMailer 對本機 SMTP stand-in 的測試（只用標準函式庫）：
+
+    python -m unittest test_email_utils      # 或 python -m pytest -q
+"""
+
+import socketserver
+import threading
+import unittest
+
+from email_utils import PooledMailer
+
+
+class _StandInHandler(socketserver.StreamRequestHandler):
+    """最小的 SMTP 伺服器：收件者以 bad@ 開頭的一律拒收，其餘照單全收。
+
+    server.drop_after_data 為 True 時，每收下一封信就斷線（模擬 idle timeout）。
+    """
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self) -> None:
+        server = self.server
+        server.connections += 1
+        self._reply("220 stand-in ready")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode("ascii").strip()
+            if not line:
+                return
+            verb = line.split(None, 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250 stand-in")
+            elif verb == "MAIL":
+                recipients = []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                address = line.split(":", 1)[1].strip("<> ")
+                if address.startswith("bad@"):
+                    self._reply("550 no such user")
+                else:
+                    recipients.append(address)
+                    self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 end with .")
+                while self.rfile.readline().rstrip(b"\r\n") != b".":
+                    pass
+                server.delivered.append(recipients)
+                self._reply("250 queued")
+                if server.drop_after_data:
+                    return
+            elif verb in ("RSET", "NOOP"):
+                recipients = []
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 bye")
+                return
+            else:
+                self._reply("502 not implemented")
+
+
+class _StandInServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _StandInHandler)
+        self.connections = 0
+        self.delivered = []
+        self.drop_after_data = False
+
+
+class PooledMailerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = _StandInServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        host, port = self.server.server_address
+        self.mailer = PooledMailer(host, port, "alert@x", None, use_tls=False, timeout=5,
+                                   retries=1, retry_backoff=0)
+
+    def tearDown(self):
+        self.mailer.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_rejected_recipient_skips_only_that_message(self):
+        batch = [(["bad@x"], "a", "body"), (["ok@x"], "b", "body"), (["ok2@x"], "c", "body")]
+        self.assertEqual(self.mailer.send_batch(batch), 2)
+        self.assertEqual(self.server.delivered, [["ok@x"], ["ok2@x"]])
+        self.assertEqual(self.server.connections, 1)   # 沒有因為拒收而重連
+
+    def test_connection_is_reused_across_batches(self):
+        self.assertEqual(self.mailer.send_batch([(["ok@x"], "a", "body")]), 1)
+        self.assertTrue(self.mailer.send("b", "body", ["ok@x", "bad@x"]))   # 部分拒收仍算寄出
+        self.assertEqual(self.server.connections, 1)
+
+    def test_retries_are_counted_per_message(self):
+        # 每封信都遇到一次斷線；retries=1 對每一封都夠用，不該累積到整批
+        self.server.drop_after_data = True
+        batch = [(["ok@x"], f"m{i}", "body") for i in range(4)]
+        self.assertEqual(self.mailer.send_batch(batch), 4)
+        self.assertEqual(len(self.server.delivered), 4)
+        self.assertEqual(self.server.connections, 4)
+
+    def test_background_queue_delivers_everything(self):
+        self.mailer.start()
+        for i in range(5):
+            self.mailer.submit(f"alert {i}", "body", ["ok@x"])
+        self.mailer.close()
+        self.assertEqual(len(self.server.delivered), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+test_scheduled_log_alert_ai.py
+
+告警去重的端到端測試：寫一份暫存 log，跑 run_once() / AlertDaemon.tick()，
+用假的 mailer 收下要寄出的信。
+
+    python -m unittest test_scheduled_log_alert_ai      # 或 python -m pytest -q
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import schedule
+import yaml
+
+from scheduled_log_alert_ai import AlertDaemon, run_once
+
+START = 1_700_000_000.0
+RESOLVE_AFTER_MINUTES = 15
+
+
+class _RecordingMailer:
+    """代替 PooledMailer：只記下 submit() 的標題。"""
+
+    def __init__(self):
+        self.subjects = []
+
+    def submit(self, subject, body, recipients=None):
+        self.subjects.append(subject)
+        return True
+
+    def close(self):
+        pass
+
+
+class QuietLogResolutionTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self.tmp.name)
+        self.log_path = tmp / "app.log"
+        self.cfg = {
+            "log": {"file": str(self.log_path), "lookback_minutes": 0,
+                    "checkpoint_file": str(tmp / "checkpoint.json")},
+            "dedup": {"enabled": True, "state_file": str(tmp / "state.json"),
+                      "resolve_after_minutes": RESOLVE_AFTER_MINUTES},
+            "email": {"smtp_host": "localhost", "smtp_port": 25, "sender": "alert@x",
+                      "recipients": ["sre@x"]},
+            "alerts": {"http_5xx": {"enabled": True, "description": "HTTP 5xx",
+                                    "match": {"source": "NetService", "event": "http_500"},
+                                    "min_5xx": 1}},
+        }
+        self.mailer = _RecordingMailer()
+
+    def tearDown(self):
+        schedule.clear("log-alert")
+        self.tmp.cleanup()
+
+    def append_log(self, *lines):
+        with self.log_path.open("a", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line + "\n")
+
+    def at(self, now):
+        return mock.patch("alert_state.time.time", return_value=now)
+
+    def test_run_once_resolves_without_new_lines(self):
+        self.append_log("2025-11-16 09:00:01 ERROR NetService event=http_500 path=/api")
+        with self.at(START):
+            self.assertEqual([t["name"] for t in run_once(self.cfg, self.mailer)], ["http_5xx"])
+        with self.at(START + 60):                      # 還沒到 resolve_after，不寄信
+            run_once(self.cfg, self.mailer)
+        with self.at(START + RESOLVE_AFTER_MINUTES * 60 + 1):
+            run_once(self.cfg, self.mailer)            # log 一直沒有新行
+        self.assertEqual(self.mailer.subjects,
+                         ["[Log Alert] 瑞昱行動 AI 服務異常告警", "[Log Alert] 告警已恢復"])
+
+    def test_daemon_tick_resolves_without_new_lines(self):
+        config_path = Path(self.tmp.name) / "alert_config.yaml"
+        config_path.write_text(yaml.safe_dump(self.cfg), encoding="utf-8")
+        daemon = AlertDaemon(config_path)
+        daemon.mailer.close()
+        daemon.mailer = self.mailer
+
+        self.append_log("2025-11-16 09:00:01 ERROR NetService event=http_500 path=/api")
+        with self.at(START):
+            daemon.tick()
+        with self.at(START + RESOLVE_AFTER_MINUTES * 60 + 1):
+            daemon.tick()
+        self.assertEqual(self.mailer.subjects,
+                         ["[Log Alert] 瑞昱行動 AI 服務異常告警", "[Log Alert] 告警已恢復"])
+
+
+if __name__ == "__main__":
+    unittest.main()
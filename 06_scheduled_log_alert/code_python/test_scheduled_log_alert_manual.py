@@ -0,0 +1,59 @@
+"""
+test_scheduled_log_alert_manual.py
+
+checkpoint 讀檔（load_new_log_lines）的測試：跨 block 的行、寫到一半的行、rotate。
+
+    python -m unittest test_scheduled_log_alert_manual      # 或 python -m pytest -q
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import scheduled_log_alert_manual as manual
+
+LINES = [f"2025-11-16 09:00:{i:02d} INFO MobileApp user_id=u{i} action=open_app" for i in range(40)]
+
+
+class LoadNewLogLinesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_path = Path(self.tmp.name) / "app.log"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text, mode="a", path=None):
+        with (path or self.log_path).open(mode, encoding="utf-8") as f:
+            f.write(text)
+
+    def test_lines_spanning_small_blocks(self):
+        self.write("\n".join(LINES) + "\n")
+        with mock.patch.object(manual, "READ_BLOCK", 7):
+            lines, checkpoint = manual.load_new_log_lines(self.log_path, None)
+        self.assertEqual(lines, LINES)
+        self.assertEqual(checkpoint["offset"], self.log_path.stat().st_size)
+
+    def test_partial_last_line_waits_for_next_run(self):
+        self.write(LINES[0] + "\n" + LINES[1][:10])
+        lines, checkpoint = manual.load_new_log_lines(self.log_path, None)
+        self.assertEqual(lines, LINES[:1])
+
+        self.write(LINES[1][10:] + "\n")
+        lines, _ = manual.load_new_log_lines(self.log_path, checkpoint)
+        self.assertEqual(lines, LINES[1:2])
+
+    def test_rotated_file_flushes_unterminated_last_line(self):
+        self.write(LINES[0] + "\n" + LINES[1])          # 最後一行沒有換行就被 rotate
+        _, checkpoint = manual.load_new_log_lines(self.log_path, None)
+        self.log_path.rename(self.log_path.with_name("app.log.1"))
+        self.write(LINES[2] + "\n", mode="w")
+
+        lines, checkpoint = manual.load_new_log_lines(self.log_path, checkpoint)
+        self.assertEqual(lines, LINES[1:3])
+        self.assertEqual(checkpoint["offset"], self.log_path.stat().st_size)
+
+
+if __name__ == "__main__":
+    unittest.main()